@@ -47,19 +47,30 @@ Function names:
 """
 
 import andorsdk as sdk
+import contextlib
 import functools
 import numpy
 import Pyro4
 Pyro4.config.SERIALIZER = 'pickle'
 Pyro4.config.SERIALIZERS_ACCEPTED.add('pickle')
 import sys, os, psutil
+import socket
 import threading
 import time
+import traceback
 import weakref
 from ctypes import byref, c_float, c_int, c_long, c_ulong
 from ctypes import create_string_buffer, c_char, c_bool
 from multiprocessing import Process, Value
-from collections import namedtuple
+from collections import deque, namedtuple
+from correction import CorrectionCache, CORRECTION_OUTPUTS
+from correction import DEAD_PIXEL_THRESHOLD, HOT_PIXEL_THRESHOLD
+from correction import round_for_uint16
+from recorder import Recorder
+from sdkexecutor import Executor, READOUT, CONTROL, HOUSEKEEPING
+from sdkprofile import SdkProfiler, StatsLogger
+from sharedframes import SharedFrameRing
+from spool import SpoolReader
 
 try:
     from cameras import camera_keys as _camera_keys
@@ -82,8 +93,70 @@ TRIGGERS = {-1: 'off',
             10: 'software',
             12: 'ex-chrge'}
 
+
+class DllLock(object):
+    """A lock held by one Camera at a time.
+
+    Any thread may acquire the lock for the Camera that holds it, so
+    Camera methods can call other methods, and a Camera's threads do
+    not wait for each other. The lock is released when every
+    acquisition has been released.
+    """
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.owner = None
+        self.count = 0
+
+
+    def acquire(self, owner):
+        with self.condition:
+            while self.count and self.owner is not owner:
+                self.condition.wait()
+            self.owner = owner
+            self.count += 1
+
+
+    def release(self):
+        with self.condition:
+            self.count -= 1
+            if self.count == 0:
+                self.owner = None
+                self.condition.notify()
+
+
+## Settings that may change while the camera acquires. Changing any
+## other setting stops the acquisition, and restarts it afterwards.
+LIVE_SETTINGS = frozenset(['EMGain', 'targetTemperature', 'pathTransform',
+                           'batchReadout', 'dispatchBatchSize',
+                           'dispatchBatchTimeout', 'waitStrategy',
+                           'correction', 'sendSequence'])
+## Settings that change the image size, and so the frame buffers.
+IMAGE_SETTINGS = frozenset(['roi', 'binning', 'isolatedCrop'])
+## Settings after which the vertical shift speed is set again.
+VS_SPEED_SETTINGS = frozenset(['amplifierMode', 'frameTransfer'])
+## Order in which settings are applied. The amplifier comes first, as
+## it determines the valid range of other settings; others follow.
+SETTINGS_ORDER = ('amplifierMode', 'frameTransfer', 'triggerMode',
+                  'fastTrigger', 'exposureTime', 'EMGain')
+## Settings on which read-out and keep-clean times depend.
+TIMING_KEYS = ('amplifierMode', 'binning', 'roi', 'isolatedCrop',
+               'frameTransfer', 'triggerMode', 'fastTrigger')
+## Default seconds between status samples, when idle and when streaming.
+STATUS_INTERVAL = 1.
+STATUS_STREAMING_INTERVAL = 10.
+## Default number of status samples kept in a monitor's history.
+STATUS_HISTORY = 600
+## Default number of frames averaged for a dark or a flat.
+CORRECTION_FRAMES = 16
+
 ## A lock to prevent concurrent calls to the DLL by different Cameras.
-dll_lock = threading.Lock()
+dll_lock = DllLock()
+## Value of the handle last passed to SetCurrentCamera by select_camera.
+current_handle = None
+## The Camera whose method is running, in each thread, for the executor.
+camera_context = threading.local()
+## Thread that logs the SDK profiler's stats, if started.
+sdk_stats_logger = None
 
 
 # Amplfier modes are defined by the AD channel, amplifier type,
@@ -123,38 +196,160 @@ AMPLIFIER_MODES = {
     }
 
 
+def select_camera(handle):
+    """Make the camera with handle the DLL's current camera.
+
+    SetCurrentCamera is only called if a different camera was selected
+    last. Call with dll_lock held. In a process with several cameras,
+    select cameras with this function or Camera methods, rather than by
+    calling SetCurrentCamera directly.
+    """
+    global current_handle
+    if handle.value != current_handle:
+        sdk.SetCurrentCamera(handle)
+        current_handle = handle.value
+
+
+def acquire_dll_lock(cam):
+    """Acquire dll_lock for cam, recording the wait if profiling."""
+    profiler = sdk.profiler
+    if profiler is None:
+        dll_lock.acquire(cam)
+    else:
+        profiler.acquire(dll_lock, cam)
+
+
+def run_for_camera(cam, func, args, kwargs):
+    """Call func for cam: lock the DLL and select cam, if need be."""
+    if cam is None or cam.singleton:
+        return func(*args, **kwargs)
+    acquire_dll_lock(cam)
+    try:
+        select_camera(cam.handle)
+        return func(*args, **kwargs)
+    finally:
+        dll_lock.release()
+
+
+## Priority of DLL calls on an executor, by function: the default is
+# CONTROL.
+CALL_PRIORITIES = dict(
+    [(name, READOUT) for name in sdk.FAST_FUNCTIONS] +
+    [(name, HOUSEKEEPING) for name in (
+        'GetAcquisitionProgress', 'GetStatus', 'GetTemperature',
+        'GetTemperatureF', 'GetTemperatureStatus',
+        'GetTotalNumberImagesAcquired', 'GetSizeOfCircularBuffer')])
+
+
+class CameraExecutor(Executor):
+    """An Executor for calls to the DLL.
+
+    Each call is queued with the priority of its function, and run for
+    the Camera whose method made it, by run_for_camera. So calls for
+    one Camera do not wait behind another Camera's methods, only behind
+    other calls.
+    """
+    def call(self, func, args, kwargs, cam=None, priority=None):
+        """Run func on a worker thread, and return its result."""
+        if cam is None:
+            cam = getattr(camera_context, 'camera', None)
+        if priority is None:
+            priority = CALL_PRIORITIES.get(func.__name__, CONTROL)
+        return self.submit(priority, run_for_camera,
+                           cam, func, args, kwargs).result()
+
+
+    def call_here(self, func, args, kwargs, cam=None):
+        """Run func in the calling thread, with the camera selected.
+
+        For calls that must not queue behind a worker, such as CancelWait,
+        which ends a wait a worker may be blocked in."""
+        if cam is None:
+            cam = getattr(camera_context, 'camera', None)
+        # Act as a worker, so that SetCurrentCamera is not queued behind
+        # calls that wait for the lock held here.
+        worker, self.local.worker = self.in_worker(), True
+        try:
+            return run_for_camera(cam, func, args, kwargs)
+        finally:
+            self.local.worker = worker
+
+
+def start_executor(n_threads=1):
+    """Run DLL calls from this process on n_threads executor threads.
+
+    Frame readout goes ahead of other calls, and status queries go
+    last. Several threads only help while a call blocks in the DLL, as
+    calls for different cameras still take turns."""
+    if sdk.executor is None:
+        sdk.executor = CameraExecutor(n_threads, 'SdkExecutor')
+    return sdk.executor
+
+
+def stop_executor():
+    """Run DLL calls in the calling threads again."""
+    executor, sdk.executor = sdk.executor, None
+    if executor is not None:
+        executor.stop()
+
+
+def start_sdk_profile(log=None, log_interval=None):
+    """Time DLL calls from this process, and waits for the DLL lock.
+
+    If log_interval is given, a summary of the stats is passed to log
+    every log_interval seconds, replacing any earlier logger."""
+    global sdk_stats_logger
+    if sdk.profiler is None:
+        sdk.profiler = SdkProfiler()
+    if log and log_interval:
+        stop_sdk_log()
+        sdk_stats_logger = StatsLogger(sdk.profiler, log, log_interval)
+        sdk_stats_logger.start()
+    return sdk.profiler
+
+
+def stop_sdk_profile():
+    """Stop timing DLL calls, and return the profiler, or None."""
+    profiler, sdk.profiler = sdk.profiler, None
+    stop_sdk_log()
+    return profiler
+
+
+def stop_sdk_log():
+    """Stop logging the profiler's stats, if they are being logged."""
+    global sdk_stats_logger
+    logger, sdk_stats_logger = sdk_stats_logger, None
+    if logger is not None:
+        logger.stop()
+
+
 def with_camera(func):
     """A decorator for camera functions.
 
     If there are multiple cameras per process, this decorator obtains a
-    lock on the DLL and calls SetCurrentCamera to ensure that the
-    library acts on the correct piece of hardware.
+    lock on the DLL and calls select_camera to ensure that the
+    library acts on the correct piece of hardware. With an executor,
+    it instead records the camera for the executor to select.
     """
     @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
-        if not self.singleton:
-            # There may be > 1 cameras per process, so lock the DLL.
-            had_lock_on_entry = self.has_lock
-            if not had_lock_on_entry:
-                dll_lock.acquire()
-                self.has_lock = True
+        if sdk.executor is not None:
+            previous = getattr(camera_context, 'camera', None)
+            camera_context.camera = self
             try:
-                sdk.SetCurrentCamera(self.handle)
-                result = func(self, *args, **kwargs)
-            except:
-                if dll_lock.locked():
-                    dll_lock.release()
-                    self.has_lock = False
-                raise
-            if dll_lock.locked() and not had_lock_on_entry:
-                dll_lock.release()
-                self.has_lock = False
-
-        else:
+                return func(self, *args, **kwargs)
+            finally:
+                camera_context.camera = previous
+        if self.singleton:
             # There is only 1 camera per process - no locks required.
-            result = func(self, *args, **kwargs)
-
-        return result
+            return func(self, *args, **kwargs)
+        # There may be > 1 cameras per process, so lock the DLL.
+        acquire_dll_lock(self)
+        try:
+            select_camera(self.handle)
+            return func(self, *args, **kwargs)
+        finally:
+            dll_lock.release()
     return wrapper
 
 
@@ -172,6 +367,108 @@ def sdk_call(func):
     return sdk_wrapper
 
 
+def fast_method(func):
+    """Make a Camera method from a function from sdk.bind_fast.
+
+    This does the work of both 'sdk_call' and 'with_camera' in a single
+    wrapper, for DLL functions called for every frame.
+    """
+    def method(self, *args):
+        profiler = sdk.profiler
+        if profiler is None:
+            call = func
+        else:
+            call = profiler.call
+            args = (func,) + args
+        executor = sdk.executor
+        if executor is not None:
+            return executor.call(call, args, {}, self, READOUT)
+        if self.singleton:
+            # There is only 1 camera per process - no locks required.
+            return call(*args)
+        acquire_dll_lock(self)
+        try:
+            select_camera(self.handle)
+            return call(*args)
+        finally:
+            dll_lock.release()
+    method.__name__ = func.__name__
+    return method
+
+
+def freeze(value):
+    """Return a hashable equivalent of a settings value."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def cached(func):
+    """A decorator for Camera methods whose results do not change while
+    the camera is initialised.
+
+    Results are kept in the camera's property_cache, by method name and
+    arguments, until Initialize or ShutDown clears the cache.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args):
+        key = (func.__name__,) + args
+        try:
+            return self.property_cache[key]
+        except KeyError:
+            value = self.property_cache[key] = func(self, *args)
+            return value
+    return wrapper
+
+
+def cached_timing(func):
+    """A decorator like 'cached', for timings that depend on settings.
+
+    Results are also keyed by the acquisition mode, vertical shift speed
+    and the settings in TIMING_KEYS, so each combination is only
+    fetched once.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args):
+        key = (func.__name__, self.acquisition_mode, self.vs_speed,
+               tuple(freeze(self.settings.get(k)) for k in TIMING_KEYS))
+        key += args
+        try:
+            return self.property_cache[key]
+        except KeyError:
+            value = self.property_cache[key] = func(self, *args)
+            return value
+    return wrapper
+
+
+class SdkMethod(object):
+    """A descriptor that makes a DLL method of a class on first access.
+
+    The DLL function is bound, then replaced on the class by the method,
+    so later lookups find the method directly. If fast, the method is
+    made by fast_method, and named 'fast_' + name.
+    """
+    def __init__(self, name, fast=False):
+        self.name = name
+        self.fast = fast
+
+
+    def __get__(self, instance, owner):
+        attr = self.name
+        if self.fast:
+            method = fast_method(sdk.bind_fast(self.name))
+            attr = method.__name__ = 'fast_' + self.name
+        elif self.name in sdk.HANDLE_FUNCTIONS:
+            # These act on the camera they are passed, so need no lock.
+            method = sdk_call(sdk.bind(self.name))
+        else:
+            method = with_camera(sdk_call(sdk.bind(self.name)))
+        setattr(owner, attr, method)
+        return method.__get__(instance, owner)
+
+
 class CameraMeta(type):
     """A metaclass that adds DLL methods to the Camera class.
 
@@ -181,13 +478,33 @@ class CameraMeta(type):
     * the DLL is set to act on the Camera instance;
     * the DLL method is called;
     * the lock is released.
+    Methods are made on first use, by SdkMethod descriptors, for DLL
+    functions the class does not define itself. Methods for
+    sdk.HANDLE_FUNCTIONS are only wrapped by 'sdk_call', so they do not
+    wait for the lock. sdk.FAST_FUNCTIONS also have methods named with
+    a 'fast_' prefix, for readout: these use a single 'fast_method'
+    wrapper, and return just the status.
     """
     def __new__(meta, classname, supers, classdict):
         for f in sdk.camerafuncs:
-            classdict[f.__name__] = with_camera(sdk_call(f))
+            # Methods defined by the class take precedence.
+            classdict.setdefault(f.__name__, SdkMethod(f.__name__))
+        for name in sdk.FAST_FUNCTIONS:
+            classdict.setdefault('fast_' + name, SdkMethod(name, fast=True))
         return type.__new__(meta, classname, supers, classdict)
 
 
+def is_local_uri(uri):
+    """Return True if a Pyro URI refers to an object on this host."""
+    host = Pyro4.URI(uri).host
+    if host == 'localhost' or host.startswith('127.'):
+        return True
+    addresses = set([socket.gethostname(), socket.getfqdn()])
+    for nic in psutil.net_if_addrs().values():
+        addresses.update(addr.address for addr in nic)
+    return host in addresses
+
+
 class CameraLogger(object):
     def __init__(self):
         self.fh = None
@@ -228,6 +545,7 @@ class Camera(object):
         """Context-manager exit - call ShutDown to free camera."""
         ## Shut down the camera.
         print "Shutting down camera with handle %s." % self.handle
+        self.stop_status_monitor()
         try:
             self.ShutDown()
         except:
@@ -242,18 +560,49 @@ class Camera(object):
         self.ShutDown()
 
 
+    @with_camera
+    def Initialize(self, directory):
+        """Initialise the camera, and cache its static properties."""
+        self.clear_cache()
+        result = sdk.Initialize(directory)
+        self.describe()
+        return result
+
+
+    @with_camera
+    def ShutDown(self):
+        """Shut down the camera, and clear cached properties."""
+        self.clear_cache()
+        return sdk.ShutDown()
+
+
+    def clear_cache(self):
+        """Discard cached properties and timings."""
+        self.property_cache = {}
+
+
     def __init__(self, handle, singleton=False):
         """Init a Camera instance for hardware with ID=handle."""
         # Number of exposures fetched since last StartAcquisition.
         self.count = 0
         # SDK's handle for the camera
         self.handle = handle
-        # Does this camera have the lock on the DLL?
-        self.has_lock = False
         # Detector dimensions in pixels.
         self.nx, self.ny = None, None
+        # Shape of read-out images, after ROI and binning.
+        self.image_shape = None
         # Detector capabilties.
         self.caps = sdk.AndorCapabilities()
+        # Vertical shift speed, from set_fastest_vs_speed.
+        self.vs_speed = None
+        # Results of 'cached' and 'cached_timing' methods.
+        self.property_cache = {}
+        # Description of the last settings update.
+        self.settings_report = None
+        # Length, accumulations and image shape of the kinetic series.
+        self.kinetic_series = None
+        # Length, sub-frame shape and timings of the fast kinetics series.
+        self.fast_kinetics = None
         # Is this the only camera in this process?
         self.singleton = singleton
         # Is the camera enabled?
@@ -266,7 +615,62 @@ class Camera(object):
         self.data_thread = None
         self.settings = {}
         self.client = None
+        # Does the client receive frames through a shared-memory ring?
+        self.shared_transport = False
+        # Shared-memory ring for frames sent to a client on this host.
+        self.shared_ring = None
+        # Recorder that streams frames to disk.
+        self.recorder = None
+        # Dark, flat and defect maps, by get_correction_key.
+        self.corrections = CorrectionCache()
+        # Spool configuration and reader, if the SDK is spooling.
+        self.spool = None
+        self.spool_reader = None
         self.logger = CameraLogger()
+        # Thread that samples status in the background.
+        self.status_monitor = None
+
+
+    def submit(self, name, *args):
+        """Queue DLL function name for this camera; return a Future.
+
+        The Future's result is what the method name would return. This
+        needs an executor: see start_executor."""
+        executor = sdk.executor
+        if executor is None:
+            raise Exception('No SDK executor: call start_executor first.')
+        return executor.submit(CALL_PRIORITIES.get(name, CONTROL),
+                               run_for_camera, self, sdk.bind(name), args, {})
+
+
+    def get_executor_stats(self):
+        """Return queue waits on the SDK executor, or None if not in use."""
+        executor = sdk.executor
+        if executor is None:
+            return None
+        return executor.get_stats()
+
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Make a batch of DLL calls under one acquisition of dll_lock.
+
+        Use in a with statement: this Camera's methods called in its
+        body do not wait for the lock, and do not call SetCurrentCamera.
+        Other Cameras wait until the body is done, so methods of other
+        Cameras must not be called in the body.
+
+        With an executor, calls in the body are queued one by one, as
+        holding the lock here could block the executor's threads."""
+        if self.singleton or sdk.executor is not None:
+            yield self
+            return
+        acquire_dll_lock(self)
+        try:
+            select_camera(self.handle)
+            yield self
+        finally:
+            dll_lock.release()
 
 
     ### Client functions. ###
@@ -277,39 +681,48 @@ class Camera(object):
 
 
     @with_camera
-    def arm(self):
-        self.logger.log('Arming camera.')
-        if not self.is_ready():
-            pass
-        #    raise Exception("Camera not ready.")
+    def prepare_readout(self, image=True, shutter=1):
+        """Set the shutter, and set image read mode and region.
 
-        # Open the shutter.
+        The shutter is opened, unless shutter is 2 to close it. The
+        region is not set if image is False."""
         # SetShutter(type, mode, t_close_ms, t_open_ms)
         # type = 0: TTL high = open; 1: TTL low = open
         # mode = 0: auto, 1: open; 2: closed
-        self.SetShutter(1, 1, 1, 1)
+        self.SetShutter(1, shutter, 1, 1)
         # SetReadMode to image.
         self.SetReadMode(4)
-        # Set image to full sensor.
-        self.SetImage(1, 1, 1, self.nx, 1, self.ny)
+        # Set image to the region of interest.
+        if image:
+            self.set_image()
+
+
+    @with_camera
+    def arm(self):
+        self.logger.log('Arming camera.')
+        if not self.is_ready():
+            pass
+        #    raise Exception("Camera not ready.")
+
+        self.prepare_readout()
         # Reset image count.
         self.count = 0
 
         # Make sure there is a data thread running.
-        if not self.data_thread or not self.data_thread.is_alive():
-            self.logger.log('Starting data thread.')
-            self.data_thread = DataThread(self, self.client)
-            self.update_transform()
-            self.data_thread.start()
+        self.start_data_thread()
 
         # Set camera to espond to triggers.
         self.logger.log('Starting acquisition.')
-        try:
-            self.StartAcquisition()
-        except:
-            raise
-        else:
-            self.acquiring = True
+        self.start_acquisition()
+
+
+    @with_camera
+    def start_acquisition(self):
+        """Start acquiring, with sequence numbers counted from 1."""
+        if self.data_thread is not None:
+            self.data_thread.reset_sequence(self.get_acquisition_timings()[2])
+        self.StartAcquisition()
+        self.acquiring = True
 
 
     @with_camera
@@ -320,11 +733,7 @@ class Camera(object):
             self.abort()
         except:
             pass
-        if self.data_thread:
-            if self.data_thread.is_alive():
-                self.data_thread.stop()
-                self.data_thread.join(5)
-            self.data_thread = None
+        self.stop_data_thread()
 
 
     @with_camera
@@ -371,12 +780,20 @@ class Camera(object):
         # determine frame transfer usage with SetFrameTransferMode.
         # In old UCSF code, this was achieved by using acquisition mode 7.
         self.set_acquisition_mode(5)
+        if self.kinetic_series is not None:
+            # Undo the kinetic series' timings, which also apply here.
+            self.SetNumberAccumulations(1)
+            self.SetKineticCycleTime(0.)
+            self.kinetic_series = None
+        self.fast_kinetics = None
 
 
+        # This also sets the vertical shift speed.
         self.update_settings(settings, init=True)
 
-        # Recalculate VS speed.
-        self.set_fastest_vs_speed()
+        # Make the shared ring of a client that registered before the
+        # detector size was known.
+        self.update_shared_ring()
 
         # Set enabled indicator flag.
         self.enabled = True
@@ -389,21 +806,25 @@ class Camera(object):
 
 
     def get_image_size(self):
-        return (self.nx, self.ny)
+        """Return (nx, ny) of read-out images, after ROI and binning."""
+        ny, nx = self.get_image_shape()
+        return (nx, ny)
+
+
+    def get_image_shape(self):
+        """Return the (ny, nx) shape of read-out images."""
+        return self.image_shape or (self.ny, self.nx)
 
 
     @with_camera
     def get_exposure_time(self):
+        # The SDK gives the time of each exposure in every mode: an image
+        # in accumulate or kinetic series mode may sum several.
         (exposure, accumulate, kinetics) = self.get_acquisition_timings()
-        if self.acquisition_mode in [1, 5]:
-            # single exposure or run untul abort
-            t = exposure
-        elif self.acquisition_mode == 2:
-            # accumulate mode
-            t = accumulate
-        elif self.acquisition_mode in [3, 4]:
-            # kinetics or fast kinetics
-            t = kinetics
+        t = exposure
+        if self.acquisition_mode == 4:
+            # fast kinetics: the time of each sub-frame's exposure
+            t = self.get_fk_exposure_time()
         # Assume worst-case floating point underestimation
         return t + t * EPSILON
 
@@ -425,6 +846,15 @@ class Camera(object):
         elif self.acquisition_mode == 2:
             # accumulate mode
             return accumulate - exposure
+        elif self.acquisition_mode == 3 and self.kinetic_series:
+            # kinetic series: exposures within an image are closer
+            # together than the last of one image and the next image's.
+            if self.kinetic_series['accumulations'] > 1:
+                return accumulate - exposure
+            return kinetics - exposure
+        elif self.acquisition_mode == 4 and self.fast_kinetics:
+            # fast kinetics: sub-frames are shifted between exposures
+            return self.fast_kinetics['shiftTime']
         elif self.acquisition_mode in [3, 4]:
             # kinetics mode
             return kinetics - exposure
@@ -434,9 +864,37 @@ class Camera(object):
             return 0.1
 
 
+    def get_dispatch_stats(self):
+        """Return frame queue occupancy, overflow policy and drop counts."""
+        if self.data_thread is None:
+            return None
+        return self.data_thread.queue.get_stats()
+
+
+    def get_drop_stats(self):
+        """Return counts of images read out and lost, by cause.
+
+        See DataThread.get_drop_stats."""
+        if self.data_thread is None:
+            return None
+        return self.data_thread.get_drop_stats()
+
+
+    def get_frame_pool_stats(self):
+        """Return size, occupancy and high-water mark of the frame pool."""
+        if self.data_thread is None:
+            return None
+        return self.data_thread.pool.get_stats()
+
+
     def get_settings(self):
-        """Return the current settings dict. Useful for Pyro debug."""
-        return self.settings
+        """Return the current settings dict. Useful for Pyro debug.
+
+        Dispatch batching settings are included even if never set."""
+        settings = dict(self.settings)
+        settings.setdefault('dispatchBatchSize', 1)
+        settings.setdefault('dispatchBatchTimeout', DISPATCH_BATCH_TIMEOUT)
+        return settings
 
 
     @with_camera
@@ -459,20 +917,419 @@ class Camera(object):
         self.enabled = False
 
 
-    def receiveClient(self, uri):
-        """Handle connection request from cockpit client."""
+    def receiveClient(self, uri, transport='pyro'):
+        """Handle connection request from cockpit client.
+
+        With transport='shm', a client on this host receives frames
+        through a SharedFrameRing, and only a descriptor of each frame
+        is sent over Pyro. The ring's description is returned so that
+        the client can attach to it. Remote clients fall back to 'pyro'
+        transport, for which None is returned. None is also returned if
+        the camera is not yet initialized: the ring is then made by
+        enable, and get_shared_ring describes it. The ring holds float32
+        frames if the correction setting is 'float32' when it is made,
+        and uint16 frames otherwise: frames are converted to its dtype."""
+        if self.shared_ring is not None:
+            if self.data_thread is not None:
+                self.data_thread.set_client(None)
+            self.shared_ring.close()
+            self.shared_ring = None
+        self.shared_transport = False
+
         if uri is None:
             self.logger.log('Clearing receiveClient.')
             self.client = None
         else:
             self.logger.log('Setting receiveClient to ' + uri + '.')
             self.client = Pyro4.Proxy(uri)
-            if self.data_thread is not None:
-                self.logger.log('receiveClient set in data_thread.')
-                self.data_thread.set_client(self.client)
+            if transport == 'shm':
+                if is_local_uri(uri):
+                    self.shared_transport = True
+                    self.update_shared_ring()
+                else:
+                    self.logger.log('Client is not local: using pyro transport.')
+
+        if self.data_thread is not None:
+            self.logger.log('receiveClient set in data_thread.')
+            self.data_thread.set_client(self.client, self.shared_ring)
+
+        return self.get_shared_ring()
+
+
+    def update_shared_ring(self):
+        """Make the shared ring the client asked for, if there is none.
+
+        Slots hold a whole detector frame, so the ring is made once the
+        detector size is known."""
+        if not self.shared_transport or self.shared_ring is not None:
+            return
+        if self.nx is None:
+            try:
+                self.get_detector()
+            except Exception as e:
+                self.logger.log('Shared ring made on enable: %s' % e)
+                return
+        # Frames corrected to float32 need float32 slots.
+        dtype = ('float32' if self.settings.get('correction') == 'float32'
+                 else 'uint16')
+        self.shared_ring = SharedFrameRing(
+            'andor_%d_%d' % (os.getpid(), id(self.client)),
+            self.settings.get('sharedSlots', SHARED_SLOTS),
+            self.nx * self.ny, dtype=dtype, create=True)
+        self.logger.log('Sending frames through shared ring %s.'
+                        % self.shared_ring.name)
+        if self.data_thread is not None:
+            self.data_thread.set_client(self.client, self.shared_ring)
+
+
+    def get_shared_ring(self):
+        """Return the description of the client's shared ring, or None."""
+        if self.shared_ring is not None:
+            return self.shared_ring.describe()
+
+
+    def start_recording(self, path, n_frames, format='raw', depth=64):
+        """Stream the next n_frames frames to disk at path.
+
+        Frames are recorded as read out, before skips, transforms and
+        dispatch, alongside any live client. See recorder.Recorder."""
+        if self.recorder is not None:
+            self.stop_recording()
+        self.recorder = Recorder(path, self.get_image_shape(), n_frames,
+                                 format=format, depth=depth,
+                                 settings=self.get_settings())
+        self.recorder.start()
+        if self.data_thread is not None:
+            self.data_thread.recorder = self.recorder
+        self.logger.log('Recording %d frames to %s.' % (n_frames, path))
+
+
+    def stop_recording(self):
+        """Stop recording and return the recording status."""
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return None
+        if self.data_thread is not None:
+            self.data_thread.recorder = None
+        recorder.stop()
+        recorder.join()
+        status = recorder.get_status()
+        self.logger.log('Recorded %d frames to %s.'
+                        % (status['written'], status['path']))
+        return status
+
+
+    def get_recording_status(self):
+        if self.recorder is None:
+            return None
+        return self.recorder.get_status()
+
+
+    def get_correction_key(self):
+        """Return the key of correction maps for the current settings.
+
+        Maps are kept for each amplifier mode, exposure time and EM
+        gain, and for each image region and binning, which set their
+        shape."""
+        exposure = self.settings.get('exposureTime')
+        return (freeze(self.settings.get('amplifierMode')),
+                None if exposure is None else round(float(exposure), 6),
+                self.settings.get('EMGain'),
+                tuple(freeze(self.settings.get(key))
+                      for key in sorted(IMAGE_SETTINGS)))
+
+
+    def update_correction(self):
+        """Have the data thread correct frames with the current maps.
+
+        Frames are corrected into the dtype set by the 'correction'
+        setting, or sent uncorrected if it is None or there are no
+        maps for the current settings."""
+        if self.data_thread is None:
+            return
+        output = self.settings.get('correction')
+        maps = self.corrections.get(self.get_correction_key())
+        if output and maps is None:
+            self.logger.log('No correction maps for these settings: '
+                            'frames are sent uncorrected.')
+        self.data_thread.set_correction(maps, output)
+
+
+    def capture_frames(self, n_frames, dark=False):
+        """Return a stack of n_frames frames at the current settings.
+
+        Frames are acquired as a kinetic series, with the shutter closed
+        if dark, and are not transformed. Streaming stops, and resumes
+        after if the camera was enabled. dll_lock is only held for each
+        SDK call, not while waiting for the series, so other cameras
+        are not held up."""
+        enabled = self.enabled
+        self.start_kinetic_series(n_frames, dark=dark)
+        try:
+            self.wait_kinetic_series()
+            frames = self.read_kinetic_series(transform=False)
+        finally:
+            if enabled:
+                self.enable(dict(self.settings))
+        if frames is None or len(frames) < n_frames:
+            raise Exception('Captured %d of %d frames.' % (
+                0 if frames is None else len(frames), n_frames))
+        return frames
+
+
+    def capture_dark(self, n_frames=CORRECTION_FRAMES,
+                     hot_threshold=HOT_PIXEL_THRESHOLD):
+        """Average n_frames dark frames, as the dark for these settings.
+
+        Hot pixels in the dark are treated as defects, unless
+        hot_threshold is None. Returns a summary of the maps."""
+        frames = self.capture_frames(n_frames, dark=True)
+        maps = self.corrections.change(self.get_correction_key(),
+                                       frames.shape[1:], 'set_dark', frames,
+                                       hot_threshold=hot_threshold)
+        self.update_correction()
+        self.logger.log('Captured dark from %d frames: %d hot pixels.'
+                        % (n_frames, maps.describe()['hotPixels']))
+        return maps.describe()
+
+
+    def capture_flat(self, n_frames=CORRECTION_FRAMES,
+                     dead_threshold=DEAD_PIXEL_THRESHOLD):
+        """Average n_frames lit frames, as the flat for these settings.
+
+        Capture a dark first, so that it is subtracted. Pixels with a
+        response below dead_threshold are treated as defects, unless it
+        is None. Returns a summary of the maps."""
+        frames = self.capture_frames(n_frames)
+        maps = self.corrections.change(self.get_correction_key(),
+                                       frames.shape[1:], 'set_flat', frames,
+                                       dead_threshold=dead_threshold)
+        self.update_correction()
+        self.logger.log('Captured flat from %d frames: %d dead pixels.'
+                        % (n_frames, maps.describe()['deadPixels']))
+        return maps.describe()
+
+
+    def load_flat(self, flat, dead_threshold=DEAD_PIXEL_THRESHOLD):
+        """Set the flat for these settings from a response map.
+
+        flat is an array, or the path of a .npy file, of the read-out
+        image's shape, and is normalised to a mean of 1."""
+        maps = self.corrections.change(self.get_correction_key(),
+                                       self.get_image_shape(), 'set_flat', flat,
+                                       dead_threshold=dead_threshold)
+        self.update_correction()
+        return maps.describe()
+
+
+    def load_defects(self, defects):
+        """Set the known defects for these settings from a mask.
+
+        defects is a boolean array, or the path of a .npy file, of the
+        read-out image's shape."""
+        maps = self.corrections.change(self.get_correction_key(),
+                                       self.get_image_shape(), 'set_defects',
+                                       defects)
+        self.update_correction()
+        return maps.describe()
+
+
+    def discard_corrections(self, all=False):
+        """Discard the maps for these settings, or for all settings."""
+        self.corrections.discard(None if all else self.get_correction_key())
+        self.update_correction()
+
+
+    def get_correction_status(self):
+        """Return the correction output, and a summary of the maps for
+        these settings, or None if there are none."""
+        maps = self.corrections.get(self.get_correction_key())
+        return {'output': self.settings.get('correction'),
+                'maps': None if maps is None else maps.describe(),
+                'cached': len(self.corrections.maps)}
+
+
+    def start_sdk_profile(self, log_interval=None):
+        """Start timing DLL calls, and waits for the DLL lock.
+
+        The profiler is shared by all cameras in this process; see the
+        module's start_sdk_profile. If log_interval is given, a summary
+        of the stats is written to this camera's log every log_interval
+        seconds, in place of any other camera's."""
+        start_sdk_profile(self.logger.log, log_interval)
+        self.logger.log('Profiling SDK calls.')
+
+
+    def stop_sdk_profile(self):
+        """Stop timing DLL calls for every camera, and return the stats
+        collected."""
+        profiler = stop_sdk_profile()
+        if profiler is None:
+            return None
+        for line in profiler.format_stats():
+            self.logger.log(line)
+        return profiler.get_stats()
+
+
+    def start_status_monitor(self, interval=STATUS_INTERVAL,
+                             streaming_interval=STATUS_STREAMING_INTERVAL,
+                             history=STATUS_HISTORY):
+        """Sample status in the background, and answer queries from it.
+
+        While the monitor runs, get_temperature and is_ready return the
+        latest sample instead of calling the DLL. See StatusMonitor."""
+        self.stop_status_monitor()
+        self.status_monitor = StatusMonitor(self, interval,
+                                            streaming_interval, history)
+        self.status_monitor.start()
+        self.logger.log('Started status monitor.')
+
+
+    def stop_status_monitor(self):
+        if self.status_monitor is not None:
+            self.status_monitor.stop()
+            self.status_monitor = None
+
+
+    def get_status_snapshot(self):
+        """Return the latest status sample, or None if not monitoring."""
+        monitor = self.status_monitor
+        if monitor is None:
+            return None
+        return monitor.snapshot
+
+
+    def get_status_history(self, since=None):
+        """Return status samples taken after time since, oldest first."""
+        monitor = self.status_monitor
+        if monitor is None:
+            return []
+        history = list(monitor.history)
+        if since is not None:
+            history = [sample for sample in history if sample['time'] > since]
+        return history
+
+
+    @with_camera
+    def read_status(self):
+        """Read temperature, cooler state, status and progress.
+
+        Returns a dict with keys time, temperature, temperatureStatus,
+        coolerOn, status, accumulations and series."""
+        temperature = self.read_temperature()
+        cooler = c_int()
+        sdk.IsCoolerOn(cooler)
+        status = c_int()
+        sdk.GetStatus(status)
+        accumulations, series = c_long(), c_long()
+        sdk.GetAcquisitionProgress(accumulations, series)
+        return {'time': time.time(),
+                'temperature': temperature,
+                'temperatureStatus': self.temperature_state[0],
+                'coolerOn': bool(cooler.value),
+                'status': status.value,
+                'accumulations': accumulations.value,
+                'series': series.value}
+
+
+    def get_sdk_stats(self, reset=False):
+        """Return DLL call stats, or None if not profiling.
+
+        If reset is True, the stats are cleared after they are read."""
+        profiler = sdk.profiler
+        if profiler is None:
+            return None
+        stats = profiler.get_stats()
+        if reset:
+            profiler.reset()
+        return stats
+
+
+    @with_camera
+    def start_spool(self, stem, method=2, frame_buffer_size=10, threads=None):
+        """Have the SDK spool acquired frames to files named stem*.
+
+        Any current acquisition is restarted so that spooling takes
+        effect. threads sets the number of spool threads on cameras
+        that support SetSpoolThreadCount."""
+        if not self.caps.ulFeatures & sdk.AC_FEATURES_SPOOLING:
+            raise Exception('Camera does not support spooling.')
+        acquiring_on_entry = self.acquiring
+        if acquiring_on_entry:
+            self.abort()
+        if (threads is not None and
+                self.caps.ulSetFunctions & sdk.AC_SETFUNCTION_SPOOLTHREADCOUNT):
+            self.SetSpoolThreadCount(int(threads))
+        self.SetSpool(1, int(method), str(stem), int(frame_buffer_size))
+        self.spool = {'active': True,
+                      'stem': stem,
+                      'method': method,
+                      'frameBufferSize': frame_buffer_size,
+                      'threads': threads}
+        self.spool_reader = None
+        self.logger.log('Spooling to %s with method %d.' % (stem, method))
+        if acquiring_on_entry:
+            self.start_acquisition()
+
+
+    @with_camera
+    def stop_spool(self):
+        """Stop spooling. Spooled files remain readable with read_spool.
+
+        As for start_spool, any current acquisition is restarted so that
+        the change takes effect."""
+        if self.spool is None or not self.spool['active']:
+            return
+        acquiring_on_entry = self.acquiring
+        if acquiring_on_entry:
+            self.abort()
+        self.SetSpool(0, int(self.spool['method']), str(self.spool['stem']),
+                      int(self.spool['frameBufferSize']))
+        self.spool['active'] = False
+        self.logger.log('Stopped spooling to %s.' % self.spool['stem'])
+        if acquiring_on_entry:
+            self.start_acquisition()
+
+
+    def get_spool_reader(self):
+        """Return a SpoolReader for the current spool, or None."""
+        if self.spool is None:
+            return None
+        if self.spool_reader is None:
+            self.spool_reader = SpoolReader(
+                self.spool['stem'], self.get_image_shape(), self.spool['method'],
+                accumulating=self.acquisition_mode == 2)
+        return self.spool_reader
+
+
+    @with_camera
+    def get_spool_progress(self):
+        """Return images acquired, and images readable from spool files."""
+        if self.spool is None:
+            return None
+        reader = self.get_spool_reader()
+        on_disk = reader.refresh() if reader else 0
+        progress = dict(self.spool)
+        progress.update({'acquired': self.get_total_number_images_acquired(),
+                         'onDisk': on_disk})
+        return progress
+
+
+    def read_spool(self, start=0, count=None):
+        """Return a stack of spooled frames, read while acquiring."""
+        reader = self.get_spool_reader()
+        if reader is None:
+            return None
+        reader.refresh()
+        return reader.read(start, count)
 
 
     def skip_images(self, next=None, every=None):
+        """Skip images at readout.
+
+        Backpressure from slow clients is handled by the DataThread's
+        overflow policy; this is for clients that only want a subset
+        of the images."""
         if next:
             self.logger.log('Skipping next %d images.' % next)
             self.data_thread.skip_next_n_images = next
@@ -488,6 +1345,20 @@ class Camera(object):
             # Nothing to do.
             self.logger.log('Received transform %s. No data_thread to update.' % (transform,))
             return
+        t1, t2, t3, tprime = self.get_transforms()
+
+        # set this transform on the data_thread
+        self.data_thread.set_transform(tprime)
+        logstr =  'Updating data_thread transform:\n'
+        logstr += '  base:\t%s\n' % (t1,)
+        logstr += '  mode:\t%s\n' % (t2,)
+        logstr += '  path:\t%s\n' % (t3,)
+        logstr += '  result:\t%s\n' % (tprime,)
+        self.logger.log(logstr)
+
+
+    def get_transforms(self):
+        """Return base, readout-mode, path and resultant transforms."""
         amp_mode = self.settings.get('amplifierMode')
         flip = amp_mode.get('label').startswith('Conv')
 
@@ -500,20 +1371,23 @@ class Camera(object):
 
         # resultant transform
         tprime = tuple(t1[i] ^ t2[i] ^ t3[i] for i in range(3))
-
-        # set this transform on the data_thread
-        self.data_thread.set_transform(tprime)
-        logstr =  'Updating data_thread transform:\n'
-        logstr += '  base:\t%s\n' % (t1,)
-        logstr += '  mode:\t%s\n' % (t2,)
-        logstr += '  path:\t%s\n' % (t3,)
-        logstr += '  result:\t%s\n' % (tprime,)
-        self.logger.log(logstr)
+        return t1, t2, t3, tprime
 
     @with_camera
     def update_settings(self, settings, init=False):
+        """Apply new and changed settings.
+
+        Settings in LIVE_SETTINGS are applied while the camera acquires.
+        Any others stop the acquisition once for the whole batch, and
+        restart it after. If a setting fails, the previous settings are
+        restored and the error raised. get_settings_report describes the
+        last update.
+        """
+        t0 = time.time()
         # Store the triggering state on entry.
         acquiring_on_entry = self.acquiring
+        # Settings to restore if these fail.
+        previous = dict(self.settings)
 
         if init:
             # Assume nothing about state: set everything.
@@ -522,47 +1396,83 @@ class Camera(object):
             update_keys = set(self.settings.keys())
         else:
             # Only update new and changed values.
-            my_keys = set(self.settings.keys())
-            their_keys = set(settings.keys())
-            update_keys = set(key for key in
-                               my_keys.intersection(their_keys)
-                               if self.settings[key] != settings[key])
-
+            update_keys = set(key for key in settings
+                              if key not in self.settings
+                              or self.settings[key] != settings[key])
 
         if len(update_keys) == 0:
             # there is nothing to update
-            return self.enabled
-        else:
-            self.logger.log('Need to update %d settings:' % len(update_keys))
-
-        self.logger.log('Updating settings.')
-        # Clear the flag so that our client will poll until it is True.
-        self.enabled = False
-
-
-
+            return bool(self.enabled)
+
+        stop_keys = update_keys - LIVE_SETTINGS
+        self.logger.log('Need to update %d settings (%d live):' % (
+                len(update_keys), len(update_keys) - len(stop_keys)))
+        reinitialized = False
+        if stop_keys:
+            # Clear the flag so that our client will poll until it is True.
+            self.enabled = False
+            if acquiring_on_entry or init:
+                try:
+                    # Stop whatever the camera was doing.
+                    self.abort()
+                except Exception:
+                    self.Initialize('')
+                    reinitialized = True
 
+        # Update this camera's settings dict.
+        self.settings.update(settings)
 
+        error = None
         try:
-            # Stop whatever the camera was doing.
-            self.abort()
+            self.apply_settings(update_keys, init, vs_speed=reinitialized)
         except Exception:
+            error = sys.exc_info()
+            self.logger.log('Failed to apply settings: restoring previous.')
+            self.settings.clear()
+            self.settings.update(previous)
             try:
-                self.Initialize('')
-            except:
-                raise
+                # New settings have no previous value to restore.
+                self.apply_settings(update_keys.intersection(previous), init)
+            except Exception as e:
+                self.logger.log('Failed to restore settings: %s' % e)
 
-        # Update this camera's settings dict.
-        self.settings.update(settings)
+        if self.recorder is not None:
+            self.recorder.snapshot_settings(self.get_settings())
 
+        # Set enabled indicator flag.
+        self.enabled = True
 
+        restarted = bool(stop_keys and acquiring_on_entry)
+        if restarted:
+            self.start_acquisition()
+            self.logger.log('Resuming acquisition after settings updates.')
 
-        # Apply changed settings to the hardware.
-        for key in update_keys:
+        self.settings_report = {'keys': sorted(update_keys),
+                                'live': sorted(update_keys - stop_keys),
+                                'restarted': restarted,
+                                'failed': error is not None,
+                                'seconds': time.time() - t0}
+        self.logger.log('Applied settings in %.1f ms.' % (
+                1000 * self.settings_report['seconds']))
+        if error is not None:
+            raise error[0], error[1], error[2]
+        return bool(self.enabled)
+
+
+    @with_camera
+    def apply_settings(self, keys, init=False, vs_speed=False):
+        """Apply the settings in keys to the hardware, in SETTINGS_ORDER.
+
+        Called by update_settings, which stops the camera if any key is
+        not in LIVE_SETTINGS."""
+        order = lambda key: (SETTINGS_ORDER.index(key)
+                             if key in SETTINGS_ORDER
+                             else len(SETTINGS_ORDER))
+        for key in sorted(keys, key=order):
             val = self.settings.get(key, None)
             self.logger.log('   %s:  %s' % (key, val))
             if key == 'exposureTime':
-                self.set_exposure_time(float(val))
+                self.SetExposureTime(float(val))
             elif key == 'EMGain':
                 self.SetEMCCDGain(int(val))
             elif key == 'amplifierMode':
@@ -577,20 +1487,98 @@ class Camera(object):
                 self.SetFastExtTrigger(val)
             elif key == 'triggerMode':
                 self.SetTriggerMode(val)
-
+            elif key == 'hardwareTimestamps':
+                self.set_hardware_timestamps(val)
+            elif key == 'batchReadout':
+                if self.data_thread is not None:
+                    self.data_thread.batch = bool(val)
+            elif key in ('dispatchBatchSize', 'dispatchBatchTimeout'):
+                if self.data_thread is not None:
+                    self.data_thread.set_batching(
+                        self.settings.get('dispatchBatchSize', 1),
+                        self.settings.get('dispatchBatchTimeout',
+                                          DISPATCH_BATCH_TIMEOUT))
+            elif key == 'waitStrategy':
+                if self.data_thread is not None:
+                    self.data_thread.set_wait_strategy(val)
+            elif key == 'sendSequence':
+                if self.data_thread is not None:
+                    self.data_thread.send_sequence = bool(val)
+            elif key == 'correction':
+                if val is not None and val not in CORRECTION_OUTPUTS:
+                    raise Exception('Bad correction: expected None or one '
+                                    'of %s.' % ', '.join(CORRECTION_OUTPUTS))
+                ring = self.shared_ring
+                if (ring is not None and val == 'float32'
+                        and ring.dtype != numpy.float32):
+                    self.logger.log('Shared ring holds %s: float32 frames '
+                                    'are rounded to it until the client '
+                                    'registers again.' % ring.dtype)
+
+        if self.data_thread is not None:
+            self.data_thread.timestamp_source = self.get_timestamp_source()
+            # Maps are kept by settings, which may have changed.
+            self.update_correction()
 
         # Recalculate and apply fastest vertical shift speed.
-        self.set_fastest_vs_speed()
+        if init or vs_speed or keys & VS_SPEED_SETTINGS:
+            self.set_fastest_vs_speed()
 
-        # Set enabled indicator flag.
-        self.enabled = True
+        if keys & IMAGE_SETTINGS and not init:
+            # Frame buffers are sized for the old image: replace them.
+            self.set_image()
+            if self.data_thread is not None:
+                self.stop_data_thread()
+                self.start_data_thread()
 
-        if acquiring_on_entry:
-            self.StartAcquisition()
-            self.acquiring = True
-            self.logger.log('Resuming acquisition after settings updates.')
 
-        return self.enabled
+    def get_settings_report(self):
+        """Describe the last settings update.
+
+        Returns a dict with the keys changed, those changed live, whether
+        the acquisition was restarted, whether it failed, and the seconds
+        the update took; or None before the first update."""
+        return self.settings_report
+
+
+    def start_data_thread(self):
+        """Start a DataThread, unless one is already running."""
+        if self.data_thread and self.data_thread.is_alive():
+            return
+        if (self.recorder is not None and
+                self.recorder.shape != tuple(self.get_image_shape())):
+            # The recording's file holds frames of the old shape.
+            self.logger.log('Image shape changed: ending recording.')
+            self.stop_recording()
+        self.logger.log('Starting data thread.')
+        self.data_thread = DataThread(
+                self, self.client,
+                batch=self.settings.get('batchReadout', False),
+                wait=self.settings.get('waitStrategy', 'poll'),
+                pool_size=self.settings.get('framePoolSize',
+                                            FRAME_POOL_SIZE),
+                queue_size=self.settings.get('frameQueueSize',
+                                             FRAME_QUEUE_SIZE),
+                overflow=self.settings.get('overflowPolicy', 'block'),
+                n_dispatchers=self.settings.get('dispatchThreads', 1),
+                shared_ring=self.shared_ring,
+                batch_size=self.settings.get('dispatchBatchSize', 1),
+                batch_timeout=self.settings.get('dispatchBatchTimeout',
+                                                DISPATCH_BATCH_TIMEOUT),
+                recorder=self.recorder,
+                timestamps=self.get_timestamp_source(),
+                send_sequence=bool(self.settings.get('sendSequence')))
+        self.update_transform()
+        self.update_correction()
+        self.data_thread.start()
+
+
+    def stop_data_thread(self):
+        if self.data_thread:
+            if self.data_thread.is_alive():
+                self.data_thread.stop()
+                self.data_thread.join(5)
+            self.data_thread = None
 
 
     ### (Fairly) simple wrappers and utility functions. ###
@@ -603,6 +1591,7 @@ class Camera(object):
         return (exposure.value, accumulate.value, kinetic.value)
 
 
+    @cached
     @with_camera
     def get_amp_desc(self, index):
         s = create_string_buffer(128)
@@ -610,16 +1599,13 @@ class Camera(object):
         return s.value
 
 
-    @with_camera
+    @cached
     def get_amplifier_modes(self):
-        if not self.caps.ulCameraType:
-            self.get_capabilities()
-        # Return the amplifier mode labels.
-        modes = AMPLIFIER_MODES[self.caps.ulCameraType]
-
-        return modes
+        # Return the amplifier mode labels: none for unlisted camera types.
+        return AMPLIFIER_MODES.get(self.get_capabilities().ulCameraType, [])
 
 
+    @cached
     @with_camera
     def get_camera_serial_number(self):
         sn = c_int()
@@ -627,12 +1613,14 @@ class Camera(object):
         return sn.value
 
 
+    @cached
     @with_camera
     def get_capabilities(self):
         sdk.GetCapabilities(self.caps)
         return self.caps
 
 
+    @cached
     @with_camera
     def get_detector(self):
         """Populate nx and ny with the detector geometry."""
@@ -665,6 +1653,213 @@ class Camera(object):
         return (low.value, high.value)
 
 
+    @with_camera
+    def start_kinetic_series(self, n_images, cycle_time=0., accumulations=1,
+                             dark=False):
+        """Acquire a series of n_images, to be read with read_kinetic_series.
+
+        Streaming stops, and resumes on enable. Images are taken every
+        cycle_time seconds, or as fast as possible, and each sums
+        accumulations exposures. If dark, the shutter is kept closed.
+        Returns the exposure, accumulation and kinetic cycle times the
+        camera uses."""
+        self.logger.log('Starting kinetic series of %d images.' % n_images)
+        self.disable()
+        self.set_acquisition_mode(3)
+        self.SetNumberAccumulations(int(accumulations))
+        self.SetNumberKinetics(int(n_images))
+        self.SetKineticCycleTime(float(cycle_time))
+        self.prepare_readout(shutter=2 if dark else 1)
+        self.kinetic_series = {'length': int(n_images),
+                               'accumulations': int(accumulations),
+                               'shape': self.get_image_shape()}
+        self.StartAcquisition()
+        self.acquiring = True
+        return self.get_acquisition_timings()
+
+
+    @with_camera
+    def get_kinetic_series_progress(self):
+        """Return accumulations and images acquired in the kinetic series.
+
+        Returns a dict with keys accumulations, images, length and
+        acquiring, or None if no series has been started."""
+        if self.kinetic_series is None:
+            return None
+        accumulations, images = c_long(), c_long()
+        sdk.GetAcquisitionProgress(accumulations, images)
+        status = c_int()
+        sdk.GetStatus(status)
+        return {'accumulations': accumulations.value,
+                'images': images.value,
+                'length': self.kinetic_series['length'],
+                'acquiring': status.value == sdk.DRV_ACQUIRING}
+
+
+    def wait_kinetic_series(self, timeout=None, interval=0.01):
+        """Wait until the kinetic series is done, or timeout seconds pass.
+
+        Returns the series progress."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            progress = self.get_kinetic_series_progress()
+            if (progress is None or not progress['acquiring']
+                    or (deadline is not None and time.time() >= deadline)):
+                return progress
+            time.sleep(interval)
+
+
+    @with_camera
+    def read_kinetic_series(self, first=1, last=None, transform=True):
+        """Return images first to last of the kinetic series in one stack.
+
+        Images are numbered from 1. last defaults to the last image
+        acquired, so a series can be read in parts while it runs: images
+        not yet read may be overwritten if the series is longer than the
+        SDK's circular buffer. The images are read with one GetImages16
+        call, into an (n, ny, nx) array, and transformed like streamed
+        images unless transform is False. Returns None if there are no
+        images to read. If the SDK returns fewer images, the stack ends
+        at the last valid one; if image first has been overwritten, an
+        exception is raised."""
+        if self.kinetic_series is None:
+            raise Exception('No kinetic series has been started.')
+        if last is None:
+            last = self.get_kinetic_series_progress()['images']
+        if last < first:
+            return None
+        stack = numpy.empty((last - first + 1,) + self.kinetic_series['shape'],
+                            dtype=numpy.uint16)
+        valid_first, valid_last = c_long(), c_long()
+        status = self.GetImages16(first, last, stack, stack.size,
+                                  valid_first, valid_last)[0]
+        if status != sdk.DRV_SUCCESS:
+            return None
+        if valid_first.value != first:
+            raise Exception('Images %d to %d of the kinetic series have been '
+                            'overwritten.' % (first, valid_first.value - 1))
+        # Drop the part of the stack the SDK did not fill.
+        stack = stack[:valid_last.value - first + 1]
+        if not transform:
+            return stack
+        transpose, row_step, col_step = compile_transform(
+                self.get_transforms()[-1])
+        if transpose:
+            stack = stack.transpose(0, 2, 1)
+        return stack[:, ::row_step, ::col_step]
+
+
+    @with_camera
+    def stop_kinetic_series(self):
+        """Abort the kinetic series. Images acquired can still be read."""
+        self.abort()
+
+
+    @with_camera
+    def start_fast_kinetics(self, exposed_rows, series_length, exposure_time,
+                            vs_speed_index=None, offset=None):
+        """Acquire one fast kinetics series, to read with read_fast_kinetics.
+
+        Each of series_length sub-frames is exposed on exposed_rows rows,
+        offset rows from the bottom of the sensor (by default, at the
+        top), then shifted under the mask at the FK vertical shift speed
+        vs_speed_index (by default, the fastest). Binning follows the
+        'binning' setting. Streaming stops, and resumes on enable.
+        Returns the sub-frame timings: see get_fast_kinetics_timings."""
+        self.logger.log('Starting fast kinetics series of %d sub-frames.'
+                        % series_length)
+        self.disable()
+        hbin, vbin = [int(b) for b in self.settings.get('binning') or (1, 1)]
+        nx, ny = self.get_detector()
+        if offset is None:
+            offset = ny - exposed_rows
+        if vs_speed_index is None:
+            n = c_int()
+            sdk.GetNumberFKVShiftSpeeds(n)
+            speeds = [self.get_fk_v_shift_speed_f(i) for i in range(n.value)]
+            vs_speed_index = speeds.index(min(speeds))
+        self.set_acquisition_mode(4)
+        self.SetFKVShiftSpeed(int(vs_speed_index))
+        # Mode 4: read out sub-frames as images.
+        self.SetFastKineticsEx(int(exposed_rows), int(series_length),
+                               float(exposure_time), 4, hbin, vbin,
+                               int(offset))
+        self.prepare_readout(image=False)
+        shift_time = (exposed_rows *
+                      self.get_fk_v_shift_speed_f(int(vs_speed_index)) * 1e-6)
+        self.fast_kinetics = {'seriesLength': int(series_length),
+                              'shape': (exposed_rows // vbin, nx // hbin),
+                              'exposureTime': self.get_fk_exposure_time(),
+                              'shiftTime': shift_time,
+                              'started': None}
+        self.StartAcquisition()
+        self.fast_kinetics['started'] = time.time()
+        self.acquiring = True
+        return self.get_fast_kinetics_timings()
+
+
+    def get_fast_kinetics_timings(self):
+        """Return the times each sub-frame's exposure starts and ends.
+
+        Times are in seconds from the start of the first exposure, and
+        returned as a dict with keys start, end, exposureTime and
+        shiftTime. Sub-frames are exposed for exposureTime, then shifted
+        for shiftTime."""
+        fk = self.fast_kinetics
+        if fk is None:
+            return None
+        period = fk['exposureTime'] + fk['shiftTime']
+        start = [i * period for i in range(fk['seriesLength'])]
+        return {'start': start,
+                'end': [t + fk['exposureTime'] for t in start],
+                'exposureTime': fk['exposureTime'],
+                'shiftTime': fk['shiftTime']}
+
+
+    @with_camera
+    def get_acquisition_status(self):
+        """Return the SDK's acquisition status, such as DRV_ACQUIRING."""
+        status = c_int()
+        sdk.GetStatus(status)
+        return status.value
+
+
+    def read_fast_kinetics(self, timeout=None, interval=0.001):
+        """Wait for the fast kinetics series, and return its sub-frames.
+
+        The composite image is read with one call, and returned as a
+        (series_length, ny, nx) array of views on it, one per sub-frame
+        in order of exposure: no sub-frame is copied. Transforms are
+        applied as views too. Also returns each sub-frame's timestamp:
+        the system time the series started, plus the start of the
+        sub-frame's exposure. Returns None if the series is not done
+        within timeout seconds. dll_lock is only held for each SDK call,
+        not while waiting."""
+        fk = self.fast_kinetics
+        if fk is None:
+            raise Exception('No fast kinetics series has been started.')
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            if self.get_acquisition_status() != sdk.DRV_ACQUIRING:
+                break
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(interval)
+        self.acquiring = False
+        ny, nx = fk['shape']
+        composite = numpy.empty((fk['seriesLength'] * ny, nx),
+                                dtype=numpy.uint16)
+        self.GetAcquiredData16(composite, composite.size)
+        frames = composite.reshape(fk['seriesLength'], ny, nx)
+        transpose, row_step, col_step = compile_transform(
+                self.get_transforms()[-1])
+        if transpose:
+            frames = frames.transpose(0, 2, 1)
+        timestamps = [fk['started'] + t
+                      for t in self.get_fast_kinetics_timings()['start']]
+        return frames[:, ::row_step, ::col_step], timestamps
+
+
     @with_camera
     def get_fk_exposure_time(self):
         t = c_float()
@@ -672,6 +1867,7 @@ class Camera(object):
         return t.value
 
 
+    @cached
     @with_camera
     def get_fk_v_shift_speed_f(self, index):
         speed = c_float()
@@ -688,6 +1884,7 @@ class Camera(object):
         return (index.value, speed.value)
 
 
+    @cached_timing
     @with_camera
     def get_keep_clean_time(self):
         t = c_float()
@@ -695,6 +1892,7 @@ class Camera(object):
         return t.value
 
 
+    @cached_timing
     @with_camera
     def get_read_out_time(self):
         t = c_float()
@@ -703,22 +1901,45 @@ class Camera(object):
 
 
     @with_camera
+    def get_size_of_circular_buffer(self):
+        n = c_long()
+        sdk.GetSizeOfCircularBuffer(n)
+        return n.value
+
+
     def get_temperature(self):
+        snapshot = self.get_status_snapshot()
+        if snapshot is not None:
+            return snapshot['temperature']
+        return self.read_temperature()
+
+
+    @with_camera
+    def read_temperature(self):
         temperature = c_int()
         self.temperature_state = sdk.GetTemperature(temperature)
         return temperature.value
 
 
+    @with_camera
+    def get_total_number_images_acquired(self):
+        n = c_long()
+        sdk.GetTotalNumberImagesAcquired(n)
+        return n.value
+
+
+    @cached
     @with_camera
     def get_hardware_version(self):
-        pcb, decode, dummy1, dummy2, version, build = 6 * [c_ulong()]
-        plist = [pcb, decode, dummy1, dummy2, version, build]
+        # pcb, decode, dummy1, dummy2, version, build
+        plist = [c_ulong() for i in range(6)]
         parameters = [byref(p) for p in plist]
         sdk.GetHardwareVersion(*parameters)
         result = [p.value for p in plist]
         return result
 
 
+    @cached
     @with_camera
     def get_head_model(self):
         s = create_string_buffer(128)
@@ -726,6 +1947,53 @@ class Camera(object):
         return s.value
 
 
+    @cached
+    @with_camera
+    def get_number_amp(self):
+        n = c_int()
+        sdk.GetNumberAmp(n)
+        return n.value
+
+
+    @cached
+    @with_camera
+    def get_temperature_range(self):
+        t_min = c_int()
+        t_max = c_int()
+        sdk.GetTemperatureRange(t_min, t_max)
+        return (t_min.value, t_max.value)
+
+
+    def describe(self):
+        """Return the camera's static properties in one dict.
+
+        Values are cached, so this only calls the DLL once after each
+        Initialize. A property the camera fails to report is None, and
+        the failure is logged: it is queried again on the next call."""
+        def capabilities():
+            caps = self.get_capabilities()
+            return dict((name, getattr(caps, name))
+                        for name, ctype in caps._fields_)
+        queries = [
+            ('serialNumber', self.get_camera_serial_number),
+            ('headModel', self.get_head_model),
+            ('hardwareVersion', self.get_hardware_version),
+            ('detectorSize', self.get_detector),
+            ('capabilities', capabilities),
+            ('amplifierModes', self.get_amplifier_modes),
+            ('amplifiers', lambda: [self.get_amp_desc(i)
+                                    for i in range(self.get_number_amp())]),
+            ('temperatureRange', self.get_temperature_range)]
+        description = {}
+        for key, query in queries:
+            try:
+                description[key] = query()
+            except Exception as e:
+                self.logger.log('Could not get %s: %s' % (key, e))
+                description[key] = None
+        return description
+
+
     def is_enabled(self):
         return self.enabled
 
@@ -741,9 +2009,13 @@ class Camera(object):
         return status.value
 
 
-    @with_camera
     def is_ready(self):
-        status = self.GetTemperature(c_int())
+        snapshot = self.get_status_snapshot()
+        if snapshot is not None:
+            status = snapshot['temperatureStatus']
+        else:
+            self.read_temperature()
+            status = self.temperature_state[0]
         ready = (status == sdk.DRV_TEMP_STABILIZED) and self.enabled
         return ready
 
@@ -752,7 +2024,11 @@ class Camera(object):
     def set_amplifier_mode(self, mode):
         # If no mode was specified, use the first mode."""
         if mode == None:
-            mode = self.get_amplifier_modes()[-1]
+            modes = self.get_amplifier_modes()
+            if not modes:
+                raise Exception('No amplifier modes are listed for this '
+                                'camera type: specify amplifierMode.')
+            mode = modes[-1]
         channel = int(mode['channel'])
         amplifier = int(mode['amplifier'])
         index = int(mode['index'])
@@ -782,9 +2058,8 @@ class Camera(object):
 
     @with_camera
     def set_exposure_time(self, exposure_time):
-        """Set the exposure time and update vertical shift speed."""
+        """Set the exposure time, and return the exposure the camera uses."""
         self.SetExposureTime(float(exposure_time))
-        self.set_fastest_vs_speed()
         exposure, accumulate, kinetic = self.get_acquisition_timings()
         return exposure
 
@@ -796,33 +2071,533 @@ class Camera(object):
         self.SetVSSpeed(int(index))
         return speed
 
+    @with_camera
+    def set_hardware_timestamps(self, enable):
+        """Timestamp images from the camera's metadata, if it has it.
+
+        Cameras without metadata timestamp images from a model of their
+        clock, if triggered internally. See get_timestamp_source."""
+        if self.get_capabilities().ulFeatures & sdk.AC_FEATURES_METADATA:
+            self.SetMetaData(int(bool(enable)))
+
+
+    def get_timestamp_source(self):
+        """Return the source of image timestamps: see TIMESTAMP_SOURCES."""
+        if not self.settings.get('hardwareTimestamps'):
+            return 'system'
+        if self.get_capabilities().ulFeatures & sdk.AC_FEATURES_METADATA:
+            return 'metadata'
+        if self.settings.get('triggerMode', 0) in CLOCKED_TRIGGER_MODES:
+            return 'clock'
+        return 'system'
+
+
+    @with_camera
+    def set_image(self):
+        """Apply the 'roi', 'binning' and 'isolatedCrop' settings.
+
+        roi is (left, top, width, height) in unbinned sensor pixels
+        counted from 0, and defaults to the full sensor; binning is
+        (horizontal, vertical). With isolatedCrop, the camera reads out
+        only a width x height region at the sensor origin, which is
+        faster than cropping a full readout.
+        """
+        if self.nx is None:
+            # The default region, and the check below, need the size.
+            self.get_detector()
+        hbin, vbin = [int(b) for b in self.settings.get('binning') or (1, 1)]
+        left, top, width, height = [
+            int(v) for v in self.settings.get('roi') or (0, 0, self.nx, self.ny)]
+        if hbin < 1 or vbin < 1:
+            raise Exception('Bad binning: %s.' % ((hbin, vbin),))
+        if (left < 0 or top < 0 or width < hbin or height < vbin or
+                left + width > self.nx or top + height > self.ny):
+            raise Exception('Bad roi: %s is not within the %dx%d detector.'
+                            % ((left, top, width, height), self.nx, self.ny))
+        # The binned region must contain a whole number of superpixels.
+        width -= width % hbin
+        height -= height % vbin
+        if self.caps.ulSetFunctions & sdk.AC_SETFUNCTION_CROPMODE:
+            if self.settings.get('isolatedCrop'):
+                self.SetIsolatedCropMode(1, height, width, vbin, hbin)
+                left, top = 0, 0
+            else:
+                self.SetIsolatedCropMode(0, height, width, vbin, hbin)
+        self.SetImage(hbin, vbin, left + 1, left + width, top + 1, top + height)
+        self.image_shape = (height // vbin, width // hbin)
+        self.logger.log('Image set to %s, binned %dx%d.'
+                        % ((left, top, width, height), hbin, vbin))
+        return self.image_shape
+
+
     @with_camera
     def set_target_temperature(self, target):
-        t_min = c_int()
-        t_max = c_int()
-        self.GetTemperatureRange(t_min, t_max)
+        t_min, t_max = self.get_temperature_range()
         # Temperature set-point is limited to available range.
-        target = max(t_min.value, min(t_max.value, target))
+        target = max(t_min, min(t_max, target))
         self.SetTemperature(target)
 
 
 
+def compile_transform(transform):
+    """Reduce a (fliplr, flipud, rot90) transform to a view recipe.
+
+    Returns (transpose, row_step, col_step): the transformed image is
+    (m.T if transpose else m)[::row_step, ::col_step]. Since
+    rot90(m) == m.T[::-1], a rotation transposes and reverses rows,
+    flipud reverses rows, and fliplr reverses columns.
+    """
+    fliplr, flipud, rot90 = transform
+    return (bool(rot90),
+            -1 if rot90 ^ flipud else 1,
+            -1 if fliplr else 1)
+
+
+class PollWait(object):
+    """Wait for new images by sleeping for a fixed interval."""
+    def __init__(self, cam, interval=0.01):
+        self.interval = interval
+
+
+    def wait(self):
+        time.sleep(self.interval)
+
+
+    def cancel(self):
+        pass
+
+
+    def close(self):
+        pass
+
+
+class BlockingWait(object):
+    """Wait for new images in WaitForAcquisitionByHandleTimeOut.
+
+    The wait returns as soon as an image is acquired, and is woken
+    early by cancel, which calls CancelWait.
+    """
+    def __init__(self, cam, timeout=0.1, idle_interval=0.01):
+        self.cam = cam
+        self.timeout_ms = int(timeout * 1000)
+        self.idle_interval = idle_interval
+
+
+    def wait(self):
+        # Wait by handle, so as not to hold dll_lock while waiting.
+        status = self.cam.WaitForAcquisitionByHandleTimeOut(
+            self.cam.handle, self.timeout_ms)[0]
+        if status == sdk.DRV_IDLE:
+            # Not acquiring, so the SDK returns at once: don't spin.
+            time.sleep(self.idle_interval)
+
+
+    def cancel(self):
+        # The wait is by handle and holds no lock, so this need not wait
+        # for it; the lock selects this camera for CancelWait.
+        self.cam.CancelWait()
+
+
+    def close(self):
+        pass
+
+
+class EventWait(object):
+    """Wait for new images on an event signalled by the driver.
+
+    The event is registered with SetDriverEvent, and set by the driver
+    when new data are available. cancel sets the event to wake the
+    waiting thread. close unregisters the event, unless another has
+    been registered since.
+    """
+    def __init__(self, cam, timeout=0.1):
+        self.cam = cam
+        self.timeout_ms = int(timeout * 1000)
+        self.event = sdk.create_event()
+        self.cam.SetDriverEvent(self.event)
+        self.cam.driver_event = self.event
+
+
+    def wait(self):
+        sdk.wait_for_event(self.event, self.timeout_ms)
+
+
+    def cancel(self):
+        sdk.set_event(self.event)
+
+
+    def close(self):
+        if self.cam.driver_event is self.event:
+            self.cam.SetDriverEvent(None)
+            self.cam.driver_event = None
+        sdk.close_event(self.event)
+
+
+## Default number of frame buffers in a DataThread's pool.
+FRAME_POOL_SIZE = 16
+## Time in seconds to wait for a free frame buffer.
+POOL_TIMEOUT = 0.1
+
+## Default number of frames queued between readout and dispatch.
+FRAME_QUEUE_SIZE = 8
+## What to do when the frame queue is full.
+OVERFLOW_POLICIES = ('block', 'drop-oldest', 'drop-newest')
+
+## Default time in seconds to gather images for a batched send.
+DISPATCH_BATCH_TIMEOUT = 0.05
+
+## Fraction of the SDK's circular buffer that, once filled with unread
+## images, makes a DataThread warn that images may soon be overwritten.
+BUFFER_WARNING = 0.75
+
+## Sources of image timestamps: the system time at readout; the camera's
+## metadata; or a model of the camera's clock, from the kinetic cycle time.
+TIMESTAMP_SOURCES = ('system', 'metadata', 'clock')
+## Trigger modes in which images are acquired at the kinetic cycle time.
+CLOCKED_TRIGGER_MODES = (0, 6)
+
+## Tile size, in pixels, for copying transposed images.
+TRANSPOSE_TILE = 256
+
+## Default number of slots in a shared-memory frame ring.
+SHARED_SLOTS = 32
+
+## Strategies a DataThread may use to wait for new images.
+WAIT_STRATEGIES = {'poll': PollWait,
+                   'wait': BlockingWait,
+                   'event': EventWait}
+
+
+class StatusMonitor(threading.Thread):
+    """A thread that samples a camera's status in the background.
+
+    Samples are taken every interval seconds, or every streaming_interval
+    while the camera streams frames: if streaming_interval is None,
+    sampling pauses while streaming. Each sample replaces the snapshot,
+    rather than updating it, so readers need no lock; recent samples are
+    kept in history.
+    """
+    def __init__(self, cam, interval=STATUS_INTERVAL,
+                 streaming_interval=STATUS_STREAMING_INTERVAL,
+                 history=STATUS_HISTORY):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.cam = cam
+        self.interval = interval
+        self.streaming_interval = streaming_interval
+        self.snapshot = None
+        self.history = deque(maxlen=history)
+        self.error = None
+        self.stopped = threading.Event()
+
+
+    def is_streaming(self):
+        data_thread = self.cam.data_thread
+        return bool(self.cam.acquiring and data_thread is not None
+                    and data_thread.is_alive())
+
+
+    def sample(self, streaming):
+        try:
+            snapshot = self.cam.read_status()
+        except Exception as e:
+            # Log each new error once, rather than every interval.
+            if str(e) != self.error:
+                self.error = str(e)
+                self.cam.logger.log('Status monitor: %s' % e)
+            return
+        self.error = None
+        snapshot['streaming'] = streaming
+        self.snapshot = snapshot
+        self.history.append(snapshot)
+
+
+    def run(self):
+        last = None
+        while not self.stopped.is_set():
+            streaming = self.is_streaming()
+            interval = self.streaming_interval if streaming else self.interval
+            now = time.time()
+            # Always take a first sample, even while streaming.
+            if last is None or (interval is not None and
+                                now - last >= interval):
+                self.sample(streaming)
+                last = now
+            self.stopped.wait(self.interval)
+
+
+    def stop(self):
+        self.stopped.set()
+        if self is not threading.current_thread():
+            self.join()
+
+
+class FramePool(object):
+    """A fixed-size ring of preallocated frame buffers.
+
+    Buffers are stored as one (size, ny, nx) array, so that a run of
+    consecutive buffers can be filled by a single GetImages16 call.
+    Buffers are handed out in ring order, skipping any still in use,
+    and may be released in any order; a buffer is never handed out
+    again until it is released.
+    """
+    def __init__(self, size, shape, dtype=numpy.uint16):
+        self.buffers = numpy.zeros((size,) + tuple(shape), dtype=dtype)
+        self.size = size
+        self.in_use = [False] * size
+        # Index of the next buffer to hand out.
+        self.head = 0
+        # Number of buffers in use, and the most that have ever been.
+        self.occupancy = 0
+        self.high_water = 0
+        self.condition = threading.Condition()
+
+
+    def acquire(self, n=1, timeout=None):
+        """Acquire up to n consecutive free buffers.
+
+        The search for a free buffer starts after the last buffer
+        handed out. Returns (index, count). Fewer than n buffers are
+        returned if the ring wraps or reaches a buffer that is still in
+        use; count is 0 if no buffer became free within timeout.
+        """
+        with self.condition:
+            if self.occupancy == self.size and timeout:
+                self.condition.wait(timeout)
+            if self.occupancy == self.size:
+                return (0, 0)
+            index = self.head
+            while self.in_use[index]:
+                index = (index + 1) % self.size
+            n = min(n, self.size - index)
+            count = 0
+            while count < n and not self.in_use[index + count]:
+                self.in_use[index + count] = True
+                count += 1
+            self.head = (index + count) % self.size
+            self.occupancy += count
+            self.high_water = max(self.high_water, self.occupancy)
+        return (index, count)
+
+
+    def release(self, index, count=1):
+        """Return count buffers, starting at index, to the pool."""
+        with self.condition:
+            for i in range(index, index + count):
+                if self.in_use[i]:
+                    self.in_use[i] = False
+                    self.occupancy -= 1
+            self.condition.notify()
+
+
+    def get_stats(self):
+        return {'size': self.size,
+                'occupancy': self.occupancy,
+                'highWater': self.high_water}
+
+
+class FrameQueue(object):
+    """A bounded queue of frames between readout and dispatch.
+
+    When the queue is full, put applies the overflow policy:
+    * 'block' waits for space, leaving frames in the SDK's buffer;
+    * 'drop-oldest' discards the oldest queued frame;
+    * 'drop-newest' discards the frame being put.
+    Discarded items are passed to the discard callback and counted.
+    """
+    def __init__(self, maxsize, policy='block', discard=None):
+        if policy not in OVERFLOW_POLICIES:
+            raise Exception('Bad overflow policy: expected one of %s.'
+                            % ', '.join(OVERFLOW_POLICIES))
+        self.items = deque()
+        self.maxsize = maxsize
+        self.policy = policy
+        self.discard = discard
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+
+    def put(self, item):
+        """Queue an item.
+
+        Returns False if the item was not queued, in which case the
+        caller still owns it."""
+        dropped = None
+        with self.condition:
+            if len(self.items) >= self.maxsize:
+                if self.policy == 'drop-newest':
+                    self.dropped_newest += 1
+                    return False
+                elif self.policy == 'drop-oldest':
+                    dropped = self.items.popleft()
+                    self.dropped_oldest += 1
+            while len(self.items) >= self.maxsize and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                return False
+            self.items.append(item)
+            self.condition.notify_all()
+        if dropped is not None and self.discard:
+            self.discard(dropped)
+        return True
+
+
+    def get(self, timeout=None):
+        """Return the oldest item.
+
+        Returns None if the queue is closed, or if timeout is given and
+        no item arrives within timeout seconds."""
+        with self.condition:
+            if timeout is None:
+                while not self.items and not self.closed:
+                    self.condition.wait()
+            elif not self.items and not self.closed:
+                self.condition.wait(timeout)
+            if self.closed or not self.items:
+                return None
+            item = self.items.popleft()
+            self.condition.notify_all()
+        return item
+
+
+    def close(self):
+        """Wake all waiters, and return any items still queued."""
+        with self.condition:
+            self.closed = True
+            items = list(self.items)
+            self.items.clear()
+            self.condition.notify_all()
+        return items
+
+
+    def get_stats(self):
+        return {'size': self.maxsize,
+                'queued': len(self.items),
+                'policy': self.policy,
+                'droppedOldest': self.dropped_oldest,
+                'droppedNewest': self.dropped_newest}
+
+
 class DataThread(threading.Thread):
-    """A thread to collect acquired data and dispatch it to a client."""
-    def __init__(self, cam, client):
+    """A thread to collect acquired data and dispatch it to a client.
+
+    This thread only reads images out of the SDK. Images are read into
+    buffers from a FramePool and passed through a bounded FrameQueue to
+    one or more DispatchThreads, which transform and send them to the
+    client, then return the buffers to the pool. A slow client therefore
+    fills the queue rather than stalling readout: the queue's overflow
+    policy determines what happens then. By default,
+    the thread fetches the oldest new image on each iteration. In batch
+    mode, it drains as many new images as the pool has room for from
+    the SDK's circular buffer with a single call to GetImages16.
+
+    Each image has a sequence number: its index in the SDK's circular
+    buffer, counted from 1 at StartAcquisition. Clients that opt in with
+    send_sequence are sent it after the timestamp, as
+    receiveData(action, image, timestamp, sequence); others are sent
+    receiveData(action, image, timestamp). Stacks always carry their
+    sequence numbers. A gap in the
+    sequence means images were overwritten before they were read out;
+    get_drop_stats counts these overruns separately from images skipped
+    on request and images dropped by the queue.
+
+    Images are timestamped from one of TIMESTAMP_SOURCES. 'metadata'
+    times come from the camera: GetMetaDataInfo gives the start of the
+    acquisition and each image's offset from it. 'clock' times are
+    modelled as origin + (sequence - 1) * cycle_time, where origin is
+    the earliest that fits the times images were read out. 'system'
+    times are the time of readout, and are shared by images read out
+    together.
+
+    Given correction maps by set_correction, the DispatchThreads correct
+    each image before transforming it: into the pool buffer itself,
+    saturating, for 'uint16'; into a preallocated buffer for 'float32'.
+    A recorder receives images uncorrected.
+
+    When there are no new images, the thread blocks using one of the
+    WAIT_STRATEGIES: 'poll' sleeps for 10ms; 'wait' blocks in
+    WaitForAcquisitionByHandleTimeOut; 'event' waits on a driver event.
+    The strategy may be changed while the thread runs: the old waiter
+    is cancelled at once, and closed by the readout thread when its wait
+    returns.
+    """
+    def __init__(self, cam, client, batch=False, wait='poll',
+                 pool_size=FRAME_POOL_SIZE, queue_size=FRAME_QUEUE_SIZE,
+                 overflow='block', n_dispatchers=1, shared_ring=None,
+                 batch_size=1, batch_timeout=DISPATCH_BATCH_TIMEOUT,
+                 recorder=None, timestamps='system', send_sequence=False):
         threading.Thread.__init__(self)
         self.skip_next_n_images = 0
         self.exposure_count = 0
         self.sent_count = 0
         self.skip_every_n_images = 1
+        # Images skipped by skip_next_n_images or skip_every_n_images.
+        self.skipped_count = 0
+        # Images overwritten in the SDK's buffer before readout.
+        self.overrun_count = 0
+        # SDK index of the next image, or None if not yet known.
+        self.next_index = None
+        # SDK index of the newest image known to be in the SDK's buffer.
+        self.known_last = 0
+        # Unread images in the SDK's buffer, most recent and maximum.
+        self.backlog = 0
+        self.max_backlog = 0
+        self.buffer_warned = False
+        self.buffer_warnings = 0
+        # Exceptions raised while dispatching images, and the last logged.
+        self.dispatch_errors = 0
+        self.dispatch_error = None
         self.cam = weakref.proxy(cam)
-        self.image_array = numpy.zeros((cam.nx, cam.ny), dtype=numpy.uint16)
-        self.n_pixels = cam.nx * cam.ny
+        # Size of the SDK's circular buffer, in images.
+        self.buffer_size = cam.get_size_of_circular_buffer()
+        # Source of timestamps, and the state of the 'clock' model.
+        self.timestamp_source = timestamps
+        self.cycle_time = cam.get_acquisition_timings()[2]
+        self.clock_origin = None
+        # Start of the acquisition from metadata, in seconds since epoch.
+        self.metadata_origin = None
+        # Arguments for GetMetaDataInfo.
+        self.time_of_start = sdk.SYSTEMTIME()
+        self.time_from_start = c_float()
+        # Preallocated buffers for readout.
+        self.pool = FramePool(pool_size, cam.get_image_shape())
+        # Queue of (buffer index, timestamp, sequence) awaiting dispatch.
+        self.queue = FrameQueue(queue_size, overflow,
+                                discard=lambda item: self.pool.release(item[0]))
+        self.dispatchers = [DispatchThread(self) for i in range(n_dispatchers)]
+        self.count_lock = threading.Lock()
+        # Number of sends in progress.
+        self.sending = 0
+        # Images and seconds to gather into one send.
+        self.set_batching(batch_size, batch_timeout)
+        self.n_pixels = self.pool.buffers[0].size
         self.client = client
+        # If set, frames are written here and sent as descriptors.
+        self.shared_ring = shared_ring
+        # If set, every frame read out is also passed to this recorder.
+        self.recorder = recorder
+        # Send single images with their sequence numbers?
+        self.send_sequence = send_sequence
+        # (maps, dtype) to correct frames with before dispatch, or None.
+        self.correction = None
         self.run_flag = True
         # Transform operation: fliplr, flipud, rot90
         self.transform = (0, 0, 0)
+        self.transform_recipe = compile_transform(self.transform)
         self.transform_lock = threading.Lock()
+        # Drain all new images with one GetImages16 call?
+        self.batch = batch
+        # Image index arguments for GetNumberNewImages and GetImages16.
+        self.first, self.last = c_long(), c_long()
+        self.valid_first, self.valid_last = c_long(), c_long()
+        # Strategy used to wait for new images, and replaced waiters not
+        # yet closed.
+        self.waiter = None
+        self.retired_waiters = []
+        self.waiter_lock = threading.Lock()
+        self.set_wait_strategy(wait)
 
 
     def __del__(self):
@@ -830,72 +2605,351 @@ class DataThread(threading.Thread):
             self.should_quit = True
 
 
-    def get_transformed_image(self):
-        m = self.image_array
-        with self.transform_lock:
-            flips = (self.transform[0], self.transform[1])
-            rotation = self.transform[2]
+    def fetch_images(self):
+        """Fetch new images from the SDK into consecutive pool buffers.
+
+        Fetches the oldest new image or, in batch mode, as many as there
+        are free buffers for. Returns (index, count) of the buffers
+        filled, and the SDK index of the first image; count is 0 if no
+        new data were available.
+
+        Outside batch mode, images already known to be in the SDK's
+        buffer are fetched without calling GetNumberNewImages first."""
+        first = self.next_index
+        if self.batch or first is None or first > self.known_last:
+            status = self.cam.fast_GetNumberNewImages(self.first, self.last)
+            if status != sdk.DRV_SUCCESS:
+                return (0, 0, None)
+            first, last = self.first.value, self.last.value
+            self.check_sequence(first, last)
+            self.known_last = last
+        last = self.known_last
+        # Fetch no more images than there are free buffers: any
+        # remainder is picked up on the next iteration.
+        index, n = self.pool.acquire(last - first + 1 if self.batch else 1,
+                                     POOL_TIMEOUT)
+        if n == 0:
+            return (0, 0, None)
+        try:
+            status = self.cam.fast_GetImages16(
+                    first, first + n - 1, self.pool.buffers[index:index + n],
+                    n * self.n_pixels, self.valid_first, self.valid_last)
+        except:
+            self.pool.release(index, n)
+            # The images may have been overwritten, or the acquisition
+            # restarted, since GetNumberNewImages: if so, start again.
+            self.known_last = 0
+            status = self.cam.fast_GetNumberNewImages(self.first, self.last)
+            if status == sdk.DRV_NO_NEW_DATA:
+                return (0, 0, None)
+            if status == sdk.DRV_SUCCESS and self.first.value != first:
+                return self.fetch_images()
+            raise
+        if status != sdk.DRV_SUCCESS:
+            self.pool.release(index, n)
+            return (0, 0, None)
+        n_valid = self.valid_last.value - self.valid_first.value + 1
+        self.pool.release(index + n_valid, n - n_valid)
+        self.next_index = self.valid_last.value + 1
+        return (index, n_valid, self.valid_first.value)
+
+
+    def check_sequence(self, first, last):
+        """Count overruns, and warn if the SDK's buffer is filling.
+
+        first and last are the SDK indices of the oldest and newest
+        unread images."""
+        expected = self.next_index
+        if expected is None:
+            # Started during an acquisition: count from the oldest image.
+            expected = first
+        elif first < expected:
+            # The acquisition has been restarted.
+            expected = 1
+            self.clock_origin = self.metadata_origin = None
+        if first > expected:
+            self.overrun_count += first - expected
+            self.cam.logger.log('    DataThread: %d images overwritten '
+                                'before readout.' % (first - expected))
+        self.next_index = first
+        self.backlog = last - first + 1
+        if self.backlog > self.max_backlog:
+            self.max_backlog = self.backlog
+        if not self.buffer_size:
+            return
+        if self.backlog >= BUFFER_WARNING * self.buffer_size:
+            if not self.buffer_warned:
+                self.buffer_warned = True
+                self.buffer_warnings += 1
+                self.cam.logger.log('    DataThread: %d of %d images in the '
+                                    'SDK buffer are unread.'
+                                    % (self.backlog, self.buffer_size))
+        elif self.backlog < BUFFER_WARNING * self.buffer_size / 2:
+            self.buffer_warned = False
+
+
+    def reset_sequence(self, cycle_time=None):
+        """Expect sequence numbers from 1, for a new acquisition.
+
+        cycle_time is the new acquisition's kinetic cycle time."""
+        self.known_last = 0
+        self.next_index = 1
+        self.clock_origin = self.metadata_origin = None
+        if cycle_time is not None:
+            self.cycle_time = cycle_time
+
+
+    def get_timestamps(self, sequence, n):
+        """Return timestamps for n images, from SDK index sequence."""
+        now = time.time()
+        if self.timestamp_source == 'metadata':
+            try:
+                return self.read_metadata_times(sequence, n)
+            except Exception as e:
+                # The images may have been overwritten: model the times.
+                self.cam.logger.log('    DataThread: no metadata for image '
+                                    '%d: %s' % (sequence, e))
+        if self.timestamp_source != 'system' and self.cycle_time:
+            # Images are read out after they are acquired, so the model
+            # is fitted to the lower envelope of readout times.
+            origin = now - (sequence + n - 2) * self.cycle_time
+            if self.clock_origin is None or origin < self.clock_origin:
+                self.clock_origin = origin
+            return [self.clock_origin + (sequence + i - 1) * self.cycle_time
+                    for i in range(n)]
+        return n * [now]
+
+
+    def read_metadata_times(self, sequence, n):
+        """Read the acquisition times of n images from their metadata."""
+        offsets = []
+        start, offset = self.time_of_start, self.time_from_start
+        # Fetch all the offsets under one acquisition of the DLL lock.
+        with self.cam.locked():
+            for index in range(sequence, sequence + n):
+                self.cam.fast_GetMetaDataInfo(start, offset, index)
+                offsets.append(offset.value)
+        if self.metadata_origin is None:
+            # The start is the same for all images of an acquisition. It
+            # is given in local time.
+            self.metadata_origin = time.mktime(
+                    (start.wYear, start.wMonth, start.wDay, start.wHour,
+                     start.wMinute, start.wSecond, 0, 0, -1)
+                    ) + start.wMilliseconds / 1000.
+        return [self.metadata_origin + t / 1000. for t in offsets]
+
+
+    def get_drop_stats(self):
+        """Return counts of images read out and lost, by cause.
+
+        overruns were overwritten in the SDK's buffer before readout;
+        skipped were skipped on request; droppedOldest and droppedNewest
+        were dropped by the queue's overflow policy. bufferSize, backlog
+        and maxBacklog describe the SDK's circular buffer. dispatchErrors
+        counts exceptions raised while sending images."""
+        return {'lastSequence': (self.next_index or 1) - 1,
+                'read': self.exposure_count,
+                'sent': self.sent_count,
+                'overruns': self.overrun_count,
+                'skipped': self.skipped_count,
+                'droppedOldest': self.queue.dropped_oldest,
+                'droppedNewest': self.queue.dropped_newest,
+                'bufferSize': self.buffer_size,
+                'backlog': self.backlog,
+                'maxBacklog': self.max_backlog,
+                'bufferWarnings': self.buffer_warnings,
+                'dispatchErrors': self.dispatch_errors}
+
+
+    def get_transformed_shape(self, shape):
+        """Return the shape of an image of shape after transformation."""
+        return tuple(shape[::-1]) if self.transform_recipe[0] else tuple(shape)
+
+
+    def get_transformed_image(self, image, out=None):
+        """Return a transformed view on image.
+
+        If out is given, copy the transformed image into it instead."""
+        transpose, row_step, col_step = self.transform_recipe
+        m = image.T if transpose else image
+        m = m[::row_step, ::col_step]
+        if out is None:
+            return m
+        if not transpose:
+            # out may be uint16 for a float32 image already rounded.
+            numpy.copyto(out, m, casting='unsafe')
+            return out
+        # Copying a transposed view is cache-hostile: copy in tiles.
+        ny, nx = m.shape
+        for i in range(0, ny, TRANSPOSE_TILE):
+            for j in range(0, nx, TRANSPOSE_TILE):
+                out[i:i + TRANSPOSE_TILE, j:j + TRANSPOSE_TILE] = (
+                    m[i:i + TRANSPOSE_TILE, j:j + TRANSPOSE_TILE])
+        return out
+
+
+    def count_image(self):
+        """Count an image and return True unless it should be skipped."""
+        # increment the camera exposure counter
+        self.cam.count += 1
+        # increment our exposure counter
+        self.exposure_count += 1
+
+        if self.skip_next_n_images > 0:
+            self.skip_next_n_images -= 1
+            self.skipped_count += 1
+            self.cam.logger.log('    DataThread: Skipping image (next N).')
+            return False
+
+        if self.exposure_count % self.skip_every_n_images > 0:
+            self.skipped_count += 1
+            self.cam.logger.log('    DataThread: Skipping image (every N).')
+            return False
+
+        return True
+
+
+    def send_image(self, image, timestamp, sequence):
+        """Transform an image and send it to the client."""
+        with self.count_lock:
+            self.sending += 1
+        try:
+            self._send_image(image, timestamp, sequence)
+        finally:
+            with self.count_lock:
+                self.sending -= 1
 
-        return {(0,0): numpy.rot90(m, rotation),
-                (0,1): numpy.flipud(numpy.rot90(m, rotation)),
-                (1,0): numpy.fliplr(numpy.rot90(m, rotation)),
-                (1,1): numpy.fliplr(numpy.flipud(numpy.rot90(m, rotation)))}[flips]
+
+    def send_stack(self, stack, timestamps, sequences):
+        """Send an (N, ny, nx) stack of transformed images to the client."""
+        client = self.client
+        if client is None:
+            self.cam.logger.log('    DataThread: Data not sent - no client to receive data.')
+            return
+        try:
+            client.receiveData('new image stack', stack, timestamps,
+                               sequences)
+        except Pyro4.errors.ConnectionClosedError:
+            self.cam.logger.log('    DataThread: Data not sent - client not listening.')
+            # No-one is listening.
+            self.cam.abort()
+            self.should_quit = True
+        with self.count_lock:
+            self.sent_count += len(stack)
+
+
+    def count_dispatch_error(self, error):
+        """Count an exception raised while dispatching, and log it.
+
+        Each new error is logged once, with its traceback, rather than
+        for every image."""
+        with self.count_lock:
+            self.dispatch_errors += 1
+            if str(error) == self.dispatch_error:
+                return
+            self.dispatch_error = str(error)
+        self.cam.logger.log('    DataThread: error dispatching image: %s\n%s'
+                            % (error, traceback.format_exc()))
+
+
+    def set_batching(self, size, timeout):
+        """Set the number of images, and time, to gather per send."""
+        self.batch_size = max(1, int(size))
+        self.batch_timeout = float(timeout)
+
+
+    def _send_image(self, image, timestamp, sequence):
+        # Take local references: set_client may be called during a send.
+        client, ring = self.client, self.shared_ring
+        if (ring is not None and ring.dtype != image.dtype
+                and ring.dtype == numpy.uint16):
+            # Frames are corrected to float32, but the ring was made for
+            # uint16: round them as a uint16 correction would. image is
+            # the dispatcher's own buffer. uint16 frames fit float32 slots.
+            round_for_uint16(image)
+        # Only clients that opt in are sent the sequence number.
+        extra = (sequence,) if self.send_sequence else ()
+        if client is not None:
+            try:
+                if ring is not None:
+                    # The ring's own counter marks overwritten slots: the
+                    # SDK's sequence number is sent separately.
+                    slot, ring_sequence, out = ring.reserve(
+                        self.get_transformed_shape(image.shape))
+                    self.get_transformed_image(image, out)
+                    descriptor = ring.commit(slot, ring_sequence, out,
+                                             timestamp)
+                    client.receiveData('new shared image', descriptor,
+                                       timestamp, *extra)
+                else:
+                    client.receiveData('new image',
+                                       self.get_transformed_image(image),
+                                       timestamp, *extra)
+            except Pyro4.errors.ConnectionClosedError:
+                self.cam.logger.log('    DataThread: Data not sent - client not listening.')
+                # No-one is listening.
+                self.cam.abort()
+                self.should_quit = True
+            # self.cam.logger.log('    DataThread: Data from camera sent to client.')
+            with self.count_lock:
+                self.sent_count += 1
+        else:
+            self.cam.logger.log('    DataThread: Data not sent - no client to receive data.')
 
 
     def run(self):
         self.cam.logger.log('    DataThread: entering run loop.')
-        while self.run_flag:
-            try:
-                result = self.cam.GetOldestImage16(self.image_array,
-                                                   self.n_pixels)
-            except:
-                self.cam.logger.log('    DataThread: Exception when tying GetOldestImage16.')
-                raise
-
-            if result[0] == sdk.DRV_SUCCESS:
-                # increment the camera exposure counter
-                self.cam.count += 1
-                # increment our exposure counter
-                self.exposure_count += 1
-                # indicate that there is data to send
-                send_data = True
-
-                if self.skip_next_n_images > 0:
-                    self.skip_next_n_images -= 1
-                    send_data = False
-                    self.cam.logger.log('    DataThread: Skipping image (next N).')
-
-                if self.exposure_count % self.skip_every_n_images > 0:
-                    send_data = False
-                    self.cam.logger.log('    DataThread: Skipping image (every N).')
-            else:
-                send_data = False
-
-            if send_data:
-                # Timestamp.  When using external triggering, the camera
-                # offers nothing more accurate than the system time.
-                timestamp = time.time()
-                if self.client is not None:
-                    try:
-                        self.client.receiveData('new image',
-                                                 self.get_transformed_image(),
-                                                 timestamp)
-                    except Pyro4.errors.ConnectionClosedError:
-                        self.cam.logger.log('    DataThread: Data not sent - client not listening.')
-                        # No-one is listening.
-                        self.cam.abort()
-                        self.should_quit = True
-                    # self.cam.logger.log('    DataThread: Data from camera sent to client.')
-                    self.sent_count += 1
-                else:
-                    self.cam.logger.log('    DataThread: Data not sent - no client to receive data.')
-            else:
-                time.sleep(0.01)
+        for dispatcher in self.dispatchers:
+            dispatcher.start()
+        try:
+            self.readout()
+        except Exception as e:
+            self.run_flag = False
+            self.cam.logger.log('    DataThread: readout failed: %s\n%s'
+                                % (e, traceback.format_exc()))
+            raise
+        finally:
+            # Whatever ended readout, free the dispatchers so that they,
+            # and the process, can exit.
+            with self.waiter_lock:
+                # Leave a waiter for stop to cancel that needs no closing.
+                self.retired_waiters.append(self.waiter)
+                self.waiter = PollWait(self.cam)
+            self.close_retired_waiters()
+            for item in self.queue.close():
+                self.pool.release(item[0])
+            for dispatcher in self.dispatchers:
+                dispatcher.join()
         self.cam.logger.log('    DataThread: exiting run loop.')
 
 
-    def set_client(self, client):
-        self.client = client
+    def readout(self):
+        """Read out and queue images until run_flag is cleared."""
+        while self.run_flag:
+            index, n, sequence = self.fetch_images()
+            if n == 0:
+                self.waiter.wait()
+                if self.retired_waiters:
+                    self.close_retired_waiters()
+                continue
+
+            timestamps = self.get_timestamps(sequence, n)
+            for i in range(n):
+                send = self.count_image()
+                recorder = self.recorder
+                if recorder is not None:
+                    recorder.put(self.pool.buffers[index + i], timestamps[i],
+                                 sequence + i)
+                if not (send and self.queue.put((index + i, timestamps[i],
+                                                 sequence + i))):
+                    self.pool.release(index + i)
+
+
+    def set_client(self, client, shared_ring=None):
+        """Set the client, waiting until sends to the old one are done."""
+        self.client, self.shared_ring = client, shared_ring
+        while self.sending:
+            time.sleep(0.001)
 
 
     def set_transform(self, transform):
@@ -903,16 +2957,146 @@ class DataThread(threading.Thread):
                 all(t ==0 or t == 1 for t in transform)):
             with self.transform_lock:
                 self.transform = transform
+                self.transform_recipe = compile_transform(transform)
         else:
             raise Exception('Bad transform: expected three-element tuple of 1s and 0s.')
 
 
+    def set_correction(self, maps, output):
+        """Correct frames with maps into output, 'uint16' or 'float32'.
+
+        Frames are sent uncorrected if maps or output is None."""
+        if maps is not None and maps.shape != self.pool.buffers[0].shape:
+            self.cam.logger.log('    DataThread: correction maps are for '
+                                '%s images: not applied.' % (maps.shape,))
+            maps = None
+        if maps is None or output is None:
+            self.correction = None
+        else:
+            self.correction = (maps, output)
+
+
+    def set_wait_strategy(self, name):
+        if name not in WAIT_STRATEGIES:
+            raise Exception('Bad wait strategy: expected one of %s.'
+                            % ', '.join(sorted(WAIT_STRATEGIES)))
+        waiter = WAIT_STRATEGIES[name](self.cam)
+        with self.waiter_lock:
+            old, self.waiter = self.waiter, waiter
+            if old is not None:
+                # The readout thread may be waiting on old: wake it, and
+                # leave it to close old once the wait has returned.
+                old.cancel()
+                self.retired_waiters.append(old)
+        if not self.is_alive():
+            self.close_retired_waiters()
+
+
+    def close_retired_waiters(self):
+        """Close waiters replaced by set_wait_strategy.
+
+        Call from the readout thread, or when it is not running."""
+        with self.waiter_lock:
+            waiters, self.retired_waiters = self.retired_waiters, []
+        for waiter in waiters:
+            waiter.close()
+
+
     def stop(self):
         self.run_flag = False
+        self.waiter.cancel()
+        # Wake readout if it is blocked on a full queue.
+        for item in self.queue.close():
+            self.pool.release(item[0])
         self.cam.logger.log('    DataThread: sent %d of %d exposures.'
                            % (self.sent_count, self.exposure_count))
 
 
+class DispatchThread(threading.Thread):
+    """A thread to send images queued by a DataThread to the client.
+
+    If the DataThread's batch_size is greater than 1, images are
+    gathered into a stack until batch_size images have arrived or
+    batch_timeout seconds have passed since the first, and the whole
+    stack is sent in one call. Shared-memory clients are always sent
+    single images.
+    """
+    def __init__(self, data_thread):
+        threading.Thread.__init__(self)
+        self.data_thread = data_thread
+        # Stack for batched dispatch, allocated on first use.
+        self.stack = None
+        # float32 buffer for corrected frames, allocated on first use.
+        self.corrected = None
+
+
+    def correct(self, image):
+        """Return image corrected, if the DataThread has a correction.
+
+        uint16 frames are corrected in place, and float32 frames into
+        this thread's buffer, which is reused for the next frame."""
+        correction = self.data_thread.correction
+        if correction is None:
+            return image
+        maps, output = correction
+        if self.corrected is None or self.corrected.shape != image.shape:
+            self.corrected = numpy.empty(image.shape, numpy.float32)
+        if output == 'float32':
+            return maps.apply(image, self.corrected)
+        return maps.apply(image, image, self.corrected)
+
+
+    def run(self):
+        dt = self.data_thread
+        while True:
+            item = dt.queue.get()
+            if item is None:
+                break
+            # An error sending one image, e.g. raised by the client, must
+            # not end this thread: readout would block on a full queue.
+            try:
+                if dt.batch_size > 1 and dt.shared_ring is None:
+                    self.send_batch(item)
+                    continue
+                index, timestamp, sequence = item
+                try:
+                    dt.send_image(self.correct(dt.pool.buffers[index]),
+                                  timestamp, sequence)
+                finally:
+                    dt.pool.release(index)
+            except Exception as e:
+                dt.count_dispatch_error(e)
+
+
+    def send_batch(self, item):
+        """Gather a batch of images, starting with item, and send it."""
+        dt = self.data_thread
+        n_max = dt.batch_size
+        deadline = time.time() + dt.batch_timeout
+        timestamps = numpy.zeros(n_max)
+        sequences = numpy.zeros(n_max, dtype=numpy.int64)
+        n = 0
+        while item is not None:
+            index, timestamps[n], sequences[n] = item
+            try:
+                image = self.correct(dt.pool.buffers[index])
+                shape = dt.get_transformed_shape(image.shape)
+                if (self.stack is None or len(self.stack) < n_max
+                        or self.stack.shape[1:] != shape
+                        or self.stack.dtype != image.dtype):
+                    self.stack = numpy.zeros((n_max,) + shape,
+                                             dtype=image.dtype)
+                dt.get_transformed_image(image, self.stack[n])
+            finally:
+                dt.pool.release(index)
+            n += 1
+            timeout = deadline - time.time()
+            if n == n_max or timeout <= 0:
+                break
+            item = dt.queue.get(timeout)
+        dt.send_stack(self.stack[:n], timestamps[:n], sequences[:n])
+
+
 class CameraManager(object):
     """A class to manage Camera instances in a single process.
 
@@ -0,0 +1,289 @@
+"""Prototypes parsed from andorsdk.function_list.
+
+Generated by andorsdk.write_prototypes: do not edit."""
+DIGEST = 'fc7d1760b563b8a780480d7cda3b0ff4'
+PROTOTYPES = {
+    'AbortAcquisition': (),
+    'CancelWait': (),
+    'CoolerOFF': (),
+    'CoolerON': (),
+    'DemosaicImage': (('WORD', True, 'grey'), ('WORD', True, 'red'), ('WORD', True, 'green'), ('WORD', True, 'blue'), ('ColorDemosaicInfo', True, 'info')),
+    'EnableKeepCleans': (('int', False, 'iMode'),),
+    'Filter_GetAveragingFactor': (('int', True, 'averagingFactor'),),
+    'Filter_GetAveragingFrameCount': (('int', True, 'frames'),),
+    'Filter_GetDataAveragingMode': (('int', True, 'mode'),),
+    'Filter_GetMode': (('u_int', True, 'mode'),),
+    'Filter_GetThreshold': (('float', True, 'threshold'),),
+    'Filter_SetAveragingFactor': (('int', False, 'averagingFactor'),),
+    'Filter_SetAveragingFrameCount': (('int', False, 'frames'),),
+    'Filter_SetDataAveragingMode': (('int', False, 'mode'),),
+    'Filter_SetMode': (('u_int', False, 'mode'),),
+    'Filter_SetThreshold': (('float', False, 'threshold'),),
+    'FreeInternalMemory': (),
+    'GPIBReceive': (('int', False, 'id'), ('short', False, 'address'), ('char', True, 'text'), ('int', False, 'size')),
+    'GPIBSend': (('int', False, 'id'), ('short', False, 'address'), ('char', True, 'text')),
+    'GetAcquiredData': (('at_32', True, 'arr'), ('u_long', False, 'size')),
+    'GetAcquiredData16': (('WORD', True, 'arr'), ('u_long', False, 'size')),
+    'GetAcquisitionProgress': (('long', True, 'acc'), ('long', True, 'series')),
+    'GetAcquisitionTimings': (('float', True, 'exposure'), ('float', True, 'accumulate'), ('float', True, 'kinetic')),
+    'GetAdjustedRingExposureTimes': (('int', False, 'inumTimes'), ('float', True, 'fptimes')),
+    'GetAmpDesc': (('int', False, 'index'), ('char', True, 'name'), ('int', False, 'length')),
+    'GetAmpMaxSpeed': (('int', False, 'index'), ('float', True, 'speed')),
+    'GetAvailableCameras': (('long', True, 'totalCameras'),),
+    'GetBaselineClamp': (('int', True, 'state'),),
+    'GetBitDepth': (('int', False, 'channel'), ('int', True, 'depth')),
+    'GetCameraEventStatus': (('DWORD', True, 'camStatus'),),
+    'GetCameraHandle': (('long', False, 'cameraIndex'), ('long', True, 'cameraHandle')),
+    'GetCameraInformation': (('int', False, 'index'), ('long', True, 'information')),
+    'GetCameraSerialNumber': (('int', True, 'number'),),
+    'GetCapabilities': (('AndorCapabilities', True, 'caps'),),
+    'GetControllerCardModel': (('char', True, 'controllerCardModel'),),
+    'GetCountConvertWavelengthRange': (('float', True, 'minval'), ('float', True, 'maxval')),
+    'GetCurrentCamera': (('long', True, 'cameraHandle'),),
+    'GetDDGExternalOutputEnabled': (('at_u32', False, 'uiIndex'), ('at_u32', True, 'puiEnabled')),
+    'GetDDGExternalOutputPolarity': (('at_u32', False, 'uiIndex'), ('at_u32', True, 'puiPolarity')),
+    'GetDDGExternalOutputStepEnabled': (('at_u32', False, 'uiIndex'), ('at_u32', True, 'puiEnabled')),
+    'GetDDGExternalOutputTime': (('at_u32', False, 'uiIndex'), ('at_u64', True, 'puiDelay'), ('at_u64', True, 'puiWidth')),
+    'GetDDGGateTime': (('at_u64', True, 'puiDelay'), ('at_u64', True, 'puiWidth')),
+    'GetDDGIOC': (('int', True, 'state'),),
+    'GetDDGIOCFrequency': (('double', True, 'frequency'),),
+    'GetDDGIOCNumber': (('u_long', True, 'numberPulses'),),
+    'GetDDGIOCNumberRequested': (('at_u32', True, 'pulses'),),
+    'GetDDGIOCPeriod': (('at_u64', True, 'period'),),
+    'GetDDGIOCPulses': (('int', True, 'pulses'),),
+    'GetDDGIOCTrigger': (('at_u32', True, 'trigger'),),
+    'GetDDGInsertionDelay': (('int', True, 'piState'),),
+    'GetDDGIntelligate': (('int', True, 'piState'),),
+    'GetDDGOpticalWidthEnabled': (('at_u32', True, 'puiEnabled'),),
+    'GetDDGPulse': (('double', False, 'wid'), ('double', False, 'resolution'), ('double', True, 'Delay'), ('double', True, 'Width')),
+    'GetDDGStepCoefficients': (('at_u32', False, 'mode'), ('double', True, 'p1'), ('double', True, 'p2')),
+    'GetDDGStepMode': (('at_u32', True, 'mode'),),
+    'GetDDGTTLGateWidth': (('at_u64', False, 'opticalWidth'), ('at_u64', True, 'ttlWidth')),
+    'GetDetector': (('int', True, 'xpixels'), ('int', True, 'ypixels')),
+    'GetDualExposureTimes': (('float', True, 'exposure1'), ('float', True, 'exposure2')),
+    'GetEMAdvanced': (('int', True, 'state'),),
+    'GetEMCCDGain': (('int', True, 'gain'),),
+    'GetEMGainRange': (('int', True, 'low'), ('int', True, 'high')),
+    'GetExternalTriggerTermination': (('at_u32', True, 'puiTermination'),),
+    'GetFKExposureTime': (('float', True, 'time'),),
+    'GetFKVShiftSpeedF': (('int', False, 'index'), ('float', True, 'speed')),
+    'GetFastestRecommendedVSSpeed': (('int', True, 'index'), ('float', True, 'speed')),
+    'GetFilterMode': (('int', True, 'mode'),),
+    'GetFrontEndStatus': (('int', True, 'piFlag'),),
+    'GetGateMode': (('int', True, 'piGatemode'),),
+    'GetHSSpeed': (('int', False, 'channel'), ('int', False, 'typ'), ('int', False, 'index'), ('float', True, 'speed')),
+    'GetHVflag': (('int', True, 'bFlag'),),
+    'GetHardwareVersion': (('u_int', True, 'PCB'), ('u_int', True, 'Decode'), ('u_int', True, 'dummy1'), ('u_int', True, 'dummy2'), ('u_int', True, 'CameraFirmwareVersion'), ('u_int', True, 'CameraFirmwareBuild')),
+    'GetHeadModel': (('char', True, 'name'),),
+    'GetIODirection': (('int', False, 'index'), ('int', True, 'iDirection')),
+    'GetIOLevel': (('int', False, 'index'), ('int', True, 'iLevel')),
+    'GetImageFlip': (('int', True, 'iHFlip'), ('int', True, 'iVFlip')),
+    'GetImageRotate': (('int', True, 'iRotate'),),
+    'GetImages': (('long', False, 'first'), ('long', False, 'last'), ('at_32', True, 'arr'), ('u_long', False, 'size'), ('long', True, 'validfirst'), ('long', True, 'validlast')),
+    'GetImages16': (('long', False, 'first'), ('long', False, 'last'), ('WORD', True, 'arr'), ('u_long', False, 'size'), ('long', True, 'validfirst'), ('long', True, 'validlast')),
+    'GetImagesPerDMA': (('u_long', True, 'images'),),
+    'GetKeepCleanTime': (('float', True, 'KeepCleanTime'),),
+    'GetMCPGain': (('int', True, 'piGain'),),
+    'GetMCPGainRange': (('int', True, 'iLow'), ('int', True, 'iHigh')),
+    'GetMCPVoltage': (('int', True, 'iVoltage'),),
+    'GetMaximumBinning': (('int', False, 'ReadMode'), ('int', False, 'HorzVert'), ('int', True, 'MaxBinning')),
+    'GetMaximumExposure': (('float', True, 'MaxExp'),),
+    'GetMetaDataInfo': (('SYSTEMTIME', True, 'TimeOfStart'), ('float', True, 'pfTimeFromStart'), ('u_int', False, 'index')),
+    'GetMinimumImageLength': (('int', True, 'MinImageLength'),),
+    'GetMostRecentColorImage16': (('u_long', False, 'size'), ('int', False, 'algorithm'), ('WORD', True, 'red'), ('WORD', True, 'green'), ('WORD', True, 'blue')),
+    'GetMostRecentImage': (('at_32', True, 'arr'), ('u_long', False, 'size')),
+    'GetMostRecentImage16': (('WORD', True, 'arr'), ('u_long', False, 'size')),
+    'GetNumberADChannels': (('int', True, 'channels'),),
+    'GetNumberAmp': (('int', True, 'amp'),),
+    'GetNumberAvailableImages': (('at_32', True, 'first'), ('at_32', True, 'last')),
+    'GetNumberDDGExternalOutputs': (('at_u32', True, 'puiCount'),),
+    'GetNumberFKVShiftSpeeds': (('int', True, 'number'),),
+    'GetNumberHSSpeeds': (('int', False, 'channel'), ('int', False, 'typ'), ('int', True, 'speeds')),
+    'GetNumberIO': (('int', True, 'iNumber'),),
+    'GetNumberNewImages': (('long', True, 'first'), ('long', True, 'last')),
+    'GetNumberPhotonCountingDivisions': (('at_u32', True, 'noOfDivisions'),),
+    'GetNumberPreAmpGains': (('int', True, 'noGains'),),
+    'GetNumberRingExposureTimes': (('int', True, 'ipnumTimes'),),
+    'GetNumberVSAmplitudes': (('int', True, 'number'),),
+    'GetNumberVSSpeeds': (('int', True, 'speeds'),),
+    'GetOldestImage': (('at_32', True, 'arr'), ('u_long', False, 'size')),
+    'GetOldestImage16': (('WORD', True, 'arr'), ('u_long', False, 'size')),
+    'GetPhosphorStatus': (('int', True, 'piFlag'),),
+    'GetPixelSize': (('float', True, 'xSize'), ('float', True, 'ySize')),
+    'GetPreAmpGain': (('int', False, 'index'), ('float', True, 'gain')),
+    'GetPreAmpGainText': (('int', False, 'index'), ('char', True, 'name'), ('int', False, 'length')),
+    'GetQE': (('char', True, 'sensor'), ('float', False, 'wavelength'), ('u_int', False, 'mode'), ('float', True, 'QE')),
+    'GetReadOutTime': (('float', True, 'ReadOutTime'),),
+    'GetRingExposureRange': (('float', True, 'fpMin'), ('float', True, 'fpMax')),
+    'GetSensitivity': (('int', False, 'channel'), ('int', False, 'horzShift'), ('int', False, 'amplifier'), ('int', False, 'pa'), ('float', True, 'sensitivity')),
+    'GetShutterMinTimes': (('int', True, 'minclosingtime'), ('int', True, 'minopeningtime')),
+    'GetSizeOfCircularBuffer': (('long', True, 'index'),),
+    'GetSoftwareVersion': (('u_int', True, 'eprom'), ('u_int', True, 'coffile'), ('u_int', True, 'vxdrev'), ('u_int', True, 'vxdver'), ('u_int', True, 'dllrev'), ('u_int', True, 'dllver')),
+    'GetStatus': (('int', True, 'status'),),
+    'GetTECStatus': (('int', True, 'piFlag'),),
+    'GetTemperature': (('int', True, 'temperature'),),
+    'GetTemperatureF': (('float', True, 'temperature'),),
+    'GetTemperatureRange': (('int', True, 'mintemp'), ('int', True, 'maxtemp')),
+    'GetTotalNumberImagesAcquired': (('long', True, 'index'),),
+    'GetTriggerLevelRange': (('float', True, 'minimum'), ('float', True, 'maximum')),
+    'GetVSAmplitudeFromString': (('char', True, 'text'), ('int', True, 'index')),
+    'GetVSAmplitudeString': (('int', False, 'index'), ('char', True, 'text')),
+    'GetVSAmplitudeValue': (('int', False, 'index'), ('int', True, 'value')),
+    'GetVSSpeed': (('int', False, 'index'), ('float', True, 'speed')),
+    'GetVersionInfo': (('AT_VersionInfoId', False, 'arr'), ('char', True, 'szVersionInfo'), ('at_u32', False, 'ui32BufferLen')),
+    'I2CBurstRead': (('BYTE', False, 'i2cAddress'), ('long', False, 'nBytes'), ('BYTE', True, 'data')),
+    'I2CBurstWrite': (('BYTE', False, 'i2cAddress'), ('long', False, 'nBytes'), ('BYTE', True, 'data')),
+    'I2CRead': (('BYTE', False, 'deviceID'), ('BYTE', False, 'intAddress'), ('BYTE', True, 'pdata')),
+    'I2CReset': (),
+    'I2CWrite': (('BYTE', False, 'deviceID'), ('BYTE', False, 'intAddress'), ('BYTE', False, 'data')),
+    'InAuxPort': (('int', False, 'port'), ('int', True, 'state')),
+    'Initialize': (('char', True, 'dir'),),
+    'IsAmplifierAvailable': (('int', False, 'iamp'),),
+    'IsCoolerOn': (('int', True, 'iCoolerStatus'),),
+    'IsCountConvertModeAvailable': (('int', False, 'mode'),),
+    'IsInternalMechanicalShutter': (('int', True, 'InternalShutter'),),
+    'IsPreAmpGainAvailable': (('int', False, 'channel'), ('int', False, 'amplifier'), ('int', False, 'index'), ('int', False, 'pa'), ('int', True, 'status')),
+    'IsTriggerModeAvailable': (('int', False, 'iTriggerMode'),),
+    'OA_AddMode': (('char', True, 'pcModeName'), ('u_int', False, 'uiModeNameLen'), ('char', True, 'pcModeDescription'), ('u_int', False, 'uiModeDescriptionLen')),
+    'OA_DeleteMode': (('char', True, 'pcModeName'), ('u_int', False, 'uiModeNameLen')),
+    'OA_EnableMode': (('char', True, 'pcModeName'),),
+    'OA_GetFloat': (('char', True, 'pcModeName'), ('char', True, 'pcModeParam'), ('float', True, 'fFloatValue')),
+    'OA_GetInt': (('char', True, 'pcModeName'), ('char', True, 'pcModeParam'), ('int', True, 'iIntValue')),
+    'OA_GetModeAcqParams': (('char', True, 'pcModeName'), ('char', True, 'pcListOfParams')),
+    'OA_GetNumberOfAcqParams': (('char', True, 'pcModeName'), ('u_int', True, 'puiNumberOfParams')),
+    'OA_GetNumberOfPreSetModes': (('u_int', True, 'puiNumberOfModes'),),
+    'OA_GetNumberOfUserModes': (('u_int', True, 'puiNumberOfModes'),),
+    'OA_GetPreSetModeNames': (('char', True, 'pcListOfModes'),),
+    'OA_GetString': (('char', True, 'pcModeName'), ('char', True, 'pcModeParam'), ('char', True, 'pcStringValue'), ('u_int', False, 'uiStringLen')),
+    'OA_GetUserModeNames': (('char', True, 'pcListOfModes'),),
+    'OA_Initialize': (('char', True, 'pcFilename'), ('u_int', False, 'uiFileNameLen')),
+    'OA_SetFloat': (('char', True, 'pcModeName'), ('char', True, 'pcModeParam'), ('float', False, 'fFloatValue')),
+    'OA_SetInt': (('char', True, 'pcModeName'), ('char', True, 'pcModeParam'), ('int', False, 'iIntValue')),
+    'OA_SetString': (('char', True, 'pcModeName'), ('char', True, 'pcModeParam'), ('char', True, 'pcStringValue'), ('u_int', False, 'uiStringLen')),
+    'OA_WriteToFile': (('char', True, 'pcFileName'), ('u_int', False, 'uiFileNameLen')),
+    'OutAuxPort': (('int', False, 'port'), ('int', False, 'state')),
+    'PostProcessCountConvert': (('at_32', True, 'pInputImage'), ('at_32', True, 'pOutputImage'), ('int', False, 'iOutputBufferSize'), ('int', False, 'iNumImages'), ('int', False, 'iBaseline'), ('int', False, 'iMode'), ('int', False, 'iEmGain'), ('float', False, 'fQE'), ('float', False, 'fSensitivity'), ('int', False, 'iHeight'), ('int', False, 'iWidth')),
+    'PostProcessNoiseFilter': (('at_32', True, 'pInputImage'), ('at_32', True, 'pOutputImage'), ('int', False, 'iOutputBufferSize'), ('int', False, 'iBaseline'), ('int', False, 'iMode'), ('float', False, 'fThreshold'), ('int', False, 'iHeight'), ('int', False, 'iWidth')),
+    'PostProcessPhotonCounting': (('at_32', True, 'pInputImage'), ('at_32', True, 'pOutputImage'), ('int', False, 'iOutputBufferSize'), ('int', False, 'iNumImages'), ('int', False, 'iNumframes'), ('int', False, 'iNumberOfThresholds'), ('float', True, 'pfThreshold'), ('int', False, 'iHeight'), ('int', False, 'iWidth')),
+    'PrepareAcquisition': (),
+    'SaveAsBmp': (('char', True, 'path'), ('char', True, 'palette'), ('long', False, 'ymin'), ('long', False, 'ymax')),
+    'SaveAsCommentedSif': (('char', True, 'path'), ('char', True, 'comment')),
+    'SaveAsEDF': (('char', True, 'szPath'), ('int', False, 'iMode')),
+    'SaveAsFITS': (('char', True, 'szFileTitle'), ('int', False, 'typ')),
+    'SaveAsRaw': (('char', True, 'szFileTitle'), ('int', False, 'typ')),
+    'SaveAsSPC': (('char', True, 'path'),),
+    'SaveAsSif': (('char', True, 'path'),),
+    'SaveAsTiff': (('char', True, 'path'), ('char', True, 'palette'), ('int', False, 'position'), ('int', False, 'typ')),
+    'SaveAsTiffEx': (('char', True, 'path'), ('char', True, 'palette'), ('int', False, 'position'), ('int', False, 'typ'), ('int', False, 'mode')),
+    'SendSoftwareTrigger': (),
+    'SetADChannel': (('int', False, 'channel'),),
+    'SetAccumulationCycleTime': (('float', False, 'time'),),
+    'SetAcqStatusEvent': (('HANDLE', False, 'statusEvent'),),
+    'SetAcquisitionMode': (('int', False, 'mode'),),
+    'SetAdvancedTriggerModeState': (('int', False, 'iState'),),
+    'SetBaselineClamp': (('int', False, 'state'),),
+    'SetBaselineOffset': (('int', False, 'offset'),),
+    'SetCameraLinkMode': (('int', False, 'mode'),),
+    'SetCameraStatusEnable': (('DWORD', False, 'Enable'),),
+    'SetChargeShifting': (('u_int', False, 'NumberRows'), ('u_int', False, 'NumberRepeats')),
+    'SetComplexImage': (('int', False, 'numAreas'), ('int', True, 'areas')),
+    'SetCoolerMode': (('int', False, 'mode'),),
+    'SetCountConvertMode': (('int', False, 'Mode'),),
+    'SetCountConvertWavelength': (('float', False, 'wavelength'),),
+    'SetCropMode': (('int', False, 'active'), ('int', False, 'cropHeight'), ('int', False, 'reserved')),
+    'SetCurrentCamera': (('long', False, 'cameraHandle'),),
+    'SetCustomTrackHBin': (('int', False, 'bin'),),
+    'SetDACOutput': (('int', False, 'iOption'), ('int', False, 'iResolution'), ('int', False, 'iValue')),
+    'SetDACOutputScale': (('int', False, 'iScale'),),
+    'SetDDGExternalOutputEnabled': (('at_u32', False, 'uiIndex'), ('at_u32', False, 'uiEnabled')),
+    'SetDDGExternalOutputPolarity': (('at_u32', False, 'uiIndex'), ('at_u32', False, 'uiPolarity')),
+    'SetDDGExternalOutputStepEnabled': (('at_u32', False, 'uiIndex'), ('at_u32', False, 'uiEnabled')),
+    'SetDDGExternalOutputTime': (('at_u32', False, 'uiIndex'), ('at_u64', False, 'uiDelay'), ('at_u64', False, 'uiWidth')),
+    'SetDDGGateStep': (('double', False, 'step_Renamed'),),
+    'SetDDGGateTime': (('at_u64', False, 'uiDelay'), ('at_u64', False, 'uiWidth')),
+    'SetDDGIOC': (('int', False, 'state'),),
+    'SetDDGIOCFrequency': (('double', False, 'frequency'),),
+    'SetDDGIOCNumber': (('u_long', False, 'numberPulses'),),
+    'SetDDGIOCPeriod': (('at_u64', False, 'period'),),
+    'SetDDGIOCTrigger': (('at_u32', False, 'trigger'),),
+    'SetDDGInsertionDelay': (('int', False, 'state'),),
+    'SetDDGIntelligate': (('int', False, 'state'),),
+    'SetDDGOpticalWidthEnabled': (('at_u32', False, 'uiEnabled'),),
+    'SetDDGStepCoefficients': (('at_u32', False, 'mode'), ('double', False, 'p1'), ('double', False, 'p2')),
+    'SetDDGStepMode': (('at_u32', False, 'mode'),),
+    'SetDDGTimes': (('double', False, 't0'), ('double', False, 't1'), ('double', False, 't2')),
+    'SetDDGTriggerMode': (('int', False, 'mode'),),
+    'SetDDGVariableGateStep': (('int', False, 'mode'), ('double', False, 'p1'), ('double', False, 'p2')),
+    'SetDMAParameters': (('int', False, 'MaxImagesPerDMA'), ('float', False, 'SecondsPerDMA')),
+    'SetDelayGenerator': (('int', False, 'board'), ('short', False, 'address'), ('int', False, 'typ')),
+    'SetDriverEvent': (('HANDLE', False, 'driverEvent'),),
+    'SetDualExposureMode': (('int', False, 'mode'),),
+    'SetDualExposureTimes': (('float', False, 'expTime1'), ('float', False, 'expTime2')),
+    'SetEMAdvanced': (('int', False, 'state'),),
+    'SetEMCCDGain': (('int', False, 'gain'),),
+    'SetEMGainMode': (('int', False, 'mode'),),
+    'SetExposureTime': (('float', False, 'time'),),
+    'SetExternalTriggerTermination': (('at_u32', False, 'uiTermination'),),
+    'SetFKVShiftSpeed': (('int', False, 'index'),),
+    'SetFVBHBin': (('int', False, 'bin'),),
+    'SetFanMode': (('int', False, 'mode'),),
+    'SetFastExtTrigger': (('int', False, 'mode'),),
+    'SetFastKinetics': (('int', False, 'exposedRows'), ('int', False, 'seriesLength'), ('float', False, 'time'), ('int', False, 'mode'), ('int', False, 'hbin'), ('int', False, 'vbin')),
+    'SetFastKineticsEx': (('int', False, 'exposedRows'), ('int', False, 'seriesLength'), ('float', False, 'time'), ('int', False, 'mode'), ('int', False, 'hbin'), ('int', False, 'vbin'), ('int', False, 'offset')),
+    'SetFilterMode': (('int', False, 'mode'),),
+    'SetFrameTransferMode': (('int', False, 'mode'),),
+    'SetFrontEndEvent': (('HANDLE', False, 'driverEvent'),),
+    'SetGate': (('float', False, 'delay'), ('float', False, 'width'), ('float', False, 'stepRenamed')),
+    'SetGateMode': (('int', False, 'gatemode'),),
+    'SetHSSpeed': (('int', False, 'typ'), ('int', False, 'index')),
+    'SetHighCapacity': (('int', False, 'state'),),
+    'SetIODirection': (('int', False, 'index'), ('int', False, 'iDirection')),
+    'SetIOLevel': (('int', False, 'index'), ('int', False, 'iLevel')),
+    'SetImage': (('int', False, 'hbin'), ('int', False, 'vbin'), ('int', False, 'hstart'), ('int', False, 'hend'), ('int', False, 'vstart'), ('int', False, 'vend')),
+    'SetImageFlip': (('int', False, 'iHFlip'), ('int', False, 'iVFlip')),
+    'SetImageRotate': (('int', False, 'iRotate'),),
+    'SetIsolatedCropMode': (('int', False, 'active'), ('int', False, 'cropheight'), ('int', False, 'cropwidth'), ('int', False, 'vbin'), ('int', False, 'hbin')),
+    'SetKineticCycleTime': (('float', False, 'time'),),
+    'SetMCPGain': (('int', False, 'gain'),),
+    'SetMCPGating': (('int', False, 'gating'),),
+    'SetMetaData': (('int', False, 'state'),),
+    'SetMultiTrack': (('int', False, 'number'), ('int', False, 'height'), ('int', False, 'offset'), ('int', True, 'bottom'), ('int', True, 'gap')),
+    'SetMultiTrackHBin': (('int', False, 'bin'),),
+    'SetMultiTrackHRange': (('int', False, 'iStart'), ('int', False, 'iEnd')),
+    'SetNumberAccumulations': (('int', False, 'number'),),
+    'SetNumberKinetics': (('int', False, 'number'),),
+    'SetNumberPrescans': (('int', False, 'iNumber'),),
+    'SetOutputAmplifier': (('int', False, 'typ'),),
+    'SetOverlapMode': (('int', False, 'mode'),),
+    'SetPCIMode': (('int', False, 'mode'), ('int', False, 'value')),
+    'SetPhosphorEvent': (('HANDLE', False, 'driverEvent'),),
+    'SetPhotonCounting': (('int', False, 'state'),),
+    'SetPhotonCountingDivisions': (('at_u32', False, 'noOfDivisions'), ('at_32', True, 'divisions')),
+    'SetPhotonCountingThreshold': (('long', False, 'min'), ('long', False, 'max')),
+    'SetPreAmpGain': (('int', False, 'index'),),
+    'SetRandomTracks': (('int', False, 'numTracks'), ('int', True, 'areas')),
+    'SetReadMode': (('int', False, 'mode'),),
+    'SetRingExposureTimes': (('int', False, 'numTimes'), ('float', True, 'times')),
+    'SetSaturationEvent': (('HANDLE', False, 'saturationEvent'),),
+    'SetShutter': (('int', False, 'typ'), ('int', False, 'mode'), ('int', False, 'closingtime'), ('int', False, 'openingtime')),
+    'SetShutterEx': (('int', False, 'typ'), ('int', False, 'mode'), ('int', False, 'closingtime'), ('int', False, 'openingtime'), ('int', False, 'extmode')),
+    'SetSifComment': (('char', True, 'comment'),),
+    'SetSingleTrack': (('int', False, 'centre'), ('int', False, 'height')),
+    'SetSingleTrackHBin': (('int', False, 'bin'),),
+    'SetSpool': (('int', False, 'active'), ('int', False, 'method'), ('char', True, 'path'), ('int', False, 'framebuffersize')),
+    'SetSpoolThreadCount': (('int', False, 'count'),),
+    'SetTECEvent': (('HANDLE', False, 'driverEvent'),),
+    'SetTemperature': (('int', False, 'temperature'),),
+    'SetTriggerInvert': (('int', False, 'mode'),),
+    'SetTriggerLevel': (('float', False, 'f_level'),),
+    'SetTriggerMode': (('int', False, 'mode'),),
+    'SetVSAmplitude': (('int', False, 'index'),),
+    'SetVSSpeed': (('int', False, 'index'),),
+    'ShutDown': (),
+    'StartAcquisition': (),
+    'WaitForAcquisition': (),
+    'WaitForAcquisitionByHandle': (('long', False, 'cameraHandle'),),
+    'WaitForAcquisitionByHandleTimeOut': (('long', False, 'cameraHandle'), ('int', False, 'iTimeOutMs')),
+    'WaitForAcquisitionTimeOut': (('int', False, 'iTimeOutMs'),),
+    'WhiteBalance': (('WORD', True, 'wRed'), ('WORD', True, 'wGreen'), ('WORD', True, 'wBlue'), ('float', True, 'fRelR'), ('float', True, 'fRelB'), ('WhiteBalanceInfo', True, 'info')),
+}
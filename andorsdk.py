@@ -25,19 +25,34 @@
 
    When called by concurrent processes, SetCurrentCamera sets the camera only
    for the calling process - not all running processes.
+
+   The ANDOR_SDK environment variable selects the backend: 'dll' loads
+   Andor's DLL; 'sim' loads the simulated SDK in andorsim, so that this
+   module can be used without camera hardware. The default is 'dll' on
+   Windows, and 'sim' elsewhere.
 """
-import re, sys, functools, os
-from ctypes import Structure, WinDLL, POINTER
+import re, sys, functools, hashlib, os
+from ctypes import Structure, POINTER
 from ctypes import c_int, c_uint, c_long, c_ulong, c_longlong, c_ulonglong
 from ctypes import c_ubyte, c_short, c_float, c_double, c_char, c_char_p
-from ctypes import c_void_p
-from ctypes.wintypes import BYTE, WORD, DWORD, HANDLE, HWND
+from ctypes import c_void_p, c_ushort
 from numpy.ctypeslib import ndpointer
+try:
+    from ctypes.wintypes import BYTE, WORD, DWORD, HANDLE, HWND
+except (ImportError, ValueError):
+    # Not on Windows: use types of the same size.
+    BYTE, WORD, DWORD = c_ubyte, c_ushort, c_uint
+    HANDLE = HWND = c_void_p
 
 PATH = os.path.dirname(os.path.abspath(__file__))
 DLL_FILE = os.path.join(PATH, 'atmcd64d.dll')
 
-_dll = WinDLL(DLL_FILE)
+## The SDK backend: 'dll' or 'sim'.
+BACKEND = os.environ.get('ANDOR_SDK',
+                         'dll' if sys.platform == 'win32' else 'sim')
+if BACKEND not in ('dll', 'sim'):
+    raise Exception("Bad ANDOR_SDK backend %r: expected 'dll' or 'sim'."
+                    % BACKEND)
 
 """Version Information Definitions"""
 ## Version infomration enumeration
@@ -829,66 +844,92 @@ _types = {
     'SYSTEMTIME': SYSTEMTIME,
 }
 
+## Status codes returned, rather than raised, by wrapped functions:
+# success, idle, no new data and the temperature status codes.
+RETURN_CODES = frozenset([DRV_SUCCESS, DRV_IDLE, DRV_NO_NEW_DATA] +
+                         range(DRV_TEMP_CODES, DRV_GENERAL_ERRORS))
+
+## Profiler for DLL calls, or None: see sdkprofile.
+profiler = None
+## Executor that runs DLL calls, or None: see andor.CameraExecutor.
+executor = None
+
 ## Function wrapper
 # Raise exceptions if returned status is not DRV_SUCCESS.
 def sdk_wrapper(func):
+    queued = func.__name__ not in UNQUEUED_FUNCTIONS
+    # Unqueued functions that act on the current camera still need it
+    # selected: the executor does so in the calling thread.
+    selected = not queued and func.__name__ not in HANDLE_FUNCTIONS
+    def call(*args, **kwargs):
+        if profiler is None:
+            status = func(*args, **kwargs)
+        else:
+            status = profiler.call(func, *args, **kwargs)
+        # Return args on success, idle, no_new_data or temperature status.
+        if status in RETURN_CODES:
+            return (status, lookup_status(status), args)
+        # Otherwise raise an error.
+        msg = "Andor function %s returned status %s:  %s." % (
+            func.__name__, status, lookup_status(status))
+        raise Exception(msg)
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        try:
-            status = func(*args, **kwargs)
-            # Return args on success, idle or no_new_data.
-            if status in [DRV_SUCCESS, DRV_IDLE, DRV_NO_NEW_DATA]:
-                return (status, lookup_status(status), args)
-            # Return temperature status codes.
-            elif status in range(DRV_TEMP_CODES, DRV_GENERAL_ERRORS):
-                return (status, lookup_status(status), args)
-            # Otherwise raise an error.
-            else:
-                msg = "Andor function %s returned status %s:  %s." % (
-                    func.__name__, status, lookup_status(status))
-                raise Exception(msg)
-        except:
-            raise
+        if executor is not None and not executor.in_worker():
+            if queued:
+                # Run this wrapper on one of the executor's threads.
+                return executor.call(wrapper, args, kwargs)
+            if selected:
+                return executor.call_here(call, args, kwargs)
+        return call(*args, **kwargs)
     return wrapper
 
 
-## Export DLL functions
-camerafuncs = []
-search = re.compile('(?P<func>.*)\((?P<args>.*)\)')
-for fndef in function_list:
-    # Split function definition into name and arguments.
-    match = search.search(fndef)
-    fnstr = match.group('func')
-    args = match.group('args').split(',')
+def check_status(status, func, args):
+    """A ctypes errcheck that returns status, or raises on an error."""
+    if status in RETURN_CODES:
+        return status
+    raise Exception("Andor function %s returned status %s:  %s." % (
+        func.__name__, status, lookup_status(status)))
 
-    ## Export the DLL function from this module.
-    # We need a reference, f, to the unwrapped function for setting argtypes.
-    f = getattr(_dll, fnstr)
-    # Make the wrapped function an attribute of this module
-    setattr(this, fnstr, sdk_wrapper(f))
-    camerafuncs.append(sdk_wrapper(f))
 
-    # Set the return type - always an int for these SDK functions.
-    f.restype = c_int
+## Load the DLL, or the simulation.
+if BACKEND == 'sim':
+    import andorsim
+    _dll = andorsim.SimDLL()
+else:
+    from ctypes import WinDLL
+    _dll = WinDLL(DLL_FILE)
 
-    argtypes = []
-    is_pointer = False
-    for arg in args:
+## Prototype parsing
+search = re.compile('(?P<func>.*)\((?P<args>.*)\)')
+
+def parse_prototype(fndef):
+    """Split a prototype into the function name and its arguments.
+
+    Each argument is returned as (type, is_pointer, name)."""
+    match = search.search(fndef)
+    args = []
+    for arg in match.group('args').split(','):
         # We don't care about const.
         arg = arg.replace('const ', '')
         # Unsigned ctypes are prefixed with u_.
         arg = arg.replace('unsigned ', 'u_')
-        # Does the pointer expect a pointer for this argument?
-        is_pointer = '*' in arg
         # Get the argument type and name from first and last tokens in arg.
-        argtype = arg.split()[0]
-        argname = arg.split()[-1]
+        tokens = arg.split()
+        if tokens == ['void']:
+            # fn(void): no arguments.
+            continue
+        args.append((tokens[0], '*' in arg, tokens[-1]))
+    return match.group('func').strip(), tuple(args)
+
 
+def get_argtypes(args):
+    """Return ctypes argtypes for arguments from parse_prototype."""
+    argtypes = []
+    for argtype, is_pointer, argname in args:
         if argtype == 'void' and is_pointer:
-            argtype = c_void_p
-        elif argtype == 'void':
-            # void but not pointer, so fn(void): no arguments.
-            pass
+            argtypes.append(c_void_p)
         elif argtype == 'char' and is_pointer:
             argtypes.append(c_char_p)
         elif argtype in _types and is_pointer:
@@ -905,14 +946,162 @@ for fndef in function_list:
         else:
             # The argument type is not supported here.
             raise Exception('Type %s not handled.' % argtype)
-        f.argtypes = argtypes
+    return argtypes
+
+
+## Precompiled prototypes
+# andorprototypes holds the parsed function_list, written by
+# write_prototypes. It is used only if it matches function_list.
+PROTOTYPES_FILE = os.path.join(PATH, 'andorprototypes.py')
+PROTOTYPES_DIGEST = hashlib.md5('\n'.join(function_list)).hexdigest()
+try:
+    import andorprototypes
+except ImportError:
+    andorprototypes = None
+if andorprototypes and andorprototypes.DIGEST == PROTOTYPES_DIGEST:
+    _prototypes = andorprototypes.PROTOTYPES
+else:
+    # Prototype strings by name, parsed when a function is first bound.
+    _prototypes = dict((fndef.split('(', 1)[0].strip(), fndef)
+                       for fndef in function_list)
+
+
+def write_prototypes(filename=PROTOTYPES_FILE):
+    """Write the parsed function_list to a module of precompiled prototypes."""
+    prototypes = dict(parse_prototype(fndef) for fndef in function_list)
+    with open(filename, 'w') as fh:
+        fh.write('"""Prototypes parsed from andorsdk.function_list.\n\n'
+                 'Generated by andorsdk.write_prototypes: do not edit."""\n')
+        fh.write('DIGEST = %r\n' % PROTOTYPES_DIGEST)
+        fh.write('PROTOTYPES = {\n')
+        for name in sorted(prototypes):
+            fh.write('    %r: %r,\n' % (name, prototypes[name]))
+        fh.write('}\n')
+
+
+## Export DLL functions
+# Functions are bound lazily: each module attribute starts as a
+# LazyFunction, replaced by the typed and wrapped DLL function when it
+# is first called or bound.
+def get_prototype(name):
+    """Return the parsed arguments of DLL function name."""
+    prototype = _prototypes[name]
+    if isinstance(prototype, str):
+        prototype = parse_prototype(prototype)[1]
+    return prototype
+
+
+def bind(name):
+    """Bind DLL function name, if not yet bound, and return it wrapped."""
+    func = getattr(this, name)
+    if not isinstance(func, LazyFunction):
+        return func
+    # We need a reference, f, to the unwrapped function for setting argtypes.
+    f = getattr(_dll, name)
+    # Set the return type - always an int for these SDK functions.
+    f.restype = c_int
+    f.argtypes = get_argtypes(get_prototype(name))
+    # Make the wrapped function an attribute of this module
+    func.func = sdk_wrapper(f)
+    setattr(this, name, func.func)
+    return func.func
+
+
+def bind_all():
+    """Bind every DLL function now, rather than on first use."""
+    for name in _prototypes:
+        bind(name)
+
+
+## Functions called for every frame, which have a fast call path.
+FAST_FUNCTIONS = ('GetOldestImage16', 'GetNumberNewImages', 'GetImages16',
+                  'GetMetaDataInfo')
+_fast = {}
+
+## Functions that act on the camera whose handle they are passed, rather
+# than the current camera.
+HANDLE_FUNCTIONS = ('WaitForAcquisitionByHandle',
+                    'WaitForAcquisitionByHandleTimeOut')
+
+## Functions that an executor runs in the calling thread: waits, which
+# would block its threads, and CancelWait, which ends them. Those that
+# act on the current camera are run once the executor has selected it.
+UNQUEUED_FUNCTIONS = HANDLE_FUNCTIONS + ('WaitForAcquisition',
+                                         'WaitForAcquisitionTimeOut',
+                                         'CancelWait')
+
+def bind_fast(name):
+    """Return DLL function name, checked by ctypes rather than wrapped.
+
+    The function returns just its status, and raises an exception on an
+    error status, without building a result tuple or looking up status
+    names on success. It is a separate function object from the one
+    bound by bind, so the two do not share errcheck."""
+    if name not in _fast:
+        f = _dll[name]
+        f.restype = c_int
+        f.argtypes = get_argtypes(get_prototype(name))
+        f.errcheck = check_status
+        _fast[name] = f
+    return _fast[name]
+
+
+class LazyFunction(object):
+    """A placeholder for a DLL function that binds it on first call."""
+    __slots__ = ('__name__', 'func')
+
+    def __init__(self, name):
+        self.__name__ = name
+        self.func = None
+
+
+    def __call__(self, *args, **kwargs):
+        return (self.func or bind(self.__name__))(*args, **kwargs)
+
+
+## Placeholders for all the DLL functions, for Camera methods.
+camerafuncs = []
+for name in _prototypes:
+    camerafuncs.append(LazyFunction(name))
+    setattr(this, name, camerafuncs[-1])
+
+
+## Win32 event objects, for use with SetDriverEvent.
+if sys.platform == 'win32':
+    from ctypes import WinDLL
+    WAIT_OBJECT_0 = 0x0
+    WAIT_TIMEOUT = 0x102
+    _kernel32 = WinDLL('kernel32')
+    _kernel32.CreateEventA.restype = HANDLE
+    _kernel32.CreateEventA.argtypes = [c_void_p, c_int, c_int, c_char_p]
+    _kernel32.WaitForSingleObject.restype = DWORD
+    _kernel32.WaitForSingleObject.argtypes = [HANDLE, DWORD]
+    _kernel32.SetEvent.argtypes = [HANDLE]
+    _kernel32.CloseHandle.argtypes = [HANDLE]
+
+    def create_event():
+        """Create an auto-reset event and return its handle."""
+        return _kernel32.CreateEventA(None, False, False, None)
+
+    def wait_for_event(handle, timeout_ms):
+        """Wait for an event. Return True if set, False on timeout."""
+        return _kernel32.WaitForSingleObject(handle, timeout_ms) == WAIT_OBJECT_0
+
+    def set_event(handle):
+        _kernel32.SetEvent(handle)
+
+    def close_event(handle):
+        _kernel32.CloseHandle(handle)
+else:
+    # Only the simulation can set events here.
+    from andorsim import create_event, wait_for_event, set_event, close_event
 
 
 ## We need a mapping to enable lookup of status codes to meaning.
 status_codes = {}
 for attrib_name in dir(this):
     if attrib_name.startswith('DRV_'):
-        status_codes.update({eval(attrib_name): attrib_name})
+        status_codes.update({getattr(this, attrib_name): attrib_name})
 
 ## The lookup function.
 def lookup_status(code):
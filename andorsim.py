@@ -0,0 +1,1395 @@
+#
+#   andorsim - a simulation of Andor's SDK DLL.
+#   Copyright (C) 2015 Mick Phillips
+#   mick.phillips@gmail.com
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""andorsim - a simulation of Andor's SDK DLL.
+
+andorsdk loads a SimDLL in place of Andor's DLL when the ANDOR_SDK
+environment variable is 'sim', which is the default off Windows. The
+attributes of a SimDLL are function objects that apply restype,
+argtypes and errcheck as ctypes functions do, so andorsdk and the
+Camera class run against the simulation unchanged.
+
+Simulated cameras are iXon Ultras. Each camera has:
+* a circular buffer, filled in single scan, accumulate, kinetic series,
+  fast kinetics and run till abort modes, with internal, external or
+  software triggers (see SimCamera.trigger);
+* frame, readout and keep clean times that follow the exposure and
+  cycle times, image area, binning, crop mode, frame transfer mode and
+  shift speeds;
+* a sensor temperature that ramps towards its set-point while the
+  cooler is on;
+* the DRV_* status codes that the SDK returns for bad arguments, for
+  calls before Initialize, and for changes made while acquiring.
+Functions that are not simulated return DRV_NOT_SUPPORTED, except for
+Set... functions, which store their arguments and succeed.
+
+Images hold a fixed pattern, except that the first two pixels hold the
+low and high 16 bits of the image index, so that clients can check for
+lost images and, with SimCamera.frame_times, measure latency. With the
+shutter closed by SetShutter, the pattern is just the bias level.
+
+The simulation is configured by environment variables:
+    ANDOR_SIM_CAMERAS    number of cameras (default 1);
+    ANDOR_SIM_DETECTOR   detector size as WIDTHxHEIGHT (default 512x512);
+    ANDOR_SIM_BUFFER_MB  circular buffer size in megabytes (default 128).
+"""
+
+import itertools
+import numpy
+import os
+import select
+import sys
+import threading
+import time
+from collections import deque
+from ctypes import ArgumentError, _SimpleCData, c_int, c_long, c_uint, c_ulong
+
+## andorsdk, bound by SimDLL: andorsdk imports this module part way
+# through its own import, once the constants used here are defined.
+sdk = None
+## The SimLibrary behind the SimDLL.
+library = None
+
+## Horizontal shift speeds in MHz, by output amplifier (0: EM; 1: conv.)
+HS_SPEEDS = {0: [17., 10., 5., 1.],
+             1: [3., 1., 0.08]}
+## Vertical shift speeds in microseconds per row.
+VS_SPEEDS = [0.3, 0.5, 0.9, 1.7, 3.3]
+## Fastest vertical shift speed recommended at normal clock amplitude.
+FASTEST_VS_INDEX = 1
+## Fast kinetics vertical shift speeds in microseconds per row.
+FK_VS_SPEEDS = VS_SPEEDS
+PREAMP_GAINS = [1., 2.]
+AMPLIFIER_NAMES = ['Electron Multiplying', 'Conventional']
+EM_GAIN_RANGE = (0, 300)
+PIXEL_SIZE = 16.
+KEEP_CLEAN_TIME = 0.0005
+## Level of every pixel in an image taken in the dark.
+BIAS = 100
+MAXIMUM_EXPOSURE = 1000.
+
+## Sensor temperature range, and temperature with the cooler off.
+TEMPERATURE_RANGE = (-100, 20)
+AMBIENT_TEMPERATURE = 20.
+DEFAULT_TARGET_TEMPERATURE = -60
+## Rate of change of temperature, in degrees per second.
+COOLING_RATE = 10.
+## Seconds after reaching the set-point until temperature is stable.
+SETTLE_TIME = 2.
+
+## Trigger modes, and the modes in which images are triggered.
+TRIGGER_MODES = (0, 1, 6, 7, 10)
+TRIGGERED_MODES = (1, 6, 7, 10)
+## Acquisition modes: single scan, accumulate, kinetics, fast kinetics,
+## run till abort. A fast kinetics series is one image.
+ACQUISITION_MODES = (1, 2, 3, 4, 5)
+## Raw spool methods, and their pixel types.
+SPOOL_DTYPES = {0: numpy.int32, 1: numpy.uint16, 2: numpy.uint16}
+
+## Set... functions that may be called while acquiring.
+LIVE_FUNCTIONS = ('SetDriverEvent', 'SetEMCCDGain', 'SetTemperature',
+                  'SetFanMode')
+## Functions of the library, rather than of the current camera.
+LIBRARY_FUNCTIONS = ('GetAvailableCameras', 'GetCameraHandle',
+                     'GetCurrentCamera', 'SetCurrentCamera',
+                     'WaitForAcquisitionByHandle',
+                     'WaitForAcquisitionByHandleTimeOut')
+
+## Longest time the acquisition clock sleeps when nothing is scheduled.
+MAX_IDLE = 1.
+FIRST_HANDLE = 100
+FIRST_SERIAL = 9000
+
+
+if sys.platform == 'win32':
+    class Event(object):
+        """An auto-reset event.
+
+        Timed waits poll in Python 2, so may wake late: with the DLL
+        normally available on Windows, this is rarely used."""
+        def __init__(self):
+            self.event = threading.Event()
+
+
+        def set(self):
+            self.event.set()
+
+
+        def wait(self, timeout=None):
+            result = self.event.wait(timeout)
+            self.event.clear()
+            return bool(result)
+
+
+        def close(self):
+            pass
+else:
+    class Event(object):
+        """An auto-reset event that wakes a waiter as soon as it is set.
+
+        Timed waits on threading objects poll in Python 2, waking up to
+        50ms late; waiting in select on a pipe wakes at once."""
+        def __init__(self):
+            self.r, self.w = os.pipe()
+            self.lock = threading.Lock()
+            self.is_set = False
+
+
+        def set(self):
+            with self.lock:
+                if not self.is_set:
+                    self.is_set = True
+                    os.write(self.w, b'x')
+
+
+        def wait(self, timeout=None):
+            """Wait for the event. Return True if set, False on timeout."""
+            if not select.select([self.r], [], [], timeout)[0]:
+                return False
+            with self.lock:
+                if not self.is_set:
+                    # Another thread took it.
+                    return False
+                os.read(self.r, 1)
+                self.is_set = False
+            return True
+
+
+        def close(self):
+            os.close(self.r)
+            os.close(self.w)
+
+
+## Events created for SetDriverEvent, by handle.
+_events = {}
+_event_handles = itertools.count(1)
+
+def create_event():
+    """Create an auto-reset event and return its handle."""
+    handle = next(_event_handles)
+    _events[handle] = Event()
+    return handle
+
+def wait_for_event(handle, timeout_ms):
+    """Wait for an event. Return True if set, False on timeout."""
+    return _events[handle].wait(timeout_ms / 1000.)
+
+def set_event(handle):
+    _events[handle].set()
+
+def close_event(handle):
+    _events.pop(handle).close()
+
+
+def _target(p):
+    """Return the ctypes object that a pointer argument refers to."""
+    if hasattr(p, '_obj'):
+        # From byref.
+        return p._obj
+    if hasattr(p, 'contents'):
+        return p.contents
+    return p
+
+
+def _put(p, value):
+    _target(p).value = value
+
+
+def _string(p):
+    """Return the value of a char * argument."""
+    return p if isinstance(p, basestring) or p is None else p.value
+
+
+def _invalid(n):
+    """Return the status code for an invalid nth parameter."""
+    return getattr(sdk, 'DRV_P%dINVALID' % n)
+
+
+## On Windows, long is 32 bits and ctypes treats c_long as c_int.
+_WIN32_TYPES = {c_long: c_int, c_ulong: c_uint}
+
+def _from_param(i, argtype, arg):
+    """Check and convert argument i as ctypes would for argtype.
+
+    Scalars are passed to simulated functions as Python values;
+    pointers, strings and arrays are passed as given."""
+    try:
+        argtype.from_param(arg)
+    except TypeError as e:
+        # Accept types that are the same on Windows.
+        expected = getattr(argtype, '_type_', None)
+        if not isinstance(expected, type):
+            expected = argtype
+        if (_WIN32_TYPES.get(type(_target(arg)), type(_target(arg))) is not
+                _WIN32_TYPES.get(expected, expected)):
+            raise ArgumentError('argument %d: %s: %s' % (i + 1, type(e), e))
+    if not issubclass(argtype, _SimpleCData) or argtype._type_ in 'zZP':
+        return arg
+    if isinstance(arg, _SimpleCData):
+        return arg.value
+    return argtype(arg).value
+
+
+class SimFunction(object):
+    """Stands in for a function exported by the DLL."""
+    __slots__ = ('__name__', 'library', 'restype', 'argtypes', 'errcheck')
+
+    def __init__(self, library, name):
+        self.__name__ = name
+        self.library = library
+        self.restype = c_int
+        self.argtypes = None
+        self.errcheck = None
+
+
+    def __call__(self, *args):
+        values = args
+        if self.argtypes is not None:
+            if len(args) != len(self.argtypes):
+                raise TypeError('this function takes %d arguments (%d given)'
+                                % (len(self.argtypes), len(args)))
+            values = [_from_param(i, argtype, arg) for i, (argtype, arg)
+                      in enumerate(zip(self.argtypes, args))]
+        result = self.library.call(self.__name__, values)
+        result = None if self.restype is None else self.restype(result).value
+        if self.errcheck is not None:
+            result = self.errcheck(result, self, args)
+        return result
+
+
+class SimDLL(object):
+    """Stands in for Andor's DLL, exporting simulated functions."""
+    def __init__(self):
+        global sdk, library
+        import andorsdk as sdk
+        library = self._library = SimLibrary()
+        self._names = set(fndef.split('(')[0].strip()
+                          for fndef in sdk.function_list)
+
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._names:
+            raise AttributeError('function %r not found' % name)
+        func = SimFunction(self._library, name)
+        setattr(self, name, func)
+        return func
+
+
+    def __getitem__(self, name):
+        """Return a new function object, as indexing a ctypes DLL does."""
+        if name not in self._names:
+            raise AttributeError('function %r not found' % name)
+        return SimFunction(self._library, name)
+
+
+class SimLibrary(object):
+    """The state of the simulated SDK: its cameras, and which is current."""
+    def __init__(self):
+        n_cameras = int(os.environ.get('ANDOR_SIM_CAMERAS', 1))
+        nx, ny = [int(v) for v in os.environ.get(
+            'ANDOR_SIM_DETECTOR', '512x512').lower().split('x')]
+        buffer_bytes = int(
+            float(os.environ.get('ANDOR_SIM_BUFFER_MB', 128)) * 2**20)
+        self.cameras = [SimCamera(i, nx, ny, buffer_bytes)
+                        for i in range(n_cameras)]
+        self.handles = dict((cam.handle, cam) for cam in self.cameras)
+        self.current = self.cameras[0]
+
+
+    def call(self, name, args):
+        if name in LIBRARY_FUNCTIONS:
+            return getattr(self, name)(*args)
+        return self.current.call(name, args)
+
+
+    def GetAvailableCameras(self, n):
+        _put(n, len(self.cameras))
+        return sdk.DRV_SUCCESS
+
+
+    def GetCameraHandle(self, index, handle):
+        if not 0 <= index < len(self.cameras):
+            return _invalid(1)
+        _put(handle, self.cameras[index].handle)
+        return sdk.DRV_SUCCESS
+
+
+    def GetCurrentCamera(self, handle):
+        _put(handle, self.current.handle)
+        return sdk.DRV_SUCCESS
+
+
+    def SetCurrentCamera(self, handle):
+        if handle not in self.handles:
+            return _invalid(1)
+        self.current = self.handles[handle]
+        return sdk.DRV_SUCCESS
+
+
+    def WaitForAcquisitionByHandle(self, handle):
+        return self.WaitForAcquisitionByHandleTimeOut(handle, None)
+
+
+    def WaitForAcquisitionByHandleTimeOut(self, handle, timeout_ms):
+        if handle not in self.handles:
+            return _invalid(1)
+        cam = self.handles[handle]
+        if not cam.initialized:
+            return sdk.DRV_NOT_INITIALIZED
+        return cam.wait(timeout_ms)
+
+
+def get_camera(handle=None):
+    """Return the SimCamera with handle, or the current camera."""
+    if handle is None:
+        return library.current
+    return library.handles[handle]
+
+
+class SimCamera(object):
+    """A simulated camera.
+
+    Methods with the SDK's function names implement those functions
+    for this camera. An acquisition clock thread adds images to the
+    circular buffer as they are due, waking threads waiting for them.
+    """
+    def __init__(self, index, nx, ny, buffer_bytes):
+        self.handle = FIRST_HANDLE + index
+        self.serial = FIRST_SERIAL + index
+        self.nx, self.ny = nx, ny
+        self.buffer_bytes = buffer_bytes
+        self.initialized = False
+        # Guards acquisition state, and wakes threads waiting for images.
+        self.condition = threading.Condition()
+        # Wakes the acquisition clock.
+        self.wake = Event()
+        self.reset()
+
+
+    def reset(self):
+        """Restore the state the camera has after Initialize."""
+        # Arguments to Set... functions that are not simulated.
+        self.params = {}
+        self.acquisition_mode = 1
+        self.read_mode = 4
+        self.trigger_mode = 0
+        self.exposure = 0.
+        self.accumulation_cycle_time = 0.
+        self.kinetic_cycle_time = 0.
+        self.n_accumulations = 1
+        self.n_kinetics = 1
+        # exposedRows, seriesLength, time, mode, hbin, vbin, offset
+        self.fast_kinetics = None
+        self.fk_vs_index = 0
+        # hbin, vbin, hstart, hend, vstart, vend
+        self.image = (1, 1, 1, self.nx, 1, self.ny)
+        # (height, width) of an isolated crop, or None.
+        self.crop = None
+        self.frame_transfer = 0
+        self.em_gain = 0
+        self.em_advanced = 0
+        self.amplifier = 0
+        # Horizontal shift speed index for each amplifier.
+        self.hs_index = dict((amp, 0) for amp in HS_SPEEDS)
+        self.vs_index = FASTEST_VS_INDEX
+        self.preamp_index = 0
+        self.fan_mode = 0
+        self.metadata = False
+        self.driver_event = None
+        # (method, stem) while spooling is enabled.
+        self.spool = None
+        self.cooler = False
+        self.target = DEFAULT_TARGET_TEMPERATURE
+        # Temperature at the last change of set-point, and its time.
+        self.temperature_from = (AMBIENT_TEMPERATURE, time.time())
+
+        # Acquisition state.
+        self.acquiring = False
+        # Incremented for each acquisition, to stop old clock threads.
+        self.generation = 0
+        # Images acquired, last image retrieved, and images waited for.
+        self.acquired = 0
+        self.retrieved = 0
+        self.waited = 0
+        self.n_frames = None
+        self.buffer_size = 1
+        self.frame_times = numpy.zeros(1)
+        self.start_time = None
+        self.pattern = None
+        # Due times of triggered images.
+        self.triggers = deque()
+        self.last_due = 0
+        # Deadlines of threads waiting for images, and a cancel flag.
+        self.deadlines = []
+        self.n_waiting = 0
+        self.cancelled = False
+        self.spool_file = None
+        self.spool_buffer = None
+
+
+    def call(self, name, args):
+        if not self.initialized and name != 'Initialize':
+            return sdk.DRV_NOT_INITIALIZED
+        if (self.acquiring and name.startswith('Set') and
+                name not in LIVE_FUNCTIONS):
+            return sdk.DRV_ACQUIRING
+        func = getattr(self, name, None)
+        if func is None:
+            if name.startswith('Set'):
+                self.params[name] = tuple(args)
+                return sdk.DRV_SUCCESS
+            return sdk.DRV_NOT_SUPPORTED
+        return func(*args)
+
+
+    ### Models of temperature, geometry and timing. ###
+    def get_temperature(self):
+        t0, since = self.temperature_from
+        goal = self.target if self.cooler else AMBIENT_TEMPERATURE
+        step = COOLING_RATE * (time.time() - since)
+        if abs(goal - t0) <= step:
+            return float(goal)
+        return t0 + step if goal > t0 else t0 - step
+
+
+    def get_temperature_status(self):
+        if not self.cooler:
+            return sdk.DRV_TEMP_OFF
+        t0, since = self.temperature_from
+        reached = since + abs(self.target - t0) / COOLING_RATE
+        now = time.time()
+        if now < reached:
+            return sdk.DRV_TEMP_NOT_REACHED
+        elif now < reached + SETTLE_TIME:
+            return sdk.DRV_TEMP_NOT_STABILIZED
+        return sdk.DRV_TEMP_STABILIZED
+
+
+    def change_temperature(self, cooler, target):
+        self.temperature_from = (self.get_temperature(), time.time())
+        self.cooler, self.target = cooler, target
+
+
+    def get_image_shape(self):
+        if self.acquisition_mode == 4 and self.fast_kinetics:
+            # Sub-frames, one above another.
+            rows, length, t, mode, hbin, vbin, offset = self.fast_kinetics
+            return ((rows // vbin if mode == 4 else 1) * length,
+                    self.nx // hbin)
+        hbin, vbin, hstart, hend, vstart, vend = self.image
+        return ((vend - vstart + 1) // vbin, (hend - hstart + 1) // hbin)
+
+
+    def get_image_pixels(self):
+        ny, nx = self.get_image_shape()
+        return nx * ny
+
+
+    def get_buffer_size(self):
+        """Return the number of images the circular buffer holds."""
+        return max(1, self.buffer_bytes // (2 * self.get_image_pixels()))
+
+
+    def get_readout_time(self):
+        """Return the time to shift and digitize an image.
+
+        Every row of the sensor, or of an isolated crop, is shifted;
+        rows within the image are digitized."""
+        hbin, vbin, hstart, hend, vstart, vend = self.image
+        rows, columns = self.crop or (self.ny, self.nx)
+        pixels = ((vend - vstart + 1) // vbin) * (columns // hbin)
+        if self.acquisition_mode == 4 and self.fast_kinetics:
+            rows, pixels = self.ny, self.get_image_pixels()
+        return (rows * VS_SPEEDS[self.vs_index] * 1e-6 +
+                pixels / (HS_SPEEDS[self.amplifier][self.hs_index[
+                    self.amplifier]] * 1e6))
+
+
+    def get_timings(self):
+        """Return the exposure, accumulation and kinetic cycle times."""
+        readout = self.get_readout_time()
+        if self.acquisition_mode == 4 and self.fast_kinetics:
+            # Each sub-frame is exposed, then shifted under the mask.
+            rows, length, t, mode, hbin, vbin, offset = self.fast_kinetics
+            shift = rows * FK_VS_SPEEDS[self.fk_vs_index] * 1e-6
+            cycle = length * (t + shift) + readout
+            return (t, cycle, cycle)
+        if self.frame_transfer:
+            # Exposure continues while the previous image is read out.
+            exposure = max(self.exposure, readout)
+            cycle = exposure
+        else:
+            exposure = self.exposure
+            cycle = exposure + readout + KEEP_CLEAN_TIME
+        accumulate = max(self.accumulation_cycle_time, cycle)
+        kinetic = max(self.kinetic_cycle_time,
+                      accumulate * self.n_accumulations)
+        return (exposure, accumulate, kinetic)
+
+
+    ### Acquisition. ###
+    def start(self):
+        """Start an acquisition (with condition held)."""
+        npix = self.get_image_pixels()
+        self.buffer_size = self.get_buffer_size()
+        self.frame_times = numpy.zeros(self.buffer_size)
+        self.pattern = (numpy.arange(npix) % 4096 + BIAS).astype(numpy.uint16)
+        if self.params.get('SetShutter', (0, 0))[1] == 2:
+            # The shutter is closed: only the bias is read out.
+            self.pattern[:] = BIAS
+        self.acquired = self.retrieved = self.waited = 0
+        self.triggers.clear()
+        self.exposure_time, accumulate, self.cycle_time = self.get_timings()
+        self.n_frames = {1: 1, 2: 1, 3: self.n_kinetics, 4: 1, 5: None}[
+            self.acquisition_mode]
+        if self.acquisition_mode == 2:
+            self.cycle_time = accumulate * self.n_accumulations
+        if self.spool:
+            method, stem = self.spool
+            dtype = SPOOL_DTYPES[method]
+            if method == 1 and self.acquisition_mode == 2:
+                dtype = numpy.int32
+            self.spool_buffer = numpy.empty(npix, dtype=dtype)
+            self.spool_file = open(stem + 'spool.dat', 'wb')
+        self.start_time = self.last_due = time.time()
+        self.acquiring = True
+        self.generation += 1
+        threading.Thread(target=self.run_clock,
+                         args=(self.generation,)).start()
+
+
+    def stop(self):
+        """Stop an acquisition (with condition held)."""
+        self.acquiring = False
+        self.generation += 1
+        if self.spool_file:
+            self.spool_file.close()
+            self.spool_file = None
+        self.condition.notify_all()
+        self.wake.set()
+
+
+    def next_due(self):
+        """Return the time the next image is due, or None."""
+        if self.trigger_mode in TRIGGERED_MODES:
+            return self.triggers[0] if self.triggers else None
+        if self.n_frames is not None and self.acquired >= self.n_frames:
+            return None
+        return self.start_time + (self.acquired + 1) * self.cycle_time
+
+
+    def add_image(self, due):
+        """Add an image to the circular buffer (with condition held)."""
+        if self.trigger_mode in TRIGGERED_MODES:
+            self.triggers.popleft()
+        self.acquired += 1
+        self.frame_times[self.acquired % self.buffer_size] = due
+        if self.spool_file:
+            self.fill(self.spool_buffer, self.acquired)
+            self.spool_buffer.tofile(self.spool_file)
+        if self.n_frames is not None and self.acquired >= self.n_frames:
+            self.stop()
+        self.condition.notify_all()
+        if self.driver_event:
+            sdk.set_event(self.driver_event)
+
+
+    def run_clock(self, generation):
+        """Add images to the buffer as they fall due."""
+        while True:
+            with self.condition:
+                if self.generation != generation:
+                    return
+                now = time.time()
+                due = self.next_due()
+                while due is not None and due <= now:
+                    self.add_image(due)
+                    if self.generation != generation:
+                        return
+                    due = self.next_due()
+                if any(t <= now for t in self.deadlines):
+                    self.condition.notify_all()
+                wake_at = [t for t in self.deadlines if t > now]
+                if due is not None:
+                    wake_at.append(due)
+                timeout = min(wake_at) - now if wake_at else MAX_IDLE
+            self.wake.wait(timeout)
+
+
+    def trigger(self):
+        """Trigger an image, as an external or software trigger would."""
+        with self.condition:
+            if not self.acquiring or self.trigger_mode not in TRIGGERED_MODES:
+                return False
+            due = (max(time.time(), self.last_due) + self.exposure_time +
+                   self.get_readout_time())
+            self.triggers.append(due)
+            self.last_due = due
+        self.wake.set()
+        return True
+
+
+    def wait(self, timeout_ms=None):
+        """Wait for an image acquired since the last wait returned.
+
+        Waits without a timeout, which wake at once: timed waits poll in
+        Python 2. The clock thread wakes waiters whose deadlines pass."""
+        deadline = None
+        if timeout_ms is not None:
+            deadline = time.time() + timeout_ms / 1000.
+        with self.condition:
+            self.n_waiting += 1
+            try:
+                while True:
+                    if self.cancelled:
+                        self.cancelled = False
+                        return sdk.DRV_NO_NEW_DATA
+                    if self.acquired > self.waited:
+                        self.waited = self.acquired
+                        return sdk.DRV_SUCCESS
+                    if not self.acquiring:
+                        return sdk.DRV_IDLE
+                    if deadline is None:
+                        self.condition.wait()
+                        continue
+                    if time.time() >= deadline:
+                        return sdk.DRV_NO_NEW_DATA
+                    self.deadlines.append(deadline)
+                    self.wake.set()
+                    self.condition.wait()
+                    self.deadlines.remove(deadline)
+            finally:
+                self.n_waiting -= 1
+
+
+    def get_available(self):
+        """Return indices of the first and last images in the buffer."""
+        return (max(1, self.acquired - self.buffer_size + 1), self.acquired)
+
+
+    def get_new(self):
+        """Return indices of the first and last unretrieved images."""
+        first, last = self.get_available()
+        return (max(first, self.retrieved + 1), last)
+
+
+    def fill(self, out, index):
+        """Fill a flat array with image index."""
+        out[:] = self.pattern
+        stamp = (index & 0xffff, (index >> 16) & 0xffff)
+        n = min(2, out.size)
+        out[:n] = stamp[:n]
+
+
+    def copy_images(self, first, last, arr, size):
+        """Copy images first to last into arr, if size is right."""
+        npix = self.pattern.size
+        n = last - first + 1
+        if size != n * npix or arr.size < size:
+            return False
+        flat = arr.reshape(-1)
+        for i in range(n):
+            self.fill(flat[i * npix:(i + 1) * npix], first + i)
+        return True
+
+
+    ### SDK functions. ###
+    def AbortAcquisition(self):
+        with self.condition:
+            if not self.acquiring:
+                return sdk.DRV_IDLE
+            self.stop()
+        return sdk.DRV_SUCCESS
+
+
+    def CancelWait(self):
+        with self.condition:
+            if self.n_waiting:
+                self.cancelled = True
+                self.condition.notify_all()
+        return sdk.DRV_SUCCESS
+
+
+    def CoolerOFF(self):
+        self.change_temperature(False, self.target)
+        return sdk.DRV_SUCCESS
+
+
+    def CoolerON(self):
+        self.change_temperature(True, self.target)
+        return sdk.DRV_SUCCESS
+
+
+    def FreeInternalMemory(self):
+        with self.condition:
+            if self.acquiring:
+                return sdk.DRV_ACQUIRING
+            self.retrieved = self.acquired
+        return sdk.DRV_SUCCESS
+
+
+    def GetAcquiredData(self, arr, size):
+        return self.GetAcquiredData16(arr, size)
+
+
+    def GetAcquiredData16(self, arr, size):
+        """Copy the last size / image pixels images into arr."""
+        with self.condition:
+            if self.acquiring:
+                return sdk.DRV_ACQUIRING
+            if not self.acquired:
+                return sdk.DRV_NO_NEW_DATA
+            first, last = self.get_available()
+            n = size // self.pattern.size
+            if not 0 < n <= last - first + 1:
+                return _invalid(2)
+        if not self.copy_images(last - n + 1, last, arr, size):
+            return _invalid(2)
+        return sdk.DRV_SUCCESS
+
+
+    def GetAcquisitionProgress(self, acc, series):
+        _put(acc, self.acquired * self.n_accumulations)
+        _put(series, self.acquired)
+        return sdk.DRV_SUCCESS
+
+
+    def GetAcquisitionTimings(self, exposure, accumulate, kinetic):
+        for p, t in zip((exposure, accumulate, kinetic), self.get_timings()):
+            _put(p, t)
+        return sdk.DRV_SUCCESS
+
+
+    def GetAmpDesc(self, index, name, length):
+        if not 0 <= index < len(AMPLIFIER_NAMES):
+            return _invalid(1)
+        _put(name, AMPLIFIER_NAMES[index][:max(0, length - 1)])
+        return sdk.DRV_SUCCESS
+
+
+    def GetAmpMaxSpeed(self, index, speed):
+        if index not in HS_SPEEDS:
+            return _invalid(1)
+        _put(speed, max(HS_SPEEDS[index]))
+        return sdk.DRV_SUCCESS
+
+
+    def GetBitDepth(self, channel, depth):
+        if channel != 0:
+            return _invalid(1)
+        _put(depth, 16)
+        return sdk.DRV_SUCCESS
+
+
+    def GetCameraSerialNumber(self, number):
+        _put(number, self.serial)
+        return sdk.DRV_SUCCESS
+
+
+    def GetCapabilities(self, caps):
+        caps = _target(caps)
+        caps.ulAcqModes = (sdk.AC_ACQMODE_SINGLE | sdk.AC_ACQMODE_VIDEO |
+                           sdk.AC_ACQMODE_ACCUMULATE | sdk.AC_ACQMODE_KINETIC |
+                           sdk.AC_ACQMODE_FRAMETRANSFER)
+        caps.ulReadModes = sdk.AC_READMODE_FULLIMAGE | sdk.AC_READMODE_SUBIMAGE
+        caps.ulFTReadModes = caps.ulReadModes
+        caps.ulTriggerModes = (sdk.AC_TRIGGERMODE_INTERNAL |
+                               sdk.AC_TRIGGERMODE_EXTERNAL |
+                               sdk.AC_TRIGGERMODE_EXTERNALSTART |
+                               sdk.AC_TRIGGERMODE_EXTERNALEXPOSURE |
+                               sdk.AC_TRIGGERMODE_CONTINUOUS)
+        caps.ulCameraType = sdk.AC_CAMERATYPE_IXONULTRA
+        caps.ulPixelMode = sdk.AC_PIXELMODE_16BIT | sdk.AC_PIXELMODE_MONO
+        caps.ulSetFunctions = (sdk.AC_SETFUNCTION_VREADOUT |
+                               sdk.AC_SETFUNCTION_HREADOUT |
+                               sdk.AC_SETFUNCTION_TEMPERATURE |
+                               sdk.AC_SETFUNCTION_EMCCDGAIN |
+                               sdk.AC_SETFUNCTION_PREAMPGAIN |
+                               sdk.AC_SETFUNCTION_CROPMODE |
+                               sdk.AC_SETFUNCTION_HORIZONTALBIN |
+                               sdk.AC_SETFUNCTION_EMADVANCED |
+                               sdk.AC_SETFUNCTION_SPOOLTHREADCOUNT)
+        caps.ulGetFunctions = (sdk.AC_GETFUNCTION_TEMPERATURE |
+                               sdk.AC_GETFUNCTION_TEMPERATURERANGE |
+                               sdk.AC_GETFUNCTION_DETECTORSIZE |
+                               sdk.AC_GETFUNCTION_EMCCDGAIN)
+        caps.ulFeatures = (sdk.AC_FEATURES_POLLING | sdk.AC_FEATURES_EVENTS |
+                           sdk.AC_FEATURES_SPOOLING | sdk.AC_FEATURES_SHUTTER |
+                           sdk.AC_FEATURES_FANCONTROL |
+                           sdk.AC_FEATURES_MIDFANCONTROL |
+                           sdk.AC_FEATURES_TEMPERATUREDURINGACQUISITION |
+                           sdk.AC_FEATURES_KEEPCLEANCONTROL |
+                           sdk.AC_FEATURES_METADATA)
+        caps.ulEMGainCapability = (sdk.AC_EMGAIN_8BIT | sdk.AC_EMGAIN_12BIT |
+                                   sdk.AC_EMGAIN_LINEAR12 |
+                                   sdk.AC_EMGAIN_REAL12)
+        return sdk.DRV_SUCCESS
+
+
+    def GetDetector(self, xpixels, ypixels):
+        _put(xpixels, self.nx)
+        _put(ypixels, self.ny)
+        return sdk.DRV_SUCCESS
+
+
+    def GetEMAdvanced(self, state):
+        _put(state, self.em_advanced)
+        return sdk.DRV_SUCCESS
+
+
+    def GetEMCCDGain(self, gain):
+        _put(gain, self.em_gain)
+        return sdk.DRV_SUCCESS
+
+
+    def GetEMGainRange(self, low, high):
+        _put(low, EM_GAIN_RANGE[0])
+        _put(high, EM_GAIN_RANGE[1])
+        return sdk.DRV_SUCCESS
+
+
+    def GetFastestRecommendedVSSpeed(self, index, speed):
+        _put(index, FASTEST_VS_INDEX)
+        _put(speed, VS_SPEEDS[FASTEST_VS_INDEX])
+        return sdk.DRV_SUCCESS
+
+
+    def GetFKExposureTime(self, t):
+        _put(t, self.fast_kinetics[2] if self.fast_kinetics else self.exposure)
+        return sdk.DRV_SUCCESS
+
+
+    def GetFKVShiftSpeedF(self, index, speed):
+        if not 0 <= index < len(FK_VS_SPEEDS):
+            return _invalid(1)
+        _put(speed, FK_VS_SPEEDS[index])
+        return sdk.DRV_SUCCESS
+
+
+    def GetHardwareVersion(self, pcb, decode, dummy1, dummy2, version, build):
+        for p, value in zip((pcb, decode, dummy1, dummy2, version, build),
+                            (1, 1, 0, 0, 1, 1)):
+            _put(p, value)
+        return sdk.DRV_SUCCESS
+
+
+    def GetHeadModel(self, name):
+        _put(name, 'DU897_BV')
+        return sdk.DRV_SUCCESS
+
+
+    def GetHSSpeed(self, channel, typ, index, speed):
+        if channel != 0:
+            return _invalid(1)
+        if typ not in HS_SPEEDS:
+            return _invalid(2)
+        if not 0 <= index < len(HS_SPEEDS[typ]):
+            return _invalid(3)
+        _put(speed, HS_SPEEDS[typ][index])
+        return sdk.DRV_SUCCESS
+
+
+    def GetImages(self, first, last, arr, size, validfirst, validlast):
+        return self.GetImages16(first, last, arr, size, validfirst, validlast)
+
+
+    def GetImages16(self, first, last, arr, size, validfirst, validlast):
+        with self.condition:
+            if not self.acquired:
+                return sdk.DRV_NO_NEW_DATA
+            oldest, newest = self.get_available()
+            if not oldest <= first <= newest:
+                return _invalid(1)
+            if not first <= last <= newest:
+                return _invalid(2)
+            self.retrieved = max(self.retrieved, last)
+        if not self.copy_images(first, last, arr, size):
+            return _invalid(4)
+        _put(validfirst, first)
+        _put(validlast, last)
+        return sdk.DRV_SUCCESS
+
+
+    def GetImagesPerDMA(self, images):
+        _put(images, 1)
+        return sdk.DRV_SUCCESS
+
+
+    def GetKeepCleanTime(self, t):
+        _put(t, KEEP_CLEAN_TIME)
+        return sdk.DRV_SUCCESS
+
+
+    def GetMaximumBinning(self, read_mode, horizontal_vertical, max_binning):
+        if read_mode != 4:
+            return _invalid(1)
+        if horizontal_vertical not in (0, 1):
+            return _invalid(2)
+        _put(max_binning, self.ny if horizontal_vertical else self.nx)
+        return sdk.DRV_SUCCESS
+
+
+    def GetMaximumExposure(self, t):
+        _put(t, MAXIMUM_EXPOSURE)
+        return sdk.DRV_SUCCESS
+
+
+    def GetMetaDataInfo(self, time_of_start, time_from_start, index):
+        if not self.metadata:
+            return sdk.DRV_NOT_AVAILABLE
+        with self.condition:
+            first, last = self.get_available()
+            if not first <= index <= last:
+                return _invalid(3)
+            t = self.frame_times[index % self.buffer_size]
+        start = _target(time_of_start)
+        tm = time.localtime(self.start_time)
+        start.wYear, start.wMonth, start.wDay = tm.tm_year, tm.tm_mon, tm.tm_mday
+        start.wDayOfWeek = (tm.tm_wday + 1) % 7
+        start.wHour, start.wMinute, start.wSecond = (tm.tm_hour, tm.tm_min,
+                                                     tm.tm_sec)
+        start.wMilliseconds = int(self.start_time % 1 * 1000)
+        _put(time_from_start, (t - self.start_time) * 1000.)
+        return sdk.DRV_SUCCESS
+
+
+    def GetMostRecentImage(self, arr, size):
+        return self.GetMostRecentImage16(arr, size)
+
+
+    def GetMostRecentImage16(self, arr, size):
+        with self.condition:
+            if not self.acquired:
+                return sdk.DRV_NO_NEW_DATA
+            last = self.acquired
+        if not self.copy_images(last, last, arr, size):
+            return _invalid(2)
+        return sdk.DRV_SUCCESS
+
+
+    def GetNumberADChannels(self, channels):
+        _put(channels, 1)
+        return sdk.DRV_SUCCESS
+
+
+    def GetNumberAmp(self, amp):
+        _put(amp, len(HS_SPEEDS))
+        return sdk.DRV_SUCCESS
+
+
+    def GetNumberAvailableImages(self, first, last):
+        with self.condition:
+            oldest, newest = self.get_available()
+        _put(first, oldest)
+        _put(last, newest)
+        return sdk.DRV_SUCCESS if newest else sdk.DRV_NO_NEW_DATA
+
+
+    def GetNumberFKVShiftSpeeds(self, number):
+        _put(number, len(FK_VS_SPEEDS))
+        return sdk.DRV_SUCCESS
+
+
+    def GetNumberHSSpeeds(self, channel, typ, speeds):
+        if channel != 0:
+            return _invalid(1)
+        if typ not in HS_SPEEDS:
+            return _invalid(2)
+        _put(speeds, len(HS_SPEEDS[typ]))
+        return sdk.DRV_SUCCESS
+
+
+    def GetNumberNewImages(self, first, last):
+        with self.condition:
+            oldest, newest = self.get_new()
+        _put(first, oldest)
+        _put(last, newest)
+        return sdk.DRV_SUCCESS if oldest <= newest else sdk.DRV_NO_NEW_DATA
+
+
+    def GetNumberPreAmpGains(self, n):
+        _put(n, len(PREAMP_GAINS))
+        return sdk.DRV_SUCCESS
+
+
+    def GetNumberVSSpeeds(self, speeds):
+        _put(speeds, len(VS_SPEEDS))
+        return sdk.DRV_SUCCESS
+
+
+    def GetOldestImage(self, arr, size):
+        return self.GetOldestImage16(arr, size)
+
+
+    def GetOldestImage16(self, arr, size):
+        with self.condition:
+            first, last = self.get_new()
+            if first > last:
+                return sdk.DRV_NO_NEW_DATA
+            if size != self.pattern.size or arr.size < size:
+                return _invalid(2)
+            self.retrieved = first
+        self.copy_images(first, first, arr, size)
+        return sdk.DRV_SUCCESS
+
+
+    def GetPixelSize(self, x_size, y_size):
+        _put(x_size, PIXEL_SIZE)
+        _put(y_size, PIXEL_SIZE)
+        return sdk.DRV_SUCCESS
+
+
+    def GetPreAmpGain(self, index, gain):
+        if not 0 <= index < len(PREAMP_GAINS):
+            return _invalid(1)
+        _put(gain, PREAMP_GAINS[index])
+        return sdk.DRV_SUCCESS
+
+
+    def GetReadOutTime(self, t):
+        _put(t, self.get_readout_time())
+        return sdk.DRV_SUCCESS
+
+
+    def GetSizeOfCircularBuffer(self, index):
+        _put(index, self.get_buffer_size())
+        return sdk.DRV_SUCCESS
+
+
+    def GetStatus(self, status):
+        _put(status, sdk.DRV_ACQUIRING if self.acquiring else sdk.DRV_IDLE)
+        return sdk.DRV_SUCCESS
+
+
+    def GetTemperature(self, temperature):
+        _put(temperature, int(round(self.get_temperature())))
+        return self.get_temperature_status()
+
+
+    def GetTemperatureF(self, temperature):
+        _put(temperature, self.get_temperature())
+        return self.get_temperature_status()
+
+
+    def GetTemperatureRange(self, mintemp, maxtemp):
+        _put(mintemp, TEMPERATURE_RANGE[0])
+        _put(maxtemp, TEMPERATURE_RANGE[1])
+        return sdk.DRV_SUCCESS
+
+
+    def GetTotalNumberImagesAcquired(self, index):
+        _put(index, self.acquired)
+        return sdk.DRV_SUCCESS
+
+
+    def GetVSSpeed(self, index, speed):
+        if not 0 <= index < len(VS_SPEEDS):
+            return _invalid(1)
+        _put(speed, VS_SPEEDS[index])
+        return sdk.DRV_SUCCESS
+
+
+    def Initialize(self, directory):
+        if not self.initialized:
+            self.reset()
+            self.initialized = True
+        return sdk.DRV_SUCCESS
+
+
+    def IsAmplifierAvailable(self, amplifier):
+        return sdk.DRV_SUCCESS if amplifier in HS_SPEEDS else _invalid(1)
+
+
+    def IsCoolerOn(self, status):
+        _put(status, int(self.cooler))
+        return sdk.DRV_SUCCESS
+
+
+    def IsPreAmpGainAvailable(self, channel, amplifier, index, pa, status):
+        if channel != 0:
+            return _invalid(1)
+        if amplifier not in HS_SPEEDS:
+            return _invalid(2)
+        if not 0 <= index < len(HS_SPEEDS[amplifier]):
+            return _invalid(3)
+        if not 0 <= pa < len(PREAMP_GAINS):
+            return _invalid(4)
+        _put(status, 1)
+        return sdk.DRV_SUCCESS
+
+
+    def IsTriggerModeAvailable(self, mode):
+        return sdk.DRV_SUCCESS if mode in TRIGGER_MODES else sdk.DRV_INVALID_MODE
+
+
+    def PrepareAcquisition(self):
+        return sdk.DRV_SUCCESS
+
+
+    def SendSoftwareTrigger(self):
+        if self.trigger_mode != 10:
+            return sdk.DRV_INVALID_MODE
+        if not self.trigger():
+            return sdk.DRV_IDLE
+        return sdk.DRV_SUCCESS
+
+
+    def SetAccumulationCycleTime(self, t):
+        if t < 0:
+            return _invalid(1)
+        self.accumulation_cycle_time = t
+        return sdk.DRV_SUCCESS
+
+
+    def SetAcquisitionMode(self, mode):
+        if mode not in ACQUISITION_MODES:
+            return _invalid(1)
+        self.acquisition_mode = mode
+        return sdk.DRV_SUCCESS
+
+
+    def SetADChannel(self, channel):
+        if channel != 0:
+            return _invalid(1)
+        return sdk.DRV_SUCCESS
+
+
+    def SetDriverEvent(self, event):
+        self.driver_event = event
+        return sdk.DRV_SUCCESS
+
+
+    def SetEMAdvanced(self, state):
+        if state not in (0, 1):
+            return _invalid(1)
+        self.em_advanced = state
+        return sdk.DRV_SUCCESS
+
+
+    def SetEMCCDGain(self, gain):
+        if not EM_GAIN_RANGE[0] <= gain <= EM_GAIN_RANGE[1]:
+            return _invalid(1)
+        self.em_gain = gain
+        return sdk.DRV_SUCCESS
+
+
+    def SetExposureTime(self, t):
+        if not 0 <= t <= MAXIMUM_EXPOSURE:
+            return _invalid(1)
+        self.exposure = t
+        return sdk.DRV_SUCCESS
+
+
+    def SetFanMode(self, mode):
+        if mode not in (0, 1, 2):
+            return _invalid(1)
+        self.fan_mode = mode
+        return sdk.DRV_SUCCESS
+
+
+    def SetFastKinetics(self, rows, length, t, mode, hbin, vbin):
+        return self.SetFastKineticsEx(rows, length, t, mode, hbin, vbin,
+                                      self.ny - rows)
+
+
+    def SetFastKineticsEx(self, rows, length, t, mode, hbin, vbin, offset):
+        if not 1 <= rows <= self.ny:
+            return _invalid(1)
+        # Sub-frames are stored in the rows below the exposed area.
+        if not 1 <= length or rows * length > self.ny:
+            return _invalid(2)
+        if not 0 <= t <= MAXIMUM_EXPOSURE:
+            return _invalid(3)
+        if mode not in (0, 4):
+            return _invalid(4)
+        if not 1 <= hbin <= self.nx:
+            return _invalid(5)
+        if not 1 <= vbin <= rows:
+            return _invalid(6)
+        if not 0 <= offset <= self.ny - rows:
+            return _invalid(7)
+        self.fast_kinetics = (rows, length, t, mode, hbin, vbin, offset)
+        return sdk.DRV_SUCCESS
+
+
+    def SetFKVShiftSpeed(self, index):
+        if not 0 <= index < len(FK_VS_SPEEDS):
+            return _invalid(1)
+        self.fk_vs_index = index
+        return sdk.DRV_SUCCESS
+
+
+    def SetFrameTransferMode(self, mode):
+        if mode not in (0, 1):
+            return _invalid(1)
+        self.frame_transfer = mode
+        return sdk.DRV_SUCCESS
+
+
+    def SetHSSpeed(self, typ, index):
+        if typ not in HS_SPEEDS:
+            return _invalid(1)
+        if not 0 <= index < len(HS_SPEEDS[typ]):
+            return _invalid(2)
+        self.hs_index[typ] = index
+        return sdk.DRV_SUCCESS
+
+
+    def SetImage(self, hbin, vbin, hstart, hend, vstart, vend):
+        if not 1 <= hbin <= self.nx:
+            return _invalid(1)
+        if not 1 <= vbin <= self.ny:
+            return _invalid(2)
+        nx, ny = (self.crop[1], self.crop[0]) if self.crop else (self.nx,
+                                                                 self.ny)
+        if not 1 <= hstart <= nx:
+            return _invalid(3)
+        if not hstart + hbin - 1 <= hend <= nx:
+            return _invalid(4)
+        if not 1 <= vstart <= ny:
+            return _invalid(5)
+        if not vstart + vbin - 1 <= vend <= ny:
+            return _invalid(6)
+        self.image = (hbin, vbin, hstart, hend, vstart, vend)
+        return sdk.DRV_SUCCESS
+
+
+    def SetIsolatedCropMode(self, active, height, width, vbin, hbin):
+        if active not in (0, 1):
+            return _invalid(1)
+        if not 1 <= height <= self.ny:
+            return _invalid(2)
+        if not 1 <= width <= self.nx:
+            return _invalid(3)
+        if not 1 <= vbin <= height:
+            return _invalid(4)
+        if not 1 <= hbin <= width:
+            return _invalid(5)
+        self.crop = (height, width) if active else None
+        return sdk.DRV_SUCCESS
+
+
+    def SetKineticCycleTime(self, t):
+        if t < 0:
+            return _invalid(1)
+        self.kinetic_cycle_time = t
+        return sdk.DRV_SUCCESS
+
+
+    def SetMetaData(self, state):
+        if state not in (0, 1):
+            return _invalid(1)
+        self.metadata = bool(state)
+        return sdk.DRV_SUCCESS
+
+
+    def SetNumberAccumulations(self, n):
+        if n < 1:
+            return _invalid(1)
+        self.n_accumulations = n
+        return sdk.DRV_SUCCESS
+
+
+    def SetNumberKinetics(self, n):
+        if n < 1:
+            return _invalid(1)
+        self.n_kinetics = n
+        return sdk.DRV_SUCCESS
+
+
+    def SetOutputAmplifier(self, typ):
+        if typ not in HS_SPEEDS:
+            return _invalid(1)
+        self.amplifier = typ
+        return sdk.DRV_SUCCESS
+
+
+    def SetPreAmpGain(self, index):
+        if not 0 <= index < len(PREAMP_GAINS):
+            return _invalid(1)
+        self.preamp_index = index
+        return sdk.DRV_SUCCESS
+
+
+    def SetReadMode(self, mode):
+        if mode == 4:
+            self.read_mode = mode
+            return sdk.DRV_SUCCESS
+        elif 0 <= mode <= 5:
+            # Only image readout is simulated.
+            return sdk.DRV_NOT_SUPPORTED
+        return _invalid(1)
+
+
+    def SetSpool(self, active, method, path, frame_buffer_size):
+        if active not in (0, 1):
+            return _invalid(1)
+        if not active:
+            self.spool = None
+        elif method not in SPOOL_DTYPES:
+            # Only raw spooling is simulated.
+            return sdk.DRV_NOT_SUPPORTED
+        else:
+            self.spool = (method, _string(path))
+        return sdk.DRV_SUCCESS
+
+
+    def SetTemperature(self, temperature):
+        if not TEMPERATURE_RANGE[0] <= temperature <= TEMPERATURE_RANGE[1]:
+            return _invalid(1)
+        self.change_temperature(self.cooler, temperature)
+        return sdk.DRV_SUCCESS
+
+
+    def SetTriggerMode(self, mode):
+        if mode not in TRIGGER_MODES:
+            return _invalid(1)
+        self.trigger_mode = mode
+        return sdk.DRV_SUCCESS
+
+
+    def SetVSSpeed(self, index):
+        if not 0 <= index < len(VS_SPEEDS):
+            return _invalid(1)
+        self.vs_index = index
+        return sdk.DRV_SUCCESS
+
+
+    def ShutDown(self):
+        with self.condition:
+            if self.acquiring:
+                self.stop()
+        self.change_temperature(False, self.target)
+        self.initialized = False
+        return sdk.DRV_SUCCESS
+
+
+    def StartAcquisition(self):
+        with self.condition:
+            if self.acquiring:
+                return sdk.DRV_ACQUIRING
+            self.start()
+        return sdk.DRV_SUCCESS
+
+
+    def WaitForAcquisition(self):
+        return self.wait()
+
+
+    def WaitForAcquisitionTimeOut(self, timeout_ms):
+        return self.wait(timeout_ms)
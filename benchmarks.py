@@ -0,0 +1,833 @@
+#
+#   Benchmarks for the andor camera server.
+#   Copyright (C) 2015 Mick Phillips
+#   mick.phillips@gmail.com
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""Benchmarks for the andor camera server.
+
+Call from the command line with the name of a benchmark, e.g.
+    python benchmarks.py drain --rate 2000 --duration 5
+The drain and latency benchmarks run a Camera on the simulated SDK in
+andorsim, and send images to a client in this process, either directly
+or over Pyro.
+"""
+
+import andor
+import andorsdk as sdk
+import andorsim
+import argparse
+import compileall
+import correction
+import ctypes
+import ctypes.util
+import functools
+import numpy
+import os
+import postprocess
+import Pyro4
+import subprocess
+import sys
+import threading
+import time
+from ctypes import POINTER, c_float, c_int, c_long
+from sdkprofile import SdkProfiler
+from sharedframes import SharedFrameRing
+
+
+def sim_camera(rate, nx, ny, index=0, singleton=True, **settings):
+    """Return a Camera on the simulated SDK, and its SimCamera.
+
+    The camera reads out an nx by ny isolated crop in frame transfer
+    mode, exposing for 1 / rate seconds, so images are acquired at rate
+    unless readout takes longer."""
+    if sdk.BACKEND != 'sim':
+        raise Exception('Benchmarks need the simulated SDK: set ANDOR_SDK=sim.')
+    handle = c_long()
+    sdk.GetCameraHandle(index, handle)
+    if singleton:
+        sdk.SetCurrentCamera(handle)
+    cam = andor.Camera(handle, singleton=singleton)
+    modes = andor.AMPLIFIER_MODES[sdk.AC_CAMERATYPE_IXONULTRA]
+    cam.settings.update({'exposureTime': 1. / rate,
+                         'amplifierMode': modes[3],
+                         'frameTransfer': 1,
+                         'triggerMode': 0,
+                         'roi': (0, 0, nx, ny),
+                         'isolatedCrop': True})
+    cam.settings.update(settings)
+    return cam, andorsim.get_camera(handle.value)
+
+
+class Receiver(object):
+    """A client that counts the images it receives by either transport.
+
+    Given a SimCamera, it also records the latency from acquisition of
+    each image to its receipt, and the error in its timestamp."""
+    def __init__(self, sim=None):
+        self.sim = sim
+        self.ring = None
+        self.received = 0
+        self.latencies = []
+        self.errors = []
+
+
+    def attach(self, description):
+        self.ring = SharedFrameRing.attach(description)
+
+
+    def receiveData(self, action, data, *args):
+        if action == 'new image stack':
+            self.received += len(data)
+            return
+        if action == 'new shared image':
+            if self.ring is None:
+                # Not yet attached to the ring.
+                return
+            data = self.ring.read(data)
+        if data is None:
+            return
+        self.received += 1
+        if self.sim is not None:
+            index = int(data.flat[0]) + (int(data.flat[1]) << 16)
+            acquired = self.sim.frame_times[index % self.sim.buffer_size]
+            self.latencies.append(time.time() - acquired)
+            self.errors.append(args[0] - acquired)
+
+
+# Recent Pyro4 versions only serve methods that are exposed.
+if hasattr(Pyro4, 'expose'):
+    Receiver = Pyro4.expose(Receiver)
+
+
+def serve(receiver):
+    """Serve receiver over Pyro on this host; return (daemon, proxy)."""
+    daemon = Pyro4.Daemon(host='127.0.0.1')
+    uri = daemon.register(receiver)
+    threading.Thread(target=daemon.requestLoop).start()
+    return daemon, Pyro4.Proxy(uri)
+
+
+def run_camera(cam, receiver, duration, client='local'):
+    """Acquire for duration seconds, sending images to receiver.
+
+    Returns (images acquired, images read out)."""
+    daemon = None
+    if client == 'pyro':
+        daemon, cam.client = serve(receiver)
+    else:
+        cam.client = receiver
+    cam.enable(dict(cam.settings))
+    time.sleep(duration)
+    data_thread = cam.data_thread
+    cam.disable()
+    if daemon is not None:
+        cam.client._pyroRelease()
+        daemon.shutdown()
+    return cam.get_total_number_images_acquired(), data_thread.exposure_count
+
+
+def drain(rate, duration, nx, ny, client):
+    """Compare DataThread throughput in single-image and batch modes."""
+    for batch in (False, True):
+        cam, sim = sim_camera(rate, nx, ny, batchReadout=batch)
+        receiver = Receiver()
+        acquired, read = run_camera(cam, receiver, duration, client)
+        if not batch:
+            print ("DataThread drain: %.0f fps, %dx%d, %d image buffer, "
+                   "%s client, %.1fs." % (1. / sim.cycle_time, nx, ny,
+                   sim.buffer_size, client, duration))
+        print "  %-6s: acquired %6d, read %6d, received %6d, %8.1f fps" % (
+            'batch' if batch else 'single', acquired, read,
+            receiver.received, receiver.received / duration)
+
+
+def latency(rate, duration, nx, ny, strategies, client):
+    """Measure acquisition-to-receipt latency for each wait strategy."""
+    print "DataThread latency: %d fps, %dx%d, %s client, %.1fs." % (
+        rate, nx, ny, client, duration)
+    for strategy in strategies:
+        cam, sim = sim_camera(rate, nx, ny, waitStrategy=strategy)
+        receiver = Receiver(sim)
+        run_camera(cam, receiver, duration, client)
+        t = numpy.array(receiver.latencies) * 1000
+        print ("  %-6s: %6d images, latency ms: mean %6.3f, "
+               "p50 %6.3f, p99 %6.3f, max %6.3f" % (
+                strategy, len(t), t.mean(), numpy.percentile(t, 50),
+                numpy.percentile(t, 99), t.max()))
+
+
+def timestamps(rate, duration, nx, ny, sources, strategies):
+    """Measure the error in image timestamps from each source.
+
+    The simulated camera has metadata; 'clock' is tested by overriding
+    the data thread's timestamp source."""
+    print "Timestamp error: %d fps, %dx%d, %.1fs." % (rate, nx, ny, duration)
+    print "  %-8s  %-6s  %8s  %9s  %9s  %9s" % (
+        'source', 'wait', 'images', 'mean ms', 'p99 ms', 'max ms')
+    for source in sources:
+        for strategy in strategies:
+            cam, sim = sim_camera(rate, nx, ny, waitStrategy=strategy,
+                                  hardwareTimestamps=source != 'system')
+            receiver = Receiver(sim)
+            cam.client = receiver
+            cam.enable(dict(cam.settings))
+            cam.data_thread.timestamp_source = source
+            time.sleep(duration)
+            cam.disable()
+            cam.__exit__(None, None, None)
+            # Skip the first images, while the clock model settles.
+            t = numpy.abs(receiver.errors[10:]) * 1000
+            print "  %-8s  %-6s  %8d  %9.3f  %9.3f  %9.3f" % (
+                source, strategy, len(t), t.mean(),
+                numpy.percentile(t, 99), t.max())
+
+
+def cameras(rate, duration, nx, ny, counts, strategies):
+    """Measure aggregate throughput of several cameras in one process.
+
+    The cameras share dll_lock, so this shows the cost of selecting
+    cameras and of waiting for the lock. Images are counted once all
+    cameras are acquiring. Set ANDOR_SIM_CAMERAS to at least the
+    largest count."""
+    available = len(andorsim.library.cameras)
+    if max(counts) > available:
+        raise Exception('Only %d simulated cameras: set ANDOR_SIM_CAMERAS=%d.'
+                        % (available, max(counts)))
+    print "Cameras in one process: %d fps each, %dx%d, %.1fs." % (
+        rate, nx, ny, duration)
+    print "  %-6s  %7s  %10s  %9s  %12s  %12s" % (
+        'wait', 'cameras', 'received', 'fps', 'SetCurrent/s', 'lock wait %')
+    for strategy in strategies:
+        for n in counts:
+            cams = [sim_camera(rate, nx, ny, index=i, singleton=False,
+                               waitStrategy=strategy)[0] for i in range(n)]
+            receivers = [Receiver() for cam in cams]
+            for cam, receiver in zip(cams, receivers):
+                cam.client = receiver
+                cam.enable(dict(cam.settings))
+            sdk.profiler = SdkProfiler()
+            received = sum(r.received for r in receivers)
+            time.sleep(duration)
+            received = sum(r.received for r in receivers) - received
+            stats = sdk.profiler.get_stats()
+            sdk.profiler = None
+            for cam in cams:
+                cam.disable()
+                cam.__exit__(None, None, None)
+            selects = stats['functions'].get('SetCurrentCamera', {'count': 0})
+            lock = stats['functions']['dll_lock']
+            print "  %-6s  %7d  %10d  %9.1f  %12.1f  %12.1f" % (
+                strategy, n, received, received / duration,
+                selects['count'] / duration,
+                100 * lock['total'] / stats['elapsed'])
+
+
+def query_loop(cam, stop, counts):
+    """Query a camera's status until stop is set, as a client might."""
+    while not stop.is_set():
+        cam.get_temperature()
+        cam.get_acquisition_timings()
+        counts.append(1)
+
+
+def contention(rate, duration, nx, ny, n_cameras, n_clients, modes):
+    """Measure frame latency with several cameras and querying clients.
+
+    In 'lock' mode, each thread calls the DLL under dll_lock; in
+    'executor' mode, DLL calls run on an executor thread, readout
+    first; 'monitor' mode is 'lock' mode with a status monitor on each
+    camera, so temperature queries do not call the DLL. Set
+    ANDOR_SIM_CAMERAS to at least n_cameras."""
+    available = len(andorsim.library.cameras)
+    if n_cameras > available:
+        raise Exception('Only %d simulated cameras: set ANDOR_SIM_CAMERAS=%d.'
+                        % (available, n_cameras))
+    print ("Contention: %d cameras at %d fps, %d querying clients, %dx%d, "
+           "%.1fs." % (n_cameras, rate, n_clients, nx, ny, duration))
+    print "  %-8s  %9s  %9s  %8s  %8s  %8s" % (
+        'mode', 'fps', 'queries/s', 'p50 ms', 'p99 ms', 'max ms')
+    for mode in modes:
+        if mode == 'executor':
+            andor.start_executor()
+        cams, sims = zip(*[sim_camera(rate, nx, ny, index=i, singleton=False,
+                                      waitStrategy='wait')
+                           for i in range(n_cameras)])
+        receivers = [Receiver(sim) for sim in sims]
+        for cam, receiver in zip(cams, receivers):
+            cam.client = receiver
+            cam.enable(dict(cam.settings))
+            if mode == 'monitor':
+                cam.start_status_monitor()
+        for receiver in receivers:
+            receiver.latencies = []
+        stop, queries = threading.Event(), []
+        clients = [threading.Thread(target=query_loop,
+                                    args=(cams[i % n_cameras], stop, queries))
+                   for i in range(n_clients)]
+        for client in clients:
+            client.start()
+        time.sleep(duration)
+        stop.set()
+        for client in clients:
+            client.join()
+        t = numpy.concatenate([r.latencies for r in receivers]) * 1000
+        for cam in cams:
+            cam.disable()
+            cam.__exit__(None, None, None)
+        if mode == 'executor':
+            andor.stop_executor()
+        print "  %-8s  %9.1f  %9.1f  %8.3f  %8.3f  %8.3f" % (
+            mode, len(t) / duration, len(queries) / duration,
+            numpy.percentile(t, 50), numpy.percentile(t, 99), t.max())
+
+
+def settings(rate, nx, ny, count):
+    """Measure the time and DLL calls to change settings while acquiring.
+
+    Each change alternates between two values, count times."""
+    print "Settings changes while acquiring: %d fps, %dx%d, %d changes." % (
+        rate, nx, ny, count)
+    print "  %-20s  %8s  %8s  %8s  %10s" % (
+        'settings', 'p50 ms', 'p99 ms', 'max ms', 'DLL calls')
+    changes = [('exposureTime', [{'exposureTime': 1. / rate},
+                                 {'exposureTime': 2. / rate}]),
+               ('EMGain', [{'EMGain': 10}, {'EMGain': 20}]),
+               ('exposureTime+EMGain', [{'exposureTime': 1. / rate,
+                                         'EMGain': 10},
+                                        {'exposureTime': 2. / rate,
+                                         'EMGain': 20}]),
+               ('roi', [{'roi': (0, 0, nx, ny)},
+                        {'roi': (0, 0, nx // 2, ny // 2)}])]
+    cam, sim = sim_camera(rate, nx, ny, EMGain=10)
+    cam.client = Receiver()
+    cam.enable(dict(cam.settings))
+    for name, values in changes:
+        times = []
+        sdk.profiler = SdkProfiler()
+        for i in range(count):
+            t0 = time.time()
+            cam.update_settings(values[(i + 1) % 2])
+            times.append(time.time() - t0)
+        stats = sdk.profiler.get_stats()['functions']
+        sdk.profiler = None
+        calls = sum(s['count'] for f, s in stats.items()
+                    if f != 'dll_lock')
+        t = numpy.array(times) * 1000
+        print "  %-20s  %8.3f  %8.3f  %8.3f  %10.1f" % (
+            name, numpy.percentile(t, 50), numpy.percentile(t, 99), t.max(),
+            float(calls) / count)
+    cam.disable()
+    cam.__exit__(None, None, None)
+
+
+def series(rate, nx, ny, count):
+    """Compare fetching count images by streaming and as a kinetic series.
+
+    Times run from the start of acquisition until all images are in
+    hand, and CPU time is for the whole process."""
+    print "%d images at %d fps, %dx%d." % (count, rate, nx, ny)
+    print "  %-16s  %8s  %8s  %8s  %10s" % (
+        'method', 'images', 'wall s', 'CPU s', 'DLL calls')
+    for method in ('stream', 'stream-batch', 'series'):
+        cam, sim = sim_camera(rate, nx, ny,
+                              batchReadout=method == 'stream-batch')
+        receiver = Receiver()
+        cam.client = receiver
+        if method == 'series':
+            # Apply the settings: the series starts from enable.
+            cam.enable(dict(cam.settings))
+        sdk.profiler = SdkProfiler()
+        t0, c0 = time.time(), time.clock()
+        if method == 'series':
+            cam.start_kinetic_series(count)
+            cam.wait_kinetic_series()
+            received = len(cam.read_kinetic_series())
+        else:
+            cam.enable(dict(cam.settings))
+            while receiver.received < count:
+                time.sleep(0.001)
+            received = receiver.received
+        wall, cpu = time.time() - t0, time.clock() - c0
+        stats = sdk.profiler.get_stats()['functions']
+        sdk.profiler = None
+        calls = sum(s['count'] for f, s in stats.items() if f != 'dll_lock')
+        cam.disable()
+        cam.__exit__(None, None, None)
+        print "  %-16s  %8d  %8.3f  %8.3f  %10d" % (
+            method, received, wall, cpu, calls)
+
+
+def shared_client(cam, receiver, uri):
+    """Register receiver for shared frames before cam is initialized.
+
+    Checks that the ring is made on enable, and that frames arrive
+    through it."""
+    if cam.receiveClient(uri, transport='shm') is not None:
+        raise Exception('Shared ring made before the detector size was known.')
+    cam.enable(dict(cam.settings))
+    receiver.attach(cam.get_shared_ring())
+    time.sleep(0.2)
+    cam.disable()
+    if not receiver.received:
+        raise Exception('No frames received through the shared ring.')
+    print "  Client registered before enable received %d frames." % (
+        receiver.received)
+
+
+def transport(nx, ny, count):
+    """Compare per-frame cost of pickled and shared-memory transport."""
+    print "Frame transport: %dx%d, %d frames." % (nx, ny, count)
+    receiver = Receiver()
+    daemon, client = serve(receiver)
+    cam, sim = sim_camera(1000, nx, ny)
+    shared_client(cam, receiver, client._pyroUri.asString())
+    ring = cam.shared_ring
+    image = numpy.arange(nx * ny, dtype=numpy.uint16).reshape(ny, nx)
+    # Flip the image, as DataThread usually sends a view.
+    view = numpy.fliplr(image)
+    for name in ('pyro', 'shm'):
+        receiver.received = 0
+        t0, cpu0 = time.time(), os.times()
+        for i in range(count):
+            if name == 'shm':
+                client.receiveData('new shared image',
+                                   ring.write(view, time.time()), time.time())
+            else:
+                client.receiveData('new image', view, time.time())
+        t, cpu = time.time() - t0, os.times()
+        cpu = (cpu[0] - cpu0[0]) + (cpu[1] - cpu0[1])
+        print "  %-4s: %5d received, %8.3f ms/frame, %8.3f ms CPU/frame" % (
+            name, receiver.received, 1000 * t / count, 1000 * cpu / count)
+    client._pyroRelease()
+    daemon.shutdown()
+    cam.receiveClient(None)
+    cam.__exit__(None, None, None)
+
+
+def sdk_postprocess(name, stack, *args):
+    """Run a PostProcess function in the DLL, one int32 image per call."""
+    n, ny, nx = stack.shape
+    data = stack.astype(numpy.int32)
+    if name == 'photon':
+        thresholds, frames = args
+        out = numpy.empty((n // frames, ny, nx), numpy.int32)
+        levels = (c_float * len(thresholds))(*thresholds)
+        for i in range(n // frames):
+            image = data[i * frames:(i + 1) * frames]
+            sdk.PostProcessPhotonCounting(
+                image.ctypes.data_as(POINTER(c_int)),
+                out[i].ctypes.data_as(POINTER(c_int)), out[i].size, 1,
+                frames, len(thresholds), levels, ny, nx)
+        return out
+    out = numpy.empty(data.shape, numpy.int32)
+    for image, result in zip(data, out):
+        pointers = (image.ctypes.data_as(POINTER(c_int)),
+                    result.ctypes.data_as(POINTER(c_int)), result.size)
+        if name == 'convert':
+            sdk.PostProcessCountConvert(*(pointers + (1,) + args + (ny, nx)))
+        else:
+            sdk.PostProcessNoiseFilter(*(pointers + args + (ny, nx)))
+    return out
+
+
+def int32_postprocess(name, stack, *args):
+    """As the DLL does: convert to int32, then process image by image."""
+    data = stack.astype(numpy.int32)
+    if name == 'photon':
+        thresholds, frames = args
+        return numpy.array([postprocess.photon_counting(
+            data[i:i + frames], thresholds, frames)[0]
+            for i in range(0, len(data), frames)])
+    func = {'convert': postprocess.count_convert,
+            'noise': postprocess.noise_filter}[name]
+    return numpy.array([func(image, *args) for image in data])
+
+
+def postprocessing(sizes, nx, ny, threads, count):
+    """Compare photon counting, count conversion and noise filtering on
+    uint16 stacks, image by image on int32 data as in the SDK, and
+    vectorised in chunks on a PostProcessor's threads.
+
+    With the DLL backend, the baseline calls the SDK's PostProcess
+    functions, and results are checked against them."""
+    operations = (('photon', ([100.5, 300., 1000.], 4)),
+                  ('convert', (100, 2, 300, 0.9, 4.5)),
+                  ('noise', (100, 1, 50.)))
+    methods = {'photon': 'photon_counting', 'convert': 'count_convert',
+               'noise': 'noise_filter'}
+    baseline = sdk_postprocess if sdk.BACKEND == 'dll' else int32_postprocess
+    processors = dict((n, postprocess.PostProcessor(n)) for n in threads)
+    rng = numpy.random.RandomState(0)
+    print "%dx%d images, ms per stack, best of %d; baseline is %s." % (
+        nx, ny, count, baseline.__name__)
+    print "  %-8s %6s  %10s  %s" % ('op', 'images', 'baseline',
+        '  '.join('%3d thread%s' % (n, ' ' if n == 1 else 's')
+                  for n in threads))
+    for name, args in operations:
+        for size in sizes:
+            stack = rng.poisson(150, (size, ny, nx)).astype(numpy.uint16)
+            times = []
+            expected = baseline(name, stack, *args)
+            for func in [functools.partial(baseline, name)] + [
+                    getattr(processors[n], methods[name]) for n in threads]:
+                best = None
+                for i in range(count):
+                    t0 = time.time()
+                    result = func(stack, *args)
+                    t = time.time() - t0
+                    best = t if best is None else min(best, t)
+                if not numpy.array_equal(result, expected):
+                    raise Exception('%s result differs from baseline.' % name)
+                times.append(1000 * best)
+            print "  %-8s %6d  %10.2f  %s" % (
+                name, size, times[0],
+                '  '.join('%11.2f' % t for t in times[1:]))
+    for processor in processors.values():
+        processor.stop()
+
+
+class ShapedCamera(object):
+    """The least a DataThread needs from a camera, to time transforms."""
+    def __init__(self, nx, ny):
+        self.logger = andor.CameraLogger()
+        self.shape = (ny, nx)
+
+
+    def get_image_shape(self):
+        return self.shape
+
+
+    def get_size_of_circular_buffer(self):
+        return 0
+
+
+    def get_acquisition_timings(self):
+        return (0., 0., 0.)
+
+
+def legacy_transform(m, transform):
+    """The per-frame transform that compile_transform replaced."""
+    flips = (transform[0], transform[1])
+    rotation = transform[2]
+    return {(0,0): numpy.rot90(m, rotation),
+            (0,1): numpy.flipud(numpy.rot90(m, rotation)),
+            (1,0): numpy.fliplr(numpy.rot90(m, rotation)),
+            (1,1): numpy.fliplr(numpy.flipud(numpy.rot90(m, rotation)))}[flips]
+
+
+def transform(sizes, count):
+    """Time orientation transforms, including a copy to an outgoing buffer.
+
+    'legacy' builds all four views per frame then copies the one wanted;
+    'compiled' applies a precompiled view and copies it into a
+    preallocated buffer."""
+    print "Transform and copy, mean ms per frame over %d frames." % count
+    print "  %9s  %9s  %9s  %9s" % ('size', 'transform', 'legacy', 'compiled')
+    transforms = [(lr, ud, rot) for lr in (0, 1) for ud in (0, 1)
+                  for rot in (0, 1)]
+    for size in sizes:
+        m = numpy.arange(size * size, dtype=numpy.uint16).reshape(size, size)
+        out = numpy.empty_like(m)
+        thread = andor.DataThread(ShapedCamera(size, size), None, pool_size=1)
+        for t in transforms:
+            thread.set_transform(t)
+            assert (thread.get_transformed_image(m) ==
+                    legacy_transform(m, t)).all()
+            t0 = time.time()
+            for i in range(count):
+                numpy.array(legacy_transform(m, t), order='C')
+            t_legacy = time.time() - t0
+            t0 = time.time()
+            for i in range(count):
+                thread.get_transformed_image(m, out)
+            t_compiled = time.time() - t0
+            print "  %9s  %9s  %9.3f  %9.3f" % (
+                '%dx%d' % (size, size), t,
+                1000 * t_legacy / count, 1000 * t_compiled / count)
+
+
+def correct_like_client(image, maps):
+    """Dark, flat and defect correction as a client might do it."""
+    corrected = (image.astype(numpy.float64) - maps.dark) / maps.flat
+    flat = corrected.reshape(-1)
+    flat[maps.defect_index] = (flat[maps.neighbour_index]
+                               * maps.neighbour_weights).sum(axis=1)
+    return corrected
+
+
+def corrections(sizes, count, defects):
+    """Time dark, flat and defect correction of one frame.
+
+    'client' allocates float64 images, as a client correcting frames
+    itself might; 'float32' corrects into a preallocated buffer; 'uint16'
+    corrects in place, rounding and saturating, and includes restoring
+    the raw frame each time."""
+    print "Correction with %d defects, mean ms per frame over %d frames." % (
+        defects, count)
+    print "  %9s  %9s  %9s  %9s" % ('size', 'client', 'float32', 'uint16')
+    rng = numpy.random.RandomState(0)
+    for size in sizes:
+        shape = (size, size)
+        maps = correction.CorrectionMaps(shape)
+        maps.set_dark(rng.normal(100, 2, shape), hot_threshold=None)
+        maps.set_flat(rng.uniform(0.8, 1.2, shape), dead_threshold=None)
+        mask = numpy.zeros(size * size, bool)
+        mask[rng.choice(mask.size, defects, replace=False)] = True
+        maps.set_defects(mask.reshape(shape))
+        image = rng.poisson(1000, shape).astype(numpy.uint16)
+        out = numpy.empty(shape, numpy.float32)
+        in_place = image.copy()
+        assert numpy.allclose(maps.apply(image, out),
+                              correct_like_client(image, maps), rtol=1e-5)
+        assert (maps.apply(in_place, in_place, out) ==
+                numpy.floor(maps.apply(image, out.copy()) + 0.5)).all()
+        times = []
+        for method in ('client', 'float32', 'uint16'):
+            t0 = time.time()
+            for i in range(count):
+                if method == 'client':
+                    correct_like_client(image, maps)
+                elif method == 'float32':
+                    maps.apply(image, out)
+                else:
+                    in_place[...] = image
+                    maps.apply(in_place, in_place, out)
+            times.append(1000 * (time.time() - t0) / count)
+        print "  %9s  %9.3f  %9.3f  %9.3f" % (
+            ('%dx%d' % shape,) + tuple(times))
+
+
+class StubCamera(object):
+    """The attributes that Camera method wrappers use."""
+    def __init__(self, handle, singleton):
+        self.handle = handle
+        self.singleton = singleton
+
+
+def stub_functions(library):
+    """Return (wrapped, fast, args) for a function in library.
+
+    'wrapped' is typed and wrapped as by sdk.bind, and 'fast' as by
+    sdk.bind_fast. For 'libc', the function is abs, which returns its
+    argument: DRV_SUCCESS. For 'sim', it is GetNumberNewImages on an
+    idle simulated camera."""
+    if library == 'libc':
+        lib = ctypes.CDLL(ctypes.util.find_library('c') or 'msvcrt')
+        wrapped, fast = lib['abs'], lib['abs']
+        for f in (wrapped, fast):
+            f.restype = c_int
+            f.argtypes = [c_int]
+        fast.errcheck = sdk.check_status
+        return sdk.sdk_wrapper(wrapped), fast, (sdk.DRV_SUCCESS,)
+    sdk.Initialize('')
+    return (sdk.bind('GetNumberNewImages'),
+            sdk.bind_fast('GetNumberNewImages'), (c_long(), c_long()))
+
+
+def calls(count, libraries, profile):
+    """Compare calls per second through wrapped and fast Camera methods.
+
+    'wrapped' is the with_camera and sdk_call wrapping used for most
+    DLL methods; 'fast' is fast_method, used for sdk.FAST_FUNCTIONS;
+    'direct' calls the fast function without a Camera method. With
+    --profile, calls are timed by an SdkProfiler."""
+    if sdk.BACKEND != 'sim':
+        raise Exception('Benchmarks need the simulated SDK: set ANDOR_SDK=sim.')
+    handle = c_long()
+    sdk.GetCameraHandle(0, handle)
+    sdk.SetCurrentCamera(handle)
+    if profile:
+        sdk.profiler = SdkProfiler()
+    print "SDK calls per second over %d calls%s." % (
+        count, ', profiled' if profile else '')
+    print "  %-6s  %-6s  %10s  %10s  %10s" % (
+        'stub', 'camera', 'wrapped', 'fast', 'direct')
+    for library in libraries:
+        wrapped, fast, args = stub_functions(library)
+        for singleton in (True, False):
+            cam = StubCamera(handle, singleton)
+            methods = (andor.with_camera(andor.sdk_call(wrapped)),
+                       andor.fast_method(fast))
+            funcs = [functools.partial(m, cam) for m in methods] + [fast]
+            rates = []
+            for func in funcs:
+                t0 = time.time()
+                for i in xrange(count):
+                    func(*args)
+                rates.append(count / (time.time() - t0))
+            print "  %-6s  %-6s  %10.0f  %10.0f  %10.0f" % (
+                (library, 'single' if singleton else 'shared') + tuple(rates))
+    if profile:
+        print '\n'.join(sdk.profiler.format_stats())
+        sdk.profiler = None
+
+
+## Code to import andor in a fresh interpreter, for each import mode.
+# Dependencies are imported before timing starts.
+IMPORT_CODE = {
+    'eager': 'import andorsdk; andorsdk.bind_all(); import andor; '
+             '[getattr(andor.Camera, f.__name__) for f in andorsdk.camerafuncs]',
+    'lazy': 'import andor',
+    'lazy-parse': 'sys.modules["andorprototypes"] = None; import andor'}
+
+IMPORT_TEMPLATE = """
+import sys, time, ctypes, numpy, numpy.ctypeslib, Pyro4, psutil
+t0 = time.time()
+%s
+print time.time() - t0
+"""
+
+
+def imports(count, modes):
+    """Time importing andor in a new process, binding DLL functions
+    eagerly, lazily with precompiled prototypes, or lazily parsing
+    function_list.
+
+    The gain from lazy binding is a few ms, so the modules are compiled
+    first: without .pyc files, compiling andor.py takes tens of ms on
+    every import and hides the difference between modes."""
+    path = os.path.dirname(os.path.abspath(__file__))
+    # Make sure every mode starts from compiled modules. Importing is not
+    # enough, as it writes no .pyc with PYTHONDONTWRITEBYTECODE set.
+    if not compileall.compile_dir(path, maxlevels=0, quiet=1):
+        print "Could not compile modules: times include compiling them."
+    print "Import time, ms over %d processes." % count
+    print "  %-10s  %8s  %8s  %8s" % ('mode', 'min', 'median', 'max')
+    for mode in modes:
+        code = IMPORT_TEMPLATE % IMPORT_CODE[mode]
+        t = numpy.array([float(subprocess.check_output(
+                             [sys.executable, '-c', code], cwd=path))
+                         for i in range(count)]) * 1000
+        print "  %-10s  %8.2f  %8.2f  %8.2f" % (
+            mode, t.min(), numpy.median(t), t.max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers()
+
+    p = subparsers.add_parser('drain', help=drain.__doc__)
+    p.add_argument('--rate', type=float, default=1000)
+    p.add_argument('--duration', type=float, default=5)
+    p.add_argument('--nx', type=int, default=64)
+    p.add_argument('--ny', type=int, default=64)
+    p.add_argument('--client', choices=('local', 'pyro'), default='local')
+    p.set_defaults(func=drain)
+
+    p = subparsers.add_parser('latency', help=latency.__doc__)
+    p.add_argument('--rate', type=float, default=100)
+    p.add_argument('--duration', type=float, default=5)
+    p.add_argument('--nx', type=int, default=128)
+    p.add_argument('--ny', type=int, default=128)
+    p.add_argument('--strategies', nargs='+',
+                   default=sorted(andor.WAIT_STRATEGIES))
+    p.add_argument('--client', choices=('local', 'pyro'), default='local')
+    p.set_defaults(func=latency)
+
+    p = subparsers.add_parser('timestamps', help=timestamps.__doc__)
+    p.add_argument('--rate', type=float, default=100)
+    p.add_argument('--duration', type=float, default=3)
+    p.add_argument('--nx', type=int, default=128)
+    p.add_argument('--ny', type=int, default=128)
+    p.add_argument('--sources', nargs='+', choices=andor.TIMESTAMP_SOURCES,
+                   default=list(andor.TIMESTAMP_SOURCES))
+    p.add_argument('--strategies', nargs='+',
+                   default=sorted(andor.WAIT_STRATEGIES))
+    p.set_defaults(func=timestamps)
+
+    p = subparsers.add_parser('cameras', help=cameras.__doc__)
+    p.add_argument('--rate', type=float, default=500)
+    p.add_argument('--duration', type=float, default=3)
+    p.add_argument('--nx', type=int, default=64)
+    p.add_argument('--ny', type=int, default=64)
+    p.add_argument('--counts', type=int, nargs='+', default=[1, 2, 4])
+    p.add_argument('--strategies', nargs='+',
+                   default=sorted(andor.WAIT_STRATEGIES))
+    p.set_defaults(func=cameras)
+
+    p = subparsers.add_parser('contention', help=contention.__doc__)
+    p.add_argument('--rate', type=float, default=500)
+    p.add_argument('--duration', type=float, default=3)
+    p.add_argument('--nx', type=int, default=64)
+    p.add_argument('--ny', type=int, default=64)
+    p.add_argument('--n-cameras', type=int, default=2)
+    p.add_argument('--n-clients', type=int, default=4)
+    p.add_argument('--modes', nargs='+',
+                   choices=('lock', 'executor', 'monitor'),
+                   default=['lock', 'executor', 'monitor'])
+    p.set_defaults(func=contention)
+
+    p = subparsers.add_parser('settings', help=settings.__doc__)
+    p.add_argument('--rate', type=float, default=500)
+    p.add_argument('--nx', type=int, default=64)
+    p.add_argument('--ny', type=int, default=64)
+    p.add_argument('--count', type=int, default=200)
+    p.set_defaults(func=settings)
+
+    p = subparsers.add_parser('series', help=series.__doc__)
+    p.add_argument('--rate', type=float, default=5000)
+    p.add_argument('--nx', type=int, default=64)
+    p.add_argument('--ny', type=int, default=64)
+    p.add_argument('--count', type=int, default=5000)
+    p.set_defaults(func=series)
+
+    p = subparsers.add_parser('transport', help=transport.__doc__)
+    p.add_argument('--nx', type=int, default=512)
+    p.add_argument('--ny', type=int, default=512)
+    p.add_argument('--count', type=int, default=500)
+    p.set_defaults(func=transport)
+
+    p = subparsers.add_parser('postprocess', help=postprocessing.__doc__)
+    p.add_argument('--sizes', type=int, nargs='+', default=[4, 16, 64])
+    p.add_argument('--nx', type=int, default=512)
+    p.add_argument('--ny', type=int, default=512)
+    p.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+    p.add_argument('--count', type=int, default=5)
+    p.set_defaults(func=postprocessing)
+
+    p = subparsers.add_parser('transform', help=transform.__doc__)
+    p.add_argument('--sizes', type=int, nargs='+',
+                   default=[128, 256, 512, 1024, 2048])
+    p.add_argument('--count', type=int, default=50)
+    p.set_defaults(func=transform)
+
+    p = subparsers.add_parser('correction', help=corrections.__doc__)
+    p.add_argument('--sizes', type=int, nargs='+',
+                   default=[128, 256, 512, 1024])
+    p.add_argument('--count', type=int, default=100)
+    p.add_argument('--defects', type=int, default=100)
+    p.set_defaults(func=corrections)
+
+    p = subparsers.add_parser('calls', help=calls.__doc__)
+    p.add_argument('--count', type=int, default=200000)
+    p.add_argument('--libraries', nargs='+', choices=('libc', 'sim'),
+                   default=['libc', 'sim'])
+    p.add_argument('--profile', action='store_true')
+    p.set_defaults(func=calls)
+
+    p = subparsers.add_parser('imports', help=imports.__doc__)
+    p.add_argument('--count', type=int, default=20)
+    p.add_argument('--modes', nargs='+', choices=sorted(IMPORT_CODE),
+                   default=['eager', 'lazy-parse', 'lazy'])
+    p.set_defaults(func=imports)
+
+    args = vars(parser.parse_args())
+    func = args.pop('func')
+    func(**args)
+
+
+if __name__ == '__main__':
+    main()
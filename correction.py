@@ -0,0 +1,280 @@
+#
+#   correction - dark, flat and defect correction of camera frames.
+#   Copyright (C) 2015 Mick Phillips
+#   mick.phillips@gmail.com
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""correction - dark, flat and defect correction of camera frames.
+
+CorrectionMaps holds the maps for one set of camera settings:
+* dark: the mean of dark frames, subtracted from each frame;
+* flat: each pixel's relative response, normalised to a mean of 1,
+  which each frame is divided by;
+* defects: a mask of defective pixels, which are replaced by the
+  mean of their good neighbours once the frame is corrected. Hot
+  pixels found in the dark and dead pixels found in the flat are
+  defects too.
+Any map may be absent. apply corrects a frame into a preallocated
+float32 image, or into a uint16 image whose values are rounded, halves
+up, and saturate at 0 and 65535, which may be the frame itself.
+
+A CorrectionCache keeps CorrectionMaps by a key of the settings they
+were made at, so that maps are made once for each combination. Maps in
+the cache may be in use by other threads, so the cache changes a copy
+and replaces them with it: a thread holding maps never sees them part
+changed.
+
+This module does not depend on the Andor SDK.
+"""
+
+import copy
+import numpy
+
+## Dtypes a frame may be corrected into.
+CORRECTION_OUTPUTS = ('uint16', 'float32')
+## Range of a saturating uint16 output.
+UINT16_RANGE = (0, 65535)
+## Pixels of a dark whose level exceeds the median by this many robust
+## standard deviations are hot.
+HOT_PIXEL_THRESHOLD = 6.
+## Pixels of a flat whose response is below this fraction of the mean
+## are dead.
+DEAD_PIXEL_THRESHOLD = 0.5
+## Offsets of the eight neighbours of a pixel.
+NEIGHBOURS = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+              if dy or dx]
+
+
+def load_map(value):
+    """Return a map given as an array, or as the path of a .npy file."""
+    if isinstance(value, basestring):
+        return numpy.load(value)
+    return numpy.asarray(value)
+
+
+def round_for_uint16(work):
+    """Round float32 work in place for conversion to uint16, and return it.
+
+    Values are rounded to nearest, halves up, as conversion truncates,
+    and saturate at 0 and 65535."""
+    work += 0.5
+    numpy.clip(work, UINT16_RANGE[0], UINT16_RANGE[1], out=work)
+    return work
+
+
+def find_hot_pixels(dark, threshold=HOT_PIXEL_THRESHOLD):
+    """Return a mask of pixels far above the median level of dark.
+
+    The spread is estimated from the median absolute deviation, so
+    hot pixels do not inflate it."""
+    median = numpy.median(dark)
+    sigma = 1.4826 * numpy.median(numpy.abs(dark - median))
+    return dark > median + threshold * max(sigma, 1.)
+
+
+class CorrectionMaps(object):
+    """Dark, flat and defect maps for frames of one shape."""
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.dark = None
+        self.flat = None
+        self.defects = None
+        # Defects found in the dark and in the flat.
+        self.hot_pixels = None
+        self.dead_pixels = None
+        # Number of frames averaged for the dark and the flat.
+        self.dark_frames = 0
+        self.flat_frames = 0
+        self.compile()
+
+
+    def check_shape(self, m, name):
+        if m.shape != self.shape:
+            raise Exception('%s map has shape %s, not %s.'
+                            % (name, m.shape, self.shape))
+
+
+    def set_dark(self, dark, frames=1, hot_threshold=HOT_PIXEL_THRESHOLD):
+        """Set the dark from a mean dark frame, or a stack to average.
+
+        Hot pixels in the dark are defects, unless hot_threshold is
+        None."""
+        dark = load_map(dark)
+        if dark.ndim == 3:
+            frames = len(dark)
+            dark = dark.mean(axis=0, dtype=numpy.float64)
+        self.check_shape(dark, 'Dark')
+        self.dark = dark.astype(numpy.float32)
+        self.dark_frames = frames
+        self.hot_pixels = None
+        if hot_threshold is not None:
+            self.hot_pixels = find_hot_pixels(self.dark, hot_threshold)
+        self.compile()
+
+
+    def set_flat(self, flat, frames=1, dead_threshold=DEAD_PIXEL_THRESHOLD):
+        """Set the flat from a response map, or a stack of lit frames.
+
+        Frames are averaged, and the dark is subtracted from them. The
+        flat is normalised to a mean of 1 over good pixels. Pixels whose
+        response is below dead_threshold are defects, unless it is
+        None."""
+        flat = load_map(flat)
+        if flat.ndim == 3:
+            frames = len(flat)
+            flat = flat.mean(axis=0, dtype=numpy.float64)
+            if self.dark is not None:
+                flat = flat - self.dark
+        self.check_shape(flat, 'Flat')
+        flat = flat.astype(numpy.float64)
+        good = flat > 0
+        for defects in (self.defects, self.hot_pixels):
+            if defects is not None:
+                good &= ~defects
+        if not good.any():
+            raise Exception('Flat has no pixels with a positive response.')
+        flat /= flat[good].mean()
+        self.dead_pixels = None
+        if dead_threshold is not None:
+            self.dead_pixels = flat < dead_threshold
+        # Defects are replaced, so their response does not matter.
+        flat[flat <= 0] = 1.
+        self.flat = flat.astype(numpy.float32)
+        self.flat_frames = frames
+        self.compile()
+
+
+    def set_defects(self, defects):
+        """Set the mask of known defects, such as a camera's defect map."""
+        defects = load_map(defects).astype(bool)
+        self.check_shape(defects, 'Defect')
+        self.defects = defects
+        self.compile()
+
+
+    def get_defects(self):
+        """Return a mask of all defects, or None if there are none."""
+        masks = [m for m in (self.defects, self.hot_pixels, self.dead_pixels)
+                 if m is not None]
+        if not masks:
+            return None
+        return numpy.logical_or.reduce(masks)
+
+
+    def compile(self):
+        """Precompute what apply needs from the maps."""
+        self.offset = 0. if self.dark is None else self.dark
+        self.gain = None if self.flat is None else 1. / self.flat
+        self.defect_index = None
+        defects = self.get_defects()
+        if defects is None or not defects.any():
+            return
+        # Flat indices of each defect's neighbours, and the weight of
+        # each in the mean: 0 for neighbours off the edge or defective.
+        ny, nx = self.shape
+        y, x = numpy.nonzero(defects)
+        ys = numpy.array([y + dy for dy, dx in NEIGHBOURS]).T
+        xs = numpy.array([x + dx for dy, dx in NEIGHBOURS]).T
+        inside = (ys >= 0) & (ys < ny) & (xs >= 0) & (xs < nx)
+        ys, xs = ys.clip(0, ny - 1), xs.clip(0, nx - 1)
+        weights = (inside & ~defects[ys, xs]).astype(numpy.float32)
+        counts = weights.sum(axis=1, keepdims=True)
+        weights /= numpy.maximum(counts, 1)
+        self.defect_index = y * nx + x
+        self.neighbour_index = ys * nx + xs
+        self.neighbour_weights = weights
+
+
+    def apply(self, image, out, scratch=None):
+        """Correct image into out, and return out.
+
+        out may be float32, or uint16, which may be image itself. For
+        uint16, a float32 scratch array of the image's shape is needed.
+        Defects with no good neighbours become 0."""
+        if out.dtype == numpy.float32:
+            work = out
+        elif out.dtype == numpy.uint16:
+            work = scratch
+        else:
+            raise Exception('Cannot correct into %s.' % out.dtype)
+        numpy.subtract(image, self.offset, out=work)
+        if self.gain is not None:
+            work *= self.gain
+        if self.defect_index is not None:
+            flat = work.reshape(-1)
+            flat[self.defect_index] = (flat[self.neighbour_index]
+                                       * self.neighbour_weights).sum(axis=1)
+        if work is not out:
+            numpy.copyto(out, round_for_uint16(work), casting='unsafe')
+        return out
+
+
+    def copy(self):
+        """Return a copy of these maps to change.
+
+        The arrays are shared: the set_ methods replace arrays rather
+        than change them in place."""
+        return copy.copy(self)
+
+
+    def describe(self):
+        """Return a summary of the maps."""
+        count = lambda m: 0 if m is None else int(m.sum())
+        return {'shape': self.shape,
+                'darkFrames': self.dark_frames if self.dark is not None else 0,
+                'darkLevel': (float(self.dark.mean())
+                              if self.dark is not None else None),
+                'flatFrames': self.flat_frames if self.flat is not None else 0,
+                'hotPixels': count(self.hot_pixels),
+                'deadPixels': count(self.dead_pixels),
+                'defects': count(self.get_defects())}
+
+
+class CorrectionCache(object):
+    """CorrectionMaps by a key of the settings they were made at."""
+    def __init__(self):
+        self.maps = {}
+
+
+    def get(self, key):
+        """Return the maps for key, or None."""
+        return self.maps.get(key)
+
+
+    def change(self, key, shape, method, *args, **kwargs):
+        """Call method of a copy of the maps for key, and keep the copy.
+
+        The maps are new if there are none of shape. Returns the copy."""
+        maps = self.maps.get(key)
+        if maps is None or maps.shape != tuple(shape):
+            maps = CorrectionMaps(shape)
+        else:
+            maps = maps.copy()
+        getattr(maps, method)(*args, **kwargs)
+        self.maps[key] = maps
+        return maps
+
+
+    def discard(self, key=None):
+        """Discard the maps for key, or all maps if key is None."""
+        if key is None:
+            self.maps.clear()
+        else:
+            self.maps.pop(key, None)
+
+
+    def describe(self):
+        """Return a list of (key, summary) for every set of maps."""
+        return [(key, maps.describe()) for key, maps in self.maps.items()]
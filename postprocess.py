@@ -0,0 +1,352 @@
+#
+#   postprocess - photon counting and count conversion on frame stacks.
+#   Copyright (C) 2015 Mick Phillips
+#   mick.phillips@gmail.com
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""postprocess - photon counting and count conversion on frame stacks.
+
+NumPy versions of the SDK's PostProcessPhotonCounting,
+PostProcessCountConvert and PostProcessNoiseFilter, which run in the
+DLL one image at a time on 32-bit data. These work on stacks of shape
+(images, ny, nx), so also on single images of shape (ny, nx):
+* photon_counting: the number of thresholds each pixel exceeds, summed
+  over groups of frames;
+* count_convert: counts to electrons (mode 1) or photons (mode 2);
+* noise_filter: replaces spurious pixels by the median of their 3x3
+  neighbourhood, by one of four tests.
+Photon counting and count conversion map uint16 data through a table
+of results for every possible value, so a stack is never converted to
+32-bit; other integer data is processed directly, with the same
+results. As in the DLL, photon counts and conversions are int32.
+
+A PostProcessor splits a stack into chunks of images and processes
+them in parallel on an Executor's threads. NumPy releases the GIL for
+the array operations, so the chunks use several cores.
+
+This module does not depend on the Andor SDK.
+"""
+
+import multiprocessing
+import numpy
+from sdkexecutor import Executor, CONTROL
+
+## Number of possible uint16 pixel values, and so entries in a table.
+LUT_SIZE = 1 << 16
+## Modes for count_convert, as PostProcessCountConvert's iMode.
+COUNT_CONVERT_MODES = {1: 'electrons', 2: 'photons'}
+## Modes for noise_filter, as PostProcessNoiseFilter's iMode.
+NOISE_FILTER_MODES = {1: 'median',
+                      2: 'levelAbove',
+                      3: 'interquartileRange',
+                      4: 'noiseThreshold'}
+## Offsets of the pixels in a 3x3 neighbourhood: the centre is 4.
+NEIGHBOURHOOD = [(dy, dx) for dy in range(3) for dx in range(3)]
+## Compare-exchanges of a sorting network for nine values, for the
+## quartiles of neighbourhoods: element-wise minimum and maximum are much
+## faster than numpy's partition along a short axis.
+SORT9 = ((0, 3), (1, 7), (2, 5), (4, 8), (0, 7), (2, 4), (3, 8), (5, 6),
+         (0, 2), (1, 3), (4, 5), (7, 8), (1, 4), (3, 6), (5, 7), (0, 1),
+         (2, 4), (3, 5), (6, 8), (2, 3), (4, 5), (6, 7), (1, 2), (3, 4),
+         (5, 6))
+## Default number of images in each chunk processed by a PostProcessor.
+CHUNK_IMAGES = 4
+
+
+def as_stack(data):
+    """Return data as a stack of images, and whether it was one image."""
+    data = numpy.asarray(data)
+    if data.ndim == 2:
+        return data[numpy.newaxis], True
+    if data.ndim != 3:
+        raise Exception('Expected an image or a stack of images.')
+    return data, False
+
+
+def check_integer(data):
+    if data.dtype.kind not in 'iu':
+        raise Exception('Expected integer pixel data, not %s.' % data.dtype)
+
+
+def get_output(out, shape, dtype):
+    """Return out, checked against shape and dtype, or a new array."""
+    if out is None:
+        return numpy.empty(shape, dtype)
+    if out.ndim == len(shape) - 1:
+        out = out[numpy.newaxis]
+    if out.shape != shape or out.dtype != dtype:
+        raise Exception('Output must be %s with shape %s.' % (
+            numpy.dtype(dtype), shape))
+    return out
+
+
+def photon_thresholds(thresholds):
+    """Return thresholds as the largest integers each pixel must exceed.
+
+    For integer pixels, value > t exactly when value > floor(t)."""
+    thresholds = numpy.floor(numpy.asarray(thresholds, numpy.float32))
+    if thresholds.ndim != 1 or not len(thresholds):
+        raise Exception('Need a sequence of one or more thresholds.')
+    return numpy.sort(thresholds).astype(numpy.int64)
+
+
+def photon_counting_lut(thresholds):
+    """Return the photon count for each uint16 value, as uint8."""
+    thresholds = photon_thresholds(thresholds)
+    if len(thresholds) > 255:
+        raise Exception('At most 255 thresholds are supported.')
+    values = numpy.arange(LUT_SIZE)
+    return numpy.searchsorted(thresholds, values, 'left').astype(numpy.uint8)
+
+
+def photon_counting(data, thresholds, frames=1, out=None, lut=None):
+    """Count photons in each pixel, summed over groups of frames.
+
+    A pixel counts one photon for each threshold its value exceeds.
+    Each output image sums the counts of frames consecutive images, as
+    iNumframes in PostProcessPhotonCounting. Returns int32 images."""
+    stack, single = as_stack(data)
+    check_integer(stack)
+    n, ny, nx = stack.shape
+    if frames < 1 or n % frames:
+        raise Exception('%d images do not divide into groups of %d frames.'
+                        % (n, frames))
+    out = get_output(out, (n // frames, ny, nx), numpy.int32)
+    if stack.dtype == numpy.uint16:
+        if lut is None:
+            lut = photon_counting_lut(thresholds)
+        counts = lut.take(stack)
+    else:
+        counts = numpy.searchsorted(photon_thresholds(thresholds), stack,
+                                    'left').astype(numpy.uint8)
+    if frames == 1:
+        out[...] = counts
+    else:
+        counts.reshape(n // frames, frames, ny, nx).sum(
+            axis=1, dtype=numpy.int32, out=out)
+    return out[0] if single and frames == 1 else out
+
+
+def count_convert_values(values, baseline, mode, em_gain, qe, sensitivity):
+    """Convert counts to electrons or photons, truncated to int32.
+
+    electrons = (counts - baseline) * sensitivity / EM gain, and
+    photons = electrons / qe, where qe is a fraction. An EM gain below 1
+    means the EM register is off."""
+    if mode not in COUNT_CONVERT_MODES:
+        raise Exception('Count convert mode must be one of %s.'
+                        % sorted(COUNT_CONVERT_MODES))
+    if mode == 2 and qe <= 0:
+        raise Exception('Quantum efficiency must be positive.')
+    # Operations in the order of the formulae, so results round alike.
+    result = numpy.subtract(values, baseline, dtype=numpy.float64)
+    result *= sensitivity
+    result /= max(em_gain, 1)
+    if mode == 2:
+        result /= qe
+    # Conversion to int32 truncates towards zero, as a C cast does.
+    return result.astype(numpy.int32)
+
+
+def count_convert_lut(baseline, mode, em_gain, qe, sensitivity):
+    """Return the conversion of each uint16 value, as int32."""
+    return count_convert_values(numpy.arange(LUT_SIZE), baseline, mode,
+                                em_gain, qe, sensitivity)
+
+
+def count_convert(data, baseline, mode, em_gain, qe, sensitivity,
+                  out=None, lut=None):
+    """Convert counts to electrons (mode 1) or photons (mode 2).
+
+    Arguments are as for PostProcessCountConvert. Returns int32 images."""
+    stack, single = as_stack(data)
+    check_integer(stack)
+    out = get_output(out, stack.shape, numpy.int32)
+    if stack.dtype == numpy.uint16:
+        if lut is None:
+            lut = count_convert_lut(baseline, mode, em_gain, qe, sensitivity)
+        lut.take(stack, out=out)
+    else:
+        out[...] = count_convert_values(stack, baseline, mode,
+                                        em_gain, qe, sensitivity)
+    return out[0] if single else out
+
+
+def median3(a, b, c):
+    """Return the element-wise median of three arrays."""
+    low = numpy.minimum(a, b)
+    high = numpy.maximum(a, b)
+    numpy.minimum(high, c, out=high)
+    return numpy.maximum(low, high, out=high)
+
+
+def median9(padded, ny, nx):
+    """Return the median of each 3x3 neighbourhood in padded images.
+
+    Each column of three is sorted once, and shared by three
+    neighbourhoods. The median of nine is the median of the largest of
+    their minima, the median of their medians and the smallest of their
+    maxima."""
+    top, middle, bottom = (padded[:, dy:dy + ny] for dy in range(3))
+    low = numpy.minimum(top, middle)
+    high = numpy.maximum(top, middle)
+    mid = numpy.minimum(high, bottom)
+    numpy.maximum(high, bottom, out=high)
+    numpy.maximum(low, mid, out=mid)
+    numpy.minimum(low, bottom, out=low)
+    # Now low <= mid <= high in each column of three.
+    columns = lambda a: (a[..., dx:dx + nx] for dx in range(3))
+    a, b, c = columns(low)
+    lows = numpy.maximum(numpy.maximum(a, b), c)
+    a, b, c = columns(high)
+    highs = numpy.minimum(numpy.minimum(a, b), c)
+    return median3(lows, median3(*columns(mid)), highs)
+
+
+def sort9(padded, ny, nx):
+    """Return the values of each 3x3 neighbourhood, sorted on axis 0."""
+    block = numpy.empty((9,) + padded[:, :ny, :nx].shape, padded.dtype)
+    for i, (dy, dx) in enumerate(NEIGHBOURHOOD):
+        block[i] = padded[:, dy:dy + ny, dx:dx + nx]
+    lower = numpy.empty_like(block[0])
+    for i, j in SORT9:
+        numpy.minimum(block[i], block[j], out=lower)
+        numpy.maximum(block[i], block[j], out=block[j])
+        block[i] = lower
+    return block
+
+
+def noise_filter(data, baseline, mode, threshold, out=None):
+    """Replace spurious pixels by the median of their 3x3 neighbourhood.
+
+    A pixel is spurious if, by mode:
+    1: it exceeds the median by more than threshold;
+    2: it exceeds baseline by more than threshold;
+    3: it exceeds the upper quartile by more than threshold times the
+       interquartile range;
+    4: it exceeds the median by more than threshold times the standard
+       deviation of its eight neighbours.
+    Neighbourhoods at the edges repeat the edge pixels. Tests are made
+    in single precision, as the SDK's threshold is a float. Returns
+    images of the input's dtype."""
+    if mode not in NOISE_FILTER_MODES:
+        raise Exception('Noise filter mode must be one of %s.'
+                        % sorted(NOISE_FILTER_MODES))
+    stack, single = as_stack(data)
+    check_integer(stack)
+    n, ny, nx = stack.shape
+    out = get_output(out, stack.shape, stack.dtype)
+    threshold = numpy.float32(threshold)
+    padded = numpy.pad(stack, ((0, 0), (1, 1), (1, 1)), 'edge')
+    if mode == 3:
+        block = sort9(padded, ny, nx)
+        median = block[4]
+        limit = (block[6] - block[2]).astype(numpy.float32)
+        limit *= threshold
+        limit += block[6]
+    else:
+        median = median9(padded, ny, nx)
+    if mode == 1:
+        limit = median + threshold
+    elif mode == 2:
+        limit = numpy.float32(baseline) + threshold
+    elif mode == 4:
+        neighbours = numpy.array([padded[:, dy:dy + ny, dx:dx + nx]
+                                  for dy, dx in NEIGHBOURHOOD
+                                  if (dy, dx) != (1, 1)])
+        limit = neighbours.std(axis=0, dtype=numpy.float32)
+        del neighbours
+        limit *= threshold
+        limit += median
+    out[...] = stack
+    numpy.copyto(out, median, where=stack > limit)
+    return out[0] if single else out
+
+
+class PostProcessor(object):
+    """Processes chunks of a stack in parallel on an Executor's threads."""
+    def __init__(self, n_threads=None, chunk_images=CHUNK_IMAGES):
+        if n_threads is None:
+            n_threads = multiprocessing.cpu_count()
+        self.n_threads = n_threads
+        self.chunk_images = chunk_images
+        self.executor = Executor(n_threads, name='PostProcessor')
+
+
+    def map_chunks(self, func, stack, out, ratio=1, *args, **kwargs):
+        """Apply func to chunks of stack, writing into chunks of out.
+
+        Each chunk of out has 1 / ratio as many images as its chunk of
+        stack, and each chunk of stack a multiple of ratio images."""
+        step = max(self.chunk_images // ratio, 1) * ratio
+        chunks = [(i, min(i + step, len(stack)))
+                  for i in range(0, len(stack), step)]
+        if len(chunks) == 1 or self.n_threads == 1:
+            for start, stop in chunks:
+                func(stack[start:stop], out=out[start // ratio:stop // ratio],
+                     *args, **kwargs)
+            return out
+        futures = [self.executor.submit(
+                       CONTROL, func, stack[start:stop], *args,
+                       out=out[start // ratio:stop // ratio], **kwargs)
+                   for start, stop in chunks]
+        for future in futures:
+            future.result()
+        return out
+
+
+    def photon_counting(self, data, thresholds, frames=1):
+        """As photon_counting, processing chunks in parallel."""
+        stack, single = as_stack(data)
+        check_integer(stack)
+        n, ny, nx = stack.shape
+        if frames < 1 or n % frames:
+            raise Exception('%d images do not divide into groups of %d '
+                            'frames.' % (n, frames))
+        out = numpy.empty((n // frames, ny, nx), numpy.int32)
+        lut = None
+        if stack.dtype == numpy.uint16:
+            lut = photon_counting_lut(thresholds)
+        self.map_chunks(photon_counting, stack, out, frames,
+                        thresholds, frames, lut=lut)
+        return out[0] if single and frames == 1 else out
+
+
+    def count_convert(self, data, baseline, mode, em_gain, qe, sensitivity):
+        """As count_convert, processing chunks in parallel."""
+        stack, single = as_stack(data)
+        check_integer(stack)
+        out = numpy.empty(stack.shape, numpy.int32)
+        lut = None
+        if stack.dtype == numpy.uint16:
+            lut = count_convert_lut(baseline, mode, em_gain, qe, sensitivity)
+        self.map_chunks(count_convert, stack, out, 1, baseline, mode,
+                        em_gain, qe, sensitivity, lut=lut)
+        return out[0] if single else out
+
+
+    def noise_filter(self, data, baseline, mode, threshold):
+        """As noise_filter, processing chunks in parallel."""
+        stack, single = as_stack(data)
+        check_integer(stack)
+        out = numpy.empty(stack.shape, stack.dtype)
+        self.map_chunks(noise_filter, stack, out, 1, baseline, mode,
+                        threshold)
+        return out[0] if single else out
+
+
+    def stop(self):
+        """Finish queued chunks, then stop the threads."""
+        self.executor.stop()
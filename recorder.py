@@ -0,0 +1,192 @@
+#
+#   recorder - stream camera frames to disk.
+#   Copyright (C) 2015 Mick Phillips
+#   mick.phillips@gmail.com
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""recorder - stream camera frames to disk.
+
+A Recorder copies each frame it is given into a small staging ring, and
+a background thread writes staged frames to a file preallocated for the
+whole recording. Two formats are supported:
+* 'raw': a memory-mapped file of n_frames * ny * nx uint16 pixels;
+* 'hdf5': an HDF5 file with a 'frames' dataset chunked by frame
+  (requires h5py).
+
+The timestamp and sequence number of each frame are written to
+path + '.times.npy' for raw recordings, or to a 'times' dataset in
+HDF5. Alongside the data, the recorder writes path + '.json', a sidecar
+with the frame geometry, drop counts and settings snapshots. All are
+flushed periodically while recording.
+"""
+
+import json
+import numpy
+import threading
+import time
+from collections import deque
+from numpy.lib.format import open_memmap
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+FORMATS = ('raw', 'hdf5')
+## Dtype of the per-frame timing records.
+TIMES_DTYPE = [('timestamp', 'f8'), ('sequence', 'i8')]
+
+
+class Recorder(threading.Thread):
+    """A thread that writes frames to disk.
+
+    Frames are passed to put, which copies them into a staging ring of
+    depth frames. If the ring is full, the recording already holds
+    n_frames, or the frame is not of the recording's shape, the frame
+    is dropped and counted.
+    """
+    def __init__(self, path, shape, n_frames, format='raw', depth=64,
+                 flush_interval=1.0, settings=None):
+        threading.Thread.__init__(self)
+        if format not in FORMATS:
+            raise Exception('Bad recording format: expected one of %s.'
+                            % ', '.join(FORMATS))
+        if format == 'hdf5' and h5py is None:
+            raise Exception('Recording to hdf5 requires h5py.')
+        self.path = path
+        self.shape = tuple(shape)
+        self.n_frames = n_frames
+        self.format = format
+        self.flush_interval = flush_interval
+        # Staging ring, and queues of free and filled staging slots.
+        self.staging = numpy.zeros((depth,) + self.shape, dtype=numpy.uint16)
+        self.free = deque(range(depth))
+        self.staged = deque()
+        self.condition = threading.Condition()
+        # Frames accepted, written and dropped.
+        self.accepted = 0
+        self.written = 0
+        self.dropped_staging = 0
+        self.dropped_full = 0
+        self.dropped_shape = 0
+        self.settings = [{'frame': 0, 'settings': settings or {}}]
+        self.run_flag = True
+        self.started_at = None
+        self.stopped_at = None
+
+        if format == 'raw':
+            self.h5file = None
+            self.frames = numpy.memmap(path, dtype=numpy.uint16, mode='w+',
+                                       shape=(n_frames,) + self.shape)
+            self.times = open_memmap(path + '.times.npy', mode='w+',
+                                     dtype=TIMES_DTYPE, shape=(n_frames,))
+        else:
+            self.h5file = h5py.File(path, 'w')
+            self.frames = self.h5file.create_dataset(
+                'frames', shape=(n_frames,) + self.shape, dtype='uint16',
+                chunks=(1,) + self.shape)
+            self.times = self.h5file.create_dataset(
+                'times', shape=(n_frames,), dtype=numpy.dtype(TIMES_DTYPE))
+
+
+    def put(self, image, timestamp, sequence):
+        """Stage a frame for writing. Return False if it was dropped."""
+        with self.condition:
+            if image.shape != self.shape:
+                self.dropped_shape += 1
+                return False
+            if self.accepted >= self.n_frames:
+                self.dropped_full += 1
+                return False
+            if not self.free:
+                self.dropped_staging += 1
+                return False
+            slot = self.free.popleft()
+            self.accepted += 1
+        self.staging[slot] = image
+        with self.condition:
+            self.staged.append((slot, timestamp, sequence))
+            self.condition.notify()
+        return True
+
+
+    def snapshot_settings(self, settings):
+        """Record settings that apply from the next frame onwards."""
+        with self.condition:
+            self.settings.append({'frame': self.accepted,
+                                  'settings': dict(settings)})
+
+
+    def run(self):
+        self.started_at = time.time()
+        last_flush = time.time()
+        while True:
+            with self.condition:
+                if not self.staged and self.run_flag:
+                    self.condition.wait(self.flush_interval)
+                if not self.staged and not self.run_flag:
+                    break
+                items = list(self.staged)
+                self.staged.clear()
+            for slot, timestamp, sequence in items:
+                self.frames[self.written] = self.staging[slot]
+                self.times[self.written] = numpy.array((timestamp, sequence),
+                                                       dtype=TIMES_DTYPE)
+                self.written += 1
+                with self.condition:
+                    self.free.append(slot)
+            if time.time() - last_flush > self.flush_interval:
+                self.flush()
+                last_flush = time.time()
+        self.stopped_at = time.time()
+        self.flush()
+        if self.h5file is not None:
+            self.h5file.close()
+        else:
+            del self.frames, self.times
+
+
+    def flush(self):
+        """Flush frames, timing records and the sidecar to disk."""
+        if self.h5file is not None:
+            self.frames.attrs['written'] = self.written
+            self.h5file.flush()
+        else:
+            self.frames.flush()
+            self.times.flush()
+        with open(self.path + '.json', 'w') as fh:
+            json.dump(self.get_status(), fh, indent=1, default=repr)
+
+
+    def get_status(self):
+        return {'path': self.path,
+                'format': self.format,
+                'shape': self.shape,
+                'dtype': 'uint16',
+                'frames': self.n_frames,
+                'written': self.written,
+                'droppedStaging': self.dropped_staging,
+                'droppedFull': self.dropped_full,
+                'droppedShape': self.dropped_shape,
+                'startedAt': self.started_at,
+                'stoppedAt': self.stopped_at,
+                'settings': self.settings}
+
+
+    def stop(self):
+        """Stop once all staged frames have been written."""
+        with self.condition:
+            self.run_flag = False
+            self.condition.notify()
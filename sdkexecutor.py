@@ -0,0 +1,156 @@
+#
+#   sdkexecutor - run calls to Andor's SDK on dedicated threads.
+#   Copyright (C) 2015 Mick Phillips
+#   mick.phillips@gmail.com
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""sdkexecutor - run calls to Andor's SDK on dedicated threads.
+
+An Executor runs commands on a few worker threads, taking them from a
+queue in order of priority, then of submission. submit returns a Future
+for each command's result.
+
+Priorities, highest first:
+* READOUT: fetching frames from the camera;
+* CONTROL: changing settings and everything else;
+* HOUSEKEEPING: status and temperature queries.
+
+This module does not depend on the Andor SDK.
+"""
+
+import heapq
+import itertools
+import threading
+from timeit import default_timer as timer
+
+READOUT, CONTROL, HOUSEKEEPING = 0, 1, 2
+PRIORITY_NAMES = {READOUT: 'readout',
+                  CONTROL: 'control',
+                  HOUSEKEEPING: 'housekeeping'}
+
+
+class Future(object):
+    """The result of a command, set when the command has run."""
+    def __init__(self):
+        self.finished = threading.Event()
+        self.value = None
+        self.error = None
+
+
+    def set_result(self, value):
+        self.value = value
+        self.finished.set()
+
+
+    def set_exception(self, error):
+        self.error = error
+        self.finished.set()
+
+
+    def done(self):
+        return self.finished.is_set()
+
+
+    def result(self, timeout=None):
+        """Wait for the command, and return its result or raise its error."""
+        if not self.finished.wait(timeout):
+            raise Exception('Timed out waiting for command result.')
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class Executor(object):
+    """Worker threads that run queued commands in priority order."""
+    def __init__(self, n_threads=1, name='Executor'):
+        self.queue = []
+        self.condition = threading.Condition()
+        # Breaks ties between commands of equal priority.
+        self.sequence = itertools.count()
+        self.local = threading.local()
+        self.run_flag = True
+        # Commands run, and total and max seconds queued, by priority.
+        self.executed = dict((p, 0) for p in PRIORITY_NAMES)
+        self.total_wait = dict((p, 0.) for p in PRIORITY_NAMES)
+        self.max_wait = dict((p, 0.) for p in PRIORITY_NAMES)
+        self.threads = [threading.Thread(target=self.run,
+                                         name='%s-%d' % (name, i))
+                        for i in range(n_threads)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+
+    def in_worker(self):
+        """Return True if called from one of this executor's threads."""
+        return getattr(self.local, 'worker', False)
+
+
+    def submit(self, priority, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) and return a Future for its result."""
+        future = Future()
+        with self.condition:
+            if not self.run_flag:
+                raise Exception('Executor has been stopped.')
+            heapq.heappush(self.queue, (priority, next(self.sequence),
+                                        timer(), future, func, args, kwargs))
+            self.condition.notify()
+        return future
+
+
+    def run(self):
+        self.local.worker = True
+        while True:
+            with self.condition:
+                while self.run_flag and not self.queue:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                (priority, sequence, queued_at,
+                 future, func, args, kwargs) = heapq.heappop(self.queue)
+                wait = timer() - queued_at
+                self.executed[priority] += 1
+                self.total_wait[priority] += wait
+                if wait > self.max_wait[priority]:
+                    self.max_wait[priority] = wait
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+
+    def get_stats(self):
+        """Return queue length, and commands run and queue waits by priority."""
+        with self.condition:
+            stats = {'threads': len(self.threads),
+                     'queued': len(self.queue)}
+            for p, name in PRIORITY_NAMES.items():
+                n = self.executed[p]
+                stats[name] = {'executed': n,
+                               'meanWait': self.total_wait[p] / n if n else 0.,
+                               'maxWait': self.max_wait[p]}
+        return stats
+
+
+    def stop(self):
+        """Run the commands already queued, then stop the workers."""
+        with self.condition:
+            self.run_flag = False
+            self.condition.notify_all()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
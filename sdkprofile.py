@@ -0,0 +1,157 @@
+#
+#   sdkprofile - time calls to Andor's SDK.
+#   Copyright (C) 2015 Mick Phillips
+#   mick.phillips@gmail.com
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""sdkprofile - time calls to Andor's SDK.
+
+An SdkProfiler records the count, total time and recent latencies of
+calls to each DLL function, and the time spent waiting for the lock
+that serialises DLL calls between cameras. Profiling is switched on by
+setting andorsdk.profiler to a profiler: while it is None, the SDK
+wrappers only pay for that test.
+
+get_stats returns, for each function and for the lock:
+    {'count', 'total', 'mean', 'p50', 'p99', 'max'}
+with times in seconds. Percentiles are over the most recent calls.
+A StatsLogger thread writes a summary of the stats to a log
+periodically.
+
+This module does not depend on the Andor SDK.
+"""
+
+import numpy
+import threading
+from collections import deque
+from timeit import default_timer as timer
+
+## Number of recent latencies kept for percentiles, per function.
+SAMPLES = 1024
+## Key for dll_lock waits in stats.
+LOCK_KEY = 'dll_lock'
+
+
+class CallStats(object):
+    """Counts and latencies for one function."""
+    __slots__ = ('count', 'total', 'max', 'samples')
+
+    def __init__(self, samples):
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+        self.samples = deque(maxlen=samples)
+
+
+    def get_stats(self):
+        samples = numpy.array(self.samples)
+        p50, p99 = numpy.percentile(samples, [50, 99]) if len(samples) else (0, 0)
+        return {'count': self.count,
+                'total': self.total,
+                'mean': self.total / self.count if self.count else 0.,
+                'p50': p50,
+                'p99': p99,
+                'max': self.max}
+
+
+class SdkProfiler(object):
+    """Collects CallStats for DLL functions, and for dll_lock waits."""
+    def __init__(self, samples=SAMPLES):
+        self.samples = samples
+        self.lock = threading.Lock()
+        self.reset()
+
+
+    def reset(self):
+        """Discard all stats."""
+        with self.lock:
+            self.stats = {}
+            self.started_at = timer()
+
+
+    def record(self, name, seconds):
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = CallStats(self.samples)
+            stats.count += 1
+            stats.total += seconds
+            stats.samples.append(seconds)
+            if seconds > stats.max:
+                stats.max = seconds
+
+
+    def call(self, func, *args, **kwargs):
+        """Call func, recording the time it takes."""
+        t0 = timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.record(func.__name__, timer() - t0)
+
+
+    def acquire(self, lock, *args):
+        """Acquire lock, recording the time spent waiting for it."""
+        t0 = timer()
+        lock.acquire(*args)
+        self.record(LOCK_KEY, timer() - t0)
+
+
+    def get_stats(self):
+        """Return a dict of stats by function name, and for LOCK_KEY."""
+        with self.lock:
+            items = self.stats.items()
+            elapsed = timer() - self.started_at
+        stats = dict((name, s.get_stats()) for name, s in items)
+        stats.setdefault(LOCK_KEY, CallStats(0).get_stats())
+        return {'elapsed': elapsed, 'functions': stats}
+
+
+    def format_stats(self, limit=None):
+        """Return stats as lines of text, by descending total time."""
+        stats = self.get_stats()
+        lines = ['SDK calls over %.1fs:' % stats['elapsed'],
+                 '  %-32s %9s %10s %9s %9s %9s' % (
+                     'function', 'count', 'total ms', 'p50 ms', 'p99 ms',
+                     'max ms')]
+        rows = sorted(stats['functions'].items(),
+                      key=lambda item: item[1]['total'], reverse=True)
+        for name, s in rows[:limit]:
+            lines.append('  %-32s %9d %10.1f %9.3f %9.3f %9.3f' % (
+                name, s['count'], 1000 * s['total'], 1000 * s['p50'],
+                1000 * s['p99'], 1000 * s['max']))
+        return lines
+
+
+class StatsLogger(threading.Thread):
+    """A thread that passes a profiler's stats to log every interval."""
+    def __init__(self, profiler, log, interval=60., limit=20):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.profiler = profiler
+        self.log = log
+        self.interval = interval
+        self.limit = limit
+        self.stopped = threading.Event()
+
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            for line in self.profiler.format_stats(self.limit):
+                self.log(line)
+
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,182 @@
+#
+#   sharedframes - pass camera frames between processes on one host.
+#   Copyright (C) 2015 Mick Phillips
+#   mick.phillips@gmail.com
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""sharedframes - pass camera frames between processes on one host.
+
+A SharedFrameRing is a ring of frame slots in a memory-mapped region.
+The camera server writes each frame into the next slot and sends the
+client only a small descriptor over Pyro:
+    {'slot', 'shape', 'dtype', 'timestamp', 'sequence'}
+The client attaches to the ring using the description returned by
+Camera.receiveClient, and reads frames with read(descriptor).
+
+This module does not depend on the Andor SDK, so clients can import it.
+
+Each slot starts with a header holding the sequence number of the frame
+it contains. The writer clears the sequence number before writing a
+frame and sets it afterwards, so a reader can tell when a slot has been
+overwritten while it was copying the frame out. In that case, read
+returns None.
+"""
+
+import mmap
+import numpy
+import os
+import sys
+import tempfile
+import threading
+
+## Bytes reserved for each slot header, to keep frame data aligned.
+HEADER_SIZE = 64
+## Sequence number stored in a header while its slot is being written.
+WRITING = 0
+
+
+def _shm_dir():
+    """Return a directory for files backing shared memory on POSIX."""
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class SharedFrameRing(object):
+    """A ring of frame slots in shared memory.
+
+    The server creates the ring with create=True; clients attach to an
+    existing ring with SharedFrameRing.attach(description).
+    """
+    def __init__(self, name, n_slots, max_pixels, dtype='uint16',
+                 create=False):
+        self.name = name
+        self.n_slots = n_slots
+        self.max_pixels = max_pixels
+        self.dtype = numpy.dtype(dtype)
+        self.slot_size = HEADER_SIZE + max_pixels * self.dtype.itemsize
+        size = n_slots * self.slot_size
+        self.path = None
+        self.fh = None
+        if sys.platform == 'win32':
+            # A named mapping backed by the paging file.
+            self.mm = mmap.mmap(-1, size, tagname=name)
+        else:
+            self.path = os.path.join(_shm_dir(), name)
+            if create:
+                self.fh = open(self.path, 'w+b')
+                self.fh.truncate(size)
+            else:
+                self.fh = open(self.path, 'r+b')
+            self.mm = mmap.mmap(self.fh.fileno(), size)
+        self.created = create
+        # Slot headers and slot data, as views on the mapping.
+        buf = numpy.frombuffer(self.mm, dtype=numpy.uint8)
+        slots = buf.reshape(n_slots, self.slot_size)
+        self.sequences = [slots[i, :8].view(numpy.uint64)
+                          for i in range(n_slots)]
+        self.data = [slots[i, HEADER_SIZE:].view(self.dtype)
+                     for i in range(n_slots)]
+        # Index of the next slot to write, and frames written.
+        self.next_slot = 0
+        self.written = 0
+        self.lock = threading.Lock()
+
+
+    @classmethod
+    def attach(cls, description):
+        """Attach to a ring created by another process."""
+        return cls(description['name'], description['slots'],
+                   description['maxPixels'], description['dtype'])
+
+
+    def describe(self):
+        """Return what a client needs to attach to this ring."""
+        return {'name': self.name,
+                'slots': self.n_slots,
+                'maxPixels': self.max_pixels,
+                'dtype': self.dtype.str}
+
+
+    def reserve(self, shape):
+        """Claim the next slot for a frame of the given shape.
+
+        Returns (slot, sequence, out), where out is a view on the slot
+        to be filled before calling commit(slot, sequence, out, timestamp)."""
+        n = int(numpy.prod(shape))
+        if n > self.max_pixels:
+            raise Exception('Image of %d pixels too large for %d pixel slot.'
+                            % (n, self.max_pixels))
+        with self.lock:
+            slot = self.next_slot
+            self.next_slot = (slot + 1) % self.n_slots
+            self.written += 1
+            sequence = self.written
+        self.sequences[slot][0] = WRITING
+        return (slot, sequence, self.data[slot][:n].reshape(shape))
+
+
+    def commit(self, slot, sequence, out, timestamp):
+        """Mark a reserved slot as filled and return its descriptor."""
+        self.sequences[slot][0] = sequence
+        return {'slot': slot,
+                'shape': out.shape,
+                'dtype': self.dtype.str,
+                'timestamp': timestamp,
+                'sequence': sequence}
+
+
+    def write(self, image, timestamp):
+        """Copy image into the next slot and return its descriptor."""
+        slot, sequence, out = self.reserve(image.shape)
+        out[...] = image
+        return self.commit(slot, sequence, out, timestamp)
+
+
+    def view(self, descriptor):
+        """Return a view on a slot's frame.
+
+        The view may be overwritten at any time: use read for a copy
+        that is checked against the descriptor's sequence number."""
+        shape = descriptor['shape']
+        n = int(numpy.prod(shape))
+        return self.data[descriptor['slot']][:n].reshape(shape)
+
+
+    def read(self, descriptor, out=None):
+        """Copy a frame out of its slot.
+
+        Returns the frame, or None if the slot has been overwritten."""
+        sequence = self.sequences[descriptor['slot']]
+        if sequence[0] != descriptor['sequence']:
+            return None
+        view = self.view(descriptor)
+        if out is None:
+            out = view.copy()
+        else:
+            out[...] = view
+        if sequence[0] != descriptor['sequence']:
+            return None
+        return out
+
+
+    def close(self):
+        """Release the mapping, removing its file if we created it."""
+        self.sequences = self.data = None
+        self.mm.close()
+        if self.fh:
+            self.fh.close()
+            if self.created:
+                os.remove(self.path)
@@ -0,0 +1,122 @@
+#
+#   spool - read frames from files spooled by Andor's SDK.
+#   Copyright (C) 2015 Mick Phillips
+#   mick.phillips@gmail.com
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""spool - read frames from files spooled by Andor's SDK.
+
+SetSpool(1, method, stem, framebuffersize) makes the SDK write acquired
+frames to a file named stem + 'spool.dat', continued if need be in files
+with a nine-digit number between the stem and 'spool.dat'. Other files
+starting with stem, such as those of stem + '0', are not spool files.
+For the raw methods, the files are a plain sequence of frames:
+* method 0: 32-bit integers;
+* method 1: 16-bit integers, or 32-bit if accumulating;
+* method 2: 16-bit integers.
+A SpoolReader memory-maps these files and presents them as one
+sequence of frames. Call refresh to pick up frames written since the
+reader was created, so frames can be read while acquisition continues.
+
+This module does not depend on the Andor SDK, so clients can import it.
+"""
+
+import numpy
+import os
+import re
+
+## Pixel dtype for each raw spool method.
+SPOOL_DTYPES = {0: numpy.int32,
+                1: numpy.uint16,
+                2: numpy.uint16}
+## Pattern of the names of spool files, after the stem's.
+SPOOL_FILE_PATTERN = r'(\d{9})?spool\.dat$'
+
+
+class SpoolReader(object):
+    """Memory-mapped access to frames in a set of spool files."""
+    def __init__(self, stem, shape, method=2, accumulating=False):
+        if method not in SPOOL_DTYPES:
+            raise Exception('Spool method %s is not a raw format.' % method)
+        self.stem = stem
+        self.shape = tuple(shape)
+        if method == 1 and accumulating:
+            self.dtype = numpy.dtype(numpy.int32)
+        else:
+            self.dtype = numpy.dtype(SPOOL_DTYPES[method])
+        self.frame_bytes = int(numpy.prod(self.shape)) * self.dtype.itemsize
+        self.pattern = re.compile(re.escape(os.path.basename(stem))
+                                  + SPOOL_FILE_PATTERN)
+        # Map of filename to (memmap, frames, inode) for each spool file.
+        self.maps = {}
+        # (filename, index within file) for each frame, in order.
+        self.index = []
+        self.refresh()
+
+
+    def list_files(self):
+        """Return the names of the spool files, in the order written."""
+        directory = os.path.dirname(self.stem) or '.'
+        numbered = []
+        for name in os.listdir(directory):
+            match = self.pattern.match(name)
+            if match:
+                number = int(match.group(1)) if match.group(1) else -1
+                numbered.append((number, os.path.join(directory, name)))
+        return [filename for number, filename in sorted(numbered)]
+
+
+    def refresh(self):
+        """Map new spool files, and new frames in growing files.
+
+        Files that have shrunk or been replaced are mapped again.
+        Returns the number of frames available."""
+        self.index = []
+        maps = {}
+        for filename in self.list_files():
+            stat = os.stat(filename)
+            n = stat.st_size // self.frame_bytes
+            if n == 0:
+                continue
+            mapped = self.maps.get(filename)
+            if mapped is None or mapped[1:] != (n, stat.st_ino):
+                frames = numpy.memmap(filename, dtype=self.dtype, mode='r',
+                                      shape=(n,) + self.shape)
+                mapped = (frames, n, stat.st_ino)
+            maps[filename] = mapped
+            self.index.extend((filename, i) for i in range(n))
+        # Drop maps of files that have gone.
+        self.maps = maps
+        return len(self.index)
+
+
+    def __len__(self):
+        return len(self.index)
+
+
+    def __getitem__(self, i):
+        """Return a read-only view on frame i."""
+        filename, j = self.index[i]
+        return self.maps[filename][0][j]
+
+
+    def read(self, start=0, count=None):
+        """Copy count frames from start into one (N, ny, nx) stack."""
+        stop = len(self) if count is None else min(len(self), start + count)
+        stack = numpy.empty((max(0, stop - start),) + self.shape,
+                            dtype=self.dtype)
+        for n, i in enumerate(range(start, stop)):
+            stack[n] = self[i]
+        return stack